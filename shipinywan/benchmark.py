@@ -0,0 +1,1212 @@
+"""shipinywan.py 性能基准测试
+
+用法示例:
+    python benchmark.py base58
+    python benchmark.py base58 --sizes 10KB 100KB 1MB 2MB 4MB --legacy-max 100KB
+    python benchmark.py payload --sizes 10KB 100KB 1MB
+    python benchmark.py lines shipinywan.txt --minified-sites 300
+    python benchmark.py urls shipinywan.txt
+    python benchmark.py names shipinywan.txt
+    python benchmark.py json --sites 100000
+    python benchmark.py write --entries 500 5000 50000
+    python benchmark.py probe --hosts 8 --per-host-urls 20
+    python benchmark.py serve --size 1MB --clients 64 --requests 200
+    python benchmark.py generate dump.txt --size 100MB --json 0.4 --malformed 0.4 --text 0.2 --proxy 0.1
+    python benchmark.py suite --size 10MB --save-baseline
+    python benchmark.py suite --size 10MB            # 与保存的基线比较，超出容差时返回非0
+    python benchmark.py suite --file shipinywan.txt --baseline real_baseline.json
+    python benchmark.py records --size 50MB
+"""
+import argparse
+import asyncio
+import datetime
+import gzip
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from shipinywan import (  # noqa: E402
+    base58_encode, base58_decode, BASE58_ALPHABET, VideoSourceProcessor, _probe_urls, json_backend_name,
+    serialize_json, write_file_atomic, canonical_url_key, ServedBody, SubscriptionServer,
+    encode_base58_payload, decode_base58_payload, estimate_base58_seconds, logger,
+)
+
+
+def legacy_base58_encode(data_str):
+    """旧版逐位 divmod + 字符串前插的Base58编码，仅作为基准对照"""
+    bytes_data = data_str.encode('utf-8')
+    if len(bytes_data) == 0:
+        return ''
+    num = int.from_bytes(bytes_data, 'big')
+    if num == 0:
+        return BASE58_ALPHABET[0]
+    result = ''
+    while num > 0:
+        result = BASE58_ALPHABET[num % 58] + result
+        num = num // 58
+    for byte in bytes_data:
+        if byte == 0:
+            result = BASE58_ALPHABET[0] + result
+        else:
+            break
+    return result
+
+
+def parse_lines_with_context(processor, lines):
+    """当前行解析：逐行扫描行事件再按上下文匹配名称，与 legacy_parse_lines_with_context 对照"""
+    return processor._resolve_line_events(processor._iter_line_events(lines))
+
+
+def legacy_parse_lines_with_context(processor, lines):
+    """旧版行解析：每个URL重新提取当前行和上下文各行的名称，待匹配名称用 list.pop(0)，仅作为基准和回归对照"""
+    def find_contextual_name(current_index):
+        for i in range(max(0, current_index - 5), current_index):
+            line = lines[i].strip()
+            if line:
+                names = processor._extract_potential_names_from_line(line)
+                if names:
+                    return names[0]
+        for i in range(current_index + 1, min(len(lines), current_index + 5)):
+            line = lines[i].strip()
+            if line:
+                names = processor._extract_potential_names_from_line(line)
+                if names:
+                    return names[0]
+        return None
+
+    results = []
+    pending_names = []
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        urls = re.findall(r'https?://[^\s\'"<>,]+', line)
+        found_valid_url = False
+        for url in urls:
+            actual_url = processor.extract_actual_url(url)
+            if actual_url:
+                found_valid_url = True
+                names = processor._extract_potential_names_from_line(line)
+                name = names[0] if names else processor.extract_domain_name(url)
+                if (not name or name == "未知资源") and pending_names:
+                    name = pending_names.pop(0)
+                if not name or name == "未知资源":
+                    name = find_contextual_name(line_num - 1)
+                if not name:
+                    name = processor.extract_domain_name(actual_url)
+                results.append((name, actual_url))
+        if not found_valid_url:
+            pending_names.extend(processor._extract_potential_names_from_line(line))
+    return results
+
+
+def legacy_extract_potential_names(line):
+    """旧版三条正则的行内候选名称提取，仅作为基准和回归对照"""
+    names = []
+    names.extend(re.findall(r'"(?:name|key)"\s*:\s*"([^"]+)"', line))
+    for match in re.findall(r'"([^"]*(?:[\u4e00-\u9fff]|资源|影视|视频|电影|TV)[^"]*)"', line):
+        if len(match) > 1 and not match.startswith('http'):
+            names.append(match)
+    names.extend(re.findall(r'[\u4e00-\u9fff]{2,}(?:资源|影视|视频|电影|TV)?', line))
+    return [name.strip() for name in names if name.strip()]
+
+
+def legacy_parse_json_data(processor, data, parent_key=""):
+    """旧版递归JSON解析（每层新建结果列表，资源对象的字段校验两遍），仅作为基准和回归对照"""
+    def is_source_object(obj):
+        for field in ['url', 'api', 'base_url', 'link']:
+            if field in obj and isinstance(obj[field], str) and processor.extract_actual_url(obj[field]):
+                return 'name' in obj or 'key' in obj
+        return False
+
+    def extract_from_source_object(obj):
+        url = None
+        for field in ['api', 'base_url', 'url', 'link']:
+            if field in obj and isinstance(obj[field], str):
+                url = processor.extract_actual_url(obj[field])
+                if url:
+                    break
+        if not url:
+            return None, None
+        name = obj.get('name', obj.get('key', ''))
+        if not name:
+            name = processor.extract_domain_name(url)
+        return name.strip(), url
+
+    results = []
+    if isinstance(data, dict):
+        if is_source_object(data):
+            name, url = extract_from_source_object(data)
+            if name and url:
+                results.append((name, url))
+                return results
+        for key, value in data.items():
+            if isinstance(value, str):
+                actual_url = processor.extract_actual_url(value)
+                if actual_url:
+                    results.append((processor._extract_name_from_json(data, key, parent_key), actual_url))
+            elif isinstance(value, dict):
+                results.extend(legacy_parse_json_data(processor, value, key))
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, dict) and is_source_object(item):
+                        name, url = extract_from_source_object(item)
+                        if name and url:
+                            results.append((name, url))
+                    else:
+                        results.extend(legacy_parse_json_data(processor, item, key))
+    elif isinstance(data, list):
+        for item in data:
+            results.extend(legacy_parse_json_data(processor, item, parent_key))
+    return results
+
+
+def parse_size(text):
+    """解析 10KB / 1MB / 1GB 这类大小参数，返回字节数"""
+    text = text.strip().upper()
+    units = {'GB': 1024 ** 3, 'MB': 1024 ** 2, 'KB': 1024, 'B': 1}
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def format_size(num_bytes):
+    """将字节数格式化为便于阅读的字符串"""
+    for unit, factor in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024)):
+        if num_bytes >= factor:
+            return f"{num_bytes / factor:g}{unit}"
+    return f"{num_bytes}B"
+
+
+def make_json_payload(size, seed=0):
+    """生成与combined_sources.json结构相同、大小约为size字节的紧凑JSON字符串"""
+    rng = random.Random(seed)
+    entries = []
+    total = 0
+    i = 0
+    while total < size:
+        i += 1
+        host = f"{rng.choice(['api', 'www', 'cj', 'zy'])}.{rng.randrange(10 ** 6):06d}zy.com"
+        entry = json.dumps({
+            "name": rng.choice(["资源", "影视", "视频", "电影", "TV"]) + str(i),
+            "api": f"https://{host}/api.php/provide/vod",
+            "detail": f"https://{host}",
+        }, ensure_ascii=False, separators=(',', ':'))
+        entries.append(f'"api_{i}":{entry}')
+        total += len(entries[-1].encode('utf-8')) + 1
+    return '{"cache_time":9200,"api_site":{' + ','.join(entries) + '}}'
+
+
+def make_tvbox_config(site_count, seed=0):
+    """生成约含 site_count 个资源的合成配置：TVBox风格的 sites 数组、LunaTV风格的 api_site 字典，
+    以及嵌套的分组/多仓配置和解析、直播等无关字段"""
+    rng = random.Random(seed)
+
+    def site(i):
+        host = f"{rng.choice(['api', 'cj', 'zy', 'www'])}.site{i}.com"
+        kind = rng.random()
+        entry = {"key": f"site_{i}", "name": rng.choice(["资源", "影视", "TV", ""]) + str(i), "type": 1,
+                 "searchable": 1, "quickSearch": 1, "filterable": 1}
+        if kind < 0.7:
+            entry["api"] = f"https://{host}/api.php/provide/vod"
+        elif kind < 0.85:
+            entry["api"] = "csp_XBPQ"
+            entry["ext"] = {"url": f"http://{host}/api.php/provide/vod/at/json", "分类": "电影$1#剧集$2"}
+        else:
+            entry["api"] = f"http://{host}/spider.jar"
+        return entry
+
+    per_group = max(1, site_count // 10)
+    sites = [site(i) for i in range(site_count // 2)]
+    api_site = {
+        f"api_{i}": {"name": f"资源{i}", "api": f"https://zy{i}.com/api.php/provide/vod", "detail": f"https://zy{i}.com"}
+        for i in range(site_count // 4)
+    }
+    groups = []
+    offset = site_count // 2
+    while offset < site_count:
+        count = min(per_group, site_count - offset)
+        groups.append({"name": f"分组{offset}", "config": {"sites": [site(offset + i) for i in range(count)],
+                                                         "wallpaper": "https://img.example.com/x.jpg"}})
+        offset += count
+    return {
+        "spider": "./jar/spider.jar;md5;abc",
+        "sites": sites,
+        "api_site": api_site,
+        "urls": groups,
+        "parses": [{"name": "解析", "type": 0, "url": "https://jx.example.com/?url="}],
+        "lives": [{"name": "直播", "url": "https://live.example.com/tv.m3u"}],
+    }
+
+
+def make_deep_json(depth):
+    """生成嵌套 depth 层的文档，最内层是一个资源对象"""
+    data = {"name": "最内层", "api": "https://deep.example.com/api.php/provide/vod"}
+    for i in range(depth):
+        data = {"level": i, "child": [data]} if i % 2 else {"level": i, "child": data}
+    return data
+
+
+_REPORT_SEPARATOR = '=' * 100
+_NAME_WORDS = ["资源", "影视", "视频", "电影", "TV", "云", "极速", "量子", "非凡", "暴风", "天空", "红牛", "光速", "卧龙"]
+_COMMENT_LINES = ["//公众号（小马网络园）", "//更多内容请访问主页", "#直播", "## ", "//备用QQ群:892408438", "// 接口免费，请勿付费购买"]
+
+
+class CrawlReportGenerator:
+    """生成与 codecatch 用户脚本导出的 "GitHub批量文件抓取结果报告" 格式相同的合成抓取报告
+
+    每个文件记录随机是完整JSON配置、不规范JSON（注释、#行、缺失括号、多余逗号）或纯文本（"名称,链接" 等），
+    比例由 json_ratio / malformed_ratio / text_ratio 决定；proxy_ratio 的链接包在代理地址里，
+    hosts 控制不同资源站的数量（决定去重后的规模）。
+    """
+
+    def __init__(self, json_ratio=0.4, malformed_ratio=0.4, text_ratio=0.2, proxy_ratio=0.1,
+                 hosts=2000, sites_per_file=(20, 120), seed=0):
+        total = json_ratio + malformed_ratio + text_ratio
+        if total <= 0:
+            raise ValueError("json/malformed/text 比例之和必须大于0")
+        self.kind_weights = (json_ratio / total, malformed_ratio / total, text_ratio / total)
+        self.proxy_ratio = proxy_ratio
+        self.hosts = hosts
+        self.sites_per_file = sites_per_file
+        self.rng = random.Random(seed)
+        self.clock = datetime.datetime(2025, 9, 15, 23, 0, 0)
+
+    def _site_url(self):
+        rng = self.rng
+        host_id = rng.randrange(self.hosts)
+        scheme = 'https' if host_id % 3 else 'http'
+        path = rng.choice(["/api.php/provide/vod", "/api.php/provide/vod/", "/api.php/provide/vod/at/json",
+                           "/inc/apijson.php/provide/vod", "/api.php/provide/vod/from/m3u8/at/xml"])
+        url = f"{scheme}://{rng.choice(['api', 'cj', 'zy', 'www'])}.zy{host_id}.com{path}"
+        if rng.random() < self.proxy_ratio:
+            url = f"https://proxy{rng.randrange(50)}.example.workers.dev/proxy/{url}"
+        elif rng.random() < 0.01:
+            # 少量无效链接：重复协议、中文
+            url = rng.choice([f"https://{url}", url.replace(".com", ".中国")])
+        return url
+
+    def _site_name(self, index):
+        return f"{self.rng.choice(_NAME_WORDS)}{self.rng.choice(_NAME_WORDS)}{index}"
+
+    def _sites(self):
+        rng = self.rng
+        sites = []
+        for i in range(rng.randint(*self.sites_per_file)):
+            if rng.random() < 0.15:
+                # 非 provide/vod 的爬虫站点
+                sites.append({"key": f"csp_{i}", "name": self._site_name(i), "type": 3, "api": f"csp_Spider{i}",
+                              "searchable": 1, "ext": f"https://raw.example.com/ext{i}.json"})
+            else:
+                sites.append({"key": f"site_{i}", "name": self._site_name(i), "type": 1, "api": self._site_url(),
+                              "searchable": 1, "quickSearch": 1, "filterable": 1})
+        return sites
+
+    def _json_content(self):
+        config = {
+            "spider": "https://raw.githubusercontent.com/example/tvbox/main/jar/custom.jar;md5;7dce8366",
+            "wallpaper": "https://picsum.photos/1080/",
+            "sites": self._sites(),
+            "lives": [{"name": "直播", "type": 0, "url": "https://live.example.com/tv.m3u"}],
+            "parses": [{"name": "解析", "type": 0, "url": "https://jx.example.com/?url="}],
+        }
+        return json.dumps(config, ensure_ascii=False, indent=self.rng.choice([2, 4]))
+
+    def _malformed_content(self):
+        rng = self.rng
+        lines = self._json_content().split('\n')
+        # 插入注释和 # 行、删掉部分右括号、随机让一些行单独成行
+        for _ in range(rng.randint(2, 8)):
+            lines.insert(rng.randrange(len(lines) + 1), rng.choice(_COMMENT_LINES))
+        if rng.random() < 0.5:
+            lines = [line for line in lines if line.strip() not in ('}', '},') or rng.random() < 0.7]
+        if rng.random() < 0.3:
+            lines = lines[rng.randint(1, 5):]
+        return '\n'.join(lines)
+
+    def _text_content(self):
+        rng = self.rng
+        lines = []
+        for i in range(rng.randint(*self.sites_per_file)):
+            url = self._site_url()
+            name = self._site_name(i)
+            lines.append(rng.choice([f"{name},{url}", f"{name} {url}", f"{name}：{url}", url, f"#{name}"]))
+            if rng.random() < 0.2:
+                lines.append(rng.choice(_COMMENT_LINES))
+        return '\n'.join(lines)
+
+    def _record(self, page, index):
+        rng = self.rng
+        kind = rng.choices(("json", "malformed", "text"), self.kind_weights)[0]
+        content = getattr(self, f"_{kind}_content")()
+        repo = f"tvbox{rng.randrange(500)}"
+        file_name = f"%E6%BA%90{index}.{rng.choice(['json', 'txt'])}#L{rng.randint(1, 99)}"
+        self.clock += datetime.timedelta(seconds=rng.randint(1, 5))
+        size_kb = len(content) / 1024
+        size_text = f"{size_kb:.2f}".rstrip('0').rstrip('.') + " KB"
+        return (f"\n{_REPORT_SEPARATOR}\n"
+                f"页面: {page} | 仓库: {repo} | 文件: {file_name}\n"
+                f"路径: {file_name}\n"
+                f"URL: https://github.com/user{rng.randrange(1000)}/{repo}/blob/{rng.getrandbits(160):040x}/{file_name}\n"
+                f"抓取时间: {self.clock.year}/{self.clock.month}/{self.clock.day} {self.clock:%H:%M:%S}\n"
+                f"文件大小: {size_text}\n"
+                f"{_REPORT_SEPARATOR}\n"
+                f"{content}\n")
+
+    def iter_chunks(self, size):
+        """逐个产出报告头和文件记录，总字节数达到 size 为止"""
+        header = (f"GitHub批量文件抓取结果报告\n{_REPORT_SEPARATOR}\n"
+                  f"生成时间: {self.clock.year}/{self.clock.month}/{self.clock.day} {self.clock:%H:%M:%S}\n"
+                  f"文件数量: -\n数据大小: {format_size(size)}\n处理页面: -\n成功率: 100%\n错误数: 0\n"
+                  f"{_REPORT_SEPARATOR}\n\n")
+        yield header
+        total = len(header.encode('utf-8'))
+        index = 0
+        while total < size:
+            record = self._record(index // 100 + 1, index)
+            index += 1
+            yield record if index == 1 else '\n' + record
+            total += len(record.encode('utf-8')) + 1
+
+    def generate(self, size):
+        """生成完整报告字符串"""
+        return ''.join(self.iter_chunks(size))
+
+    def write(self, path, size):
+        """流式写出报告到文件，返回写入的字节数"""
+        written = 0
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            for chunk in self.iter_chunks(size):
+                f.write(chunk)
+                written += len(chunk.encode('utf-8'))
+        return written
+
+
+def timed(func, *args, repeat=1):
+    """执行repeat次取最短耗时，返回(结果, 秒)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def bench_base58(args):
+    """Base58编解码基准：新编码器 vs 旧实现，并做往返校验；增长指数为相邻两档编码耗时的 log(t2/t1)/log(n2/n1)"""
+    sizes = [parse_size(s) for s in args.sizes]
+    legacy_max = parse_size(args.legacy_max)
+
+    print(f"{'大小':>8} | {'新编码(s)':>10} | {'预估(s)':>8} | {'增长指数':>8} | {'解码(s)':>10} | "
+          f"{'旧编码(s)':>10} | {'加速比':>8}")
+    print("-" * 84)
+    previous = None
+    for size in sizes:
+        payload = make_json_payload(size)
+        encoded, encode_time = timed(base58_encode, payload, repeat=args.repeat)
+        decoded, decode_time = timed(base58_decode, encoded, repeat=args.repeat)
+        if decoded != payload:
+            print(f"{format_size(size):>8} | 往返校验失败！")
+            return 1
+
+        if size <= legacy_max:
+            legacy, legacy_time = timed(legacy_base58_encode, payload)
+            if legacy != encoded:
+                print(f"{format_size(size):>8} | 与旧实现输出不一致！")
+                return 1
+            legacy_text = f"{legacy_time:10.3f}"
+            speedup_text = f"{legacy_time / encode_time:7.1f}x"
+        else:
+            # 旧实现是二次复杂度，大负载下要跑数小时，直接跳过
+            legacy_text = f"{'跳过':>10}"
+            speedup_text = f"{'-':>8}"
+
+        if previous is not None and size != previous[0] and encode_time > 0 and previous[1] > 0:
+            growth_text = f"{math.log(encode_time / previous[1]) / math.log(size / previous[0]):8.2f}"
+        else:
+            growth_text = f"{'-':>8}"
+        previous = (size, encode_time)
+        print(f"{format_size(size):>8} | {encode_time:10.3f} | {estimate_base58_seconds(len(payload)):8.3f} | "
+              f"{growth_text} | {decode_time:10.3f} | {legacy_text} | {speedup_text}")
+    return 0
+
+
+def bench_payload(args):
+    """Base58负载格式基准：raw（直接编码JSON）与 deflate（压缩后带版本头）的体积和编解码耗时，并做往返校验"""
+    print(f"{'JSON大小':>9} | {'格式':>7} | {'Base58大小':>10} | {'占JSON':>7} | {'编码(s)':>8} | {'解码(s)':>8}")
+    print("-" * 66)
+    for size in [parse_size(s) for s in args.sizes]:
+        payload = make_json_payload(size).encode('utf-8')
+        rows = [('raw', lambda: base58_encode(payload), lambda text: base58_decode(text, encoding=None))]
+        rows += [(codec, lambda codec=codec: encode_base58_payload(payload, codec), decode_base58_payload)
+                 for codec in args.codecs]
+        for name, encode, decode in rows:
+            encoded, encode_time = timed(encode, repeat=args.repeat)
+            decoded, decode_time = timed(decode, encoded, repeat=args.repeat)
+            if decoded != payload:
+                print(f"{format_size(size):>9} | {name:>7} | 往返校验失败！")
+                return 1
+            print(f"{format_size(len(payload)):>9} | {name:>7} | {format_size(len(encoded)):>10} | "
+                  f"{len(encoded) / len(payload):6.1%} | {encode_time:8.3f} | {decode_time:8.3f}")
+    return 0
+
+
+def make_minified_lines(site_count):
+    """一条记录中整个配置压缩在一行里（一行包含 site_count 个链接），旧实现对每个链接都重新提取整行的名称"""
+    sites = [{"key": f"站点{i}", "name": f"资源站{i}", "api": f"https://h{i}.example.com/api.php/provide/vod/"}
+             for i in range(site_count)]
+    return ["页面: 1 | 仓库: tvbox | 文件: min.json", json.dumps({"sites": sites}, ensure_ascii=False), ""]
+
+
+def check_lines_regression(processor, label, lines):
+    """当前行解析（列表输入和逐行迭代输入）与旧实现逐条比较，不一致时打印第一处差异并返回False"""
+    legacy = legacy_parse_lines_with_context(processor, lines)
+    for mode, current in (("列表", parse_lines_with_context(processor, lines)),
+                          ("迭代", parse_lines_with_context(processor, iter(lines)))):
+        if current == legacy:
+            continue
+        for index, (got, expected) in enumerate(zip(current, legacy)):
+            if got != expected:
+                print(f"{label}（{mode}输入）第 {index + 1} 条结果不一致: 当前 {got!r}，旧实现 {expected!r}")
+                break
+        print(f"{label}（{mode}输入）行解析结果与旧实现不一致！当前 {len(current)} 条，旧实现 {len(legacy)} 条")
+        return False
+    return True
+
+
+def bench_lines(args):
+    """行解析回归对照与基准：当前实现 vs 旧实现，结果必须完全一致，不一致时返回非0"""
+    with open(args.file, 'r', encoding='utf-8') as f:
+        cases = [(args.file, f.read().split('\n'))]
+    if args.minified_sites:
+        cases.append((f"单行配置({args.minified_sites} 个站点)", make_minified_lines(args.minified_sites)))
+
+    processor = VideoSourceProcessor()
+    # 比较的同时预热URL缓存，避免缓存命中率影响计时
+    for label, lines in cases:
+        if not check_lines_regression(processor, label, lines):
+            return 1
+
+    for label, lines in cases:
+        results, current_time = timed(parse_lines_with_context, processor, lines, repeat=args.repeat)
+        _, legacy_time = timed(legacy_parse_lines_with_context, processor, lines, repeat=args.repeat)
+        print(f"{label}: {len(lines)} 行，{len(results)} 条结果，与旧实现一致")
+        print(f"  当前实现: {current_time:.3f}s，旧实现: {legacy_time:.3f}s，加速比: {legacy_time / current_time:.1f}x")
+    return 0
+
+
+def bench_names(args):
+    """行内候选名称提取基准：对文件的每一行比较当前实现与旧版三条正则，结果必须完全一致"""
+    with open(args.file, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f.read().split('\n')]
+
+    processor = VideoSourceProcessor()
+    extract = processor._extract_potential_names_from_line
+    for number, line in enumerate(lines, 1):
+        got, expected = extract(line), legacy_extract_potential_names(line)
+        if got != expected:
+            print(f"第 {number} 行结果不一致: 当前 {got!r}，旧实现 {expected!r}")
+            return 1
+
+    def run(func):
+        return sum(len(func(line)) for line in lines)
+
+    name_count, current_time = timed(run, extract, repeat=args.repeat)
+    _, legacy_time = timed(run, legacy_extract_potential_names, repeat=args.repeat)
+    print(f"文件: {args.file}，{len(lines)} 行，{name_count} 个候选名称，与旧实现一致")
+    print(f"当前实现: {current_time:.3f}s ({current_time / len(lines) * 1e6:.2f} us/行)，"
+          f"旧实现: {legacy_time:.3f}s ({legacy_time / len(lines) * 1e6:.2f} us/行)，"
+          f"加速比: {legacy_time / current_time:.1f}x")
+    return 0
+
+
+def bench_urls(args):
+    """URL校验基准：逐条 extract_actual_url（冷/热缓存）vs 批量 validate_urls，结果必须一致"""
+    with open(args.file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    # 与两个提取器看到的候选一致：行内URL + 片段中 api/base_url 字段的值
+    urls = re.findall(r'https?://[^\s\'"<>,]+', content)
+    urls += re.findall(r'"(?:api|base_url|name|key)"\s*:\s*"([^"]+)"', content)
+
+    def per_url_cold():
+        processor = VideoSourceProcessor()
+        return [processor.extract_actual_url(url) for url in urls]
+
+    warm_processor = VideoSourceProcessor()
+    warm_processor.validate_urls(urls)
+    per_url_cold()
+
+    def per_url_warm():
+        return [warm_processor.extract_actual_url(url) for url in urls]
+
+    per_url_warm()
+
+    def batch_cold():
+        return VideoSourceProcessor().validate_urls(urls)
+
+    expected, cold_time = timed(per_url_cold, repeat=args.repeat)
+    _, warm_time = timed(per_url_warm, repeat=args.repeat)
+    got, batch_time = timed(batch_cold, repeat=args.repeat)
+    _, batch_warm_time = timed(warm_processor.validate_urls, urls, repeat=args.repeat)
+    if got != expected:
+        for url, a, b in zip(urls, got, expected):
+            if a != b:
+                print(f"结果不一致: {url!r} 批量 {a!r}，逐条 {b!r}")
+                break
+        return 1
+
+    unique_count = len(set(urls))
+    valid_count = sum(1 for url in expected if url)
+    print(f"文件: {args.file}，{len(urls)} 个候选URL（{unique_count} 个不同），有效 {valid_count} 个，批量与逐条结果一致")
+    for label, elapsed in (("逐条(冷缓存)", cold_time), ("逐条(热缓存)", warm_time),
+                           ("批量(冷缓存)", batch_time), ("批量(热缓存)", batch_warm_time)):
+        print(f"{label:<10}: {elapsed * 1000:8.1f} ms，{len(urls) / elapsed / 1000:8.1f} 千条/秒")
+    return 0
+
+
+def bench_json(args):
+    """JSON遍历基准：显式栈遍历 vs 旧版递归解析，结果必须一致；并检查超深文档"""
+    data = make_tvbox_config(args.sites)
+    processor = VideoSourceProcessor()
+    # 先预热URL缓存，只比较遍历本身
+    current = processor._parse_json_data(data)
+    legacy = legacy_parse_json_data(processor, data)
+    if current != legacy:
+        print(f"遍历结果与旧实现不一致！当前 {len(current)} 条，旧实现 {len(legacy)} 条")
+        return 1
+
+    _, current_time = timed(processor._parse_json_data, data, repeat=args.repeat)
+    _, legacy_time = timed(legacy_parse_json_data, processor, data, repeat=args.repeat)
+    print(f"合成配置: {args.sites} 个站点，提取到 {len(current)} 条结果，与旧实现一致")
+    print(f"当前实现: {current_time:.3f}s，旧实现: {legacy_time:.3f}s，加速比: {legacy_time / current_time:.1f}x")
+
+    deep = make_deep_json(args.depth)
+    deep_results = processor._parse_json_data(deep)
+    try:
+        legacy_parse_json_data(processor, deep)
+        legacy_text = "成功"
+    except RecursionError:
+        legacy_text = "RecursionError"
+    print(f"嵌套 {args.depth} 层的文档: 当前实现提取到 {len(deep_results)} 条，旧实现: {legacy_text}")
+    return 0 if deep_results == [("最内层", "https://deep.example.com/api.php/provide/vod")] else 1
+
+
+def legacy_save_outputs(data, json_file, base58_file):
+    """旧版写出流程：json.dump(indent=4) 直接写目标文件，再用 json.dumps 重新序列化一遍做Base58"""
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    json_str = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    with open(base58_file, 'w', encoding='utf-8') as f:
+        f.write(base58_encode(json_str))
+
+
+def bench_write(args):
+    """输出写入基准：旧流程 vs 当前流程（格式化/紧凑），输出内容必须一致"""
+    processor = VideoSourceProcessor()
+    print(f"紧凑JSON后端: {json_backend_name()}")
+    print(f"{'条目数':>8} | {'JSON大小':>9} | {'旧流程(s)':>10} | {'当前(s)':>10} | {'紧凑模式(s)':>11} | {'仅序列化 旧/当前(ms)':>20}")
+    print("-" * 86)
+    # 大输出的Base58编码会打印耗时警告，计时期间关掉
+    level = logger.level
+    logger.setLevel(logging.ERROR)
+    try:
+        return _bench_write_entries(processor, args)
+    finally:
+        logger.setLevel(level)
+
+
+def _bench_write_entries(processor, args):
+    """bench_write 的逐个条目数计时"""
+    with tempfile.TemporaryDirectory() as directory:
+        def path(name):
+            return os.path.join(directory, name)
+
+        def read(name):
+            with open(path(name), 'rb') as f:
+                return f.read()
+
+        for count in args.entries:
+            # 名称中带引号、反斜杠和 ": "，检查两种格式的转义都与旧流程一致
+            data = processor.generate_json_output(
+                [(f'资源{i}' if i % 50 else f'资源": {i} \\"', f"https://zy{i}.example.com/api.php/provide/vod")
+                 for i in range(count)])
+
+            def current(compact):
+                serialized = processor.save_results(data, path("current.json"), "json", compact=compact)
+                # 紧凑JSON只序列化一次，同一份字节用于Base58编码；格式化JSON的Base58输入另行紧凑序列化
+                processor.save_base58_encoded_results(data, path("current_base58.txt"),
+                                                      serialized=serialized if compact else None)
+
+            _, legacy_time = timed(legacy_save_outputs, data, path("legacy.json"), path("legacy_base58.txt"),
+                                   repeat=args.repeat)
+            _, compact_time = timed(current, True, repeat=args.repeat)
+            compact_base58 = read("current_base58.txt")
+            _, current_time = timed(current, False, repeat=args.repeat)
+
+            if read("current.json") != read("legacy.json") or read("current_base58.txt") != read("legacy_base58.txt"):
+                print(f"{count:>8} | 输出与旧流程不一致！")
+                return 1
+            if compact_base58 != read("legacy_base58.txt"):
+                print(f"{count:>8} | 紧凑模式的Base58输出与旧流程不一致！")
+                return 1
+
+            # 只看序列化本身：旧流程两次标准库序列化 vs 当前格式化JSON + serialize_json 的紧凑输出
+            _, legacy_dump_time = timed(lambda: (json.dumps(data, ensure_ascii=False, indent=4),
+                                                 json.dumps(data, ensure_ascii=False, separators=(',', ':'))),
+                                        repeat=args.repeat)
+            _, current_dump_time = timed(lambda: (serialize_json(data, compact=False), serialize_json(data)),
+                                         repeat=args.repeat)
+            size = format_size(len(read("current.json")))
+            print(f"{count:>8} | {size:>9} | {legacy_time:10.3f} | {current_time:10.3f} | {compact_time:11.3f} | "
+                  f"{legacy_dump_time * 1000:9.1f} / {current_dump_time * 1000:<9.1f}")
+    return 0
+
+
+def make_generator(args):
+    """按命令行参数构造 CrawlReportGenerator"""
+    return CrawlReportGenerator(json_ratio=args.json, malformed_ratio=args.malformed, text_ratio=args.text,
+                                proxy_ratio=args.proxy, hosts=args.hosts, seed=args.seed)
+
+
+def bench_generate(args):
+    """生成合成抓取报告文件"""
+    size = parse_size(args.size)
+    start = time.perf_counter()
+    written = make_generator(args).write(args.output, size)
+    print(f"已生成 {args.output}: {format_size(written)}，耗时 {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+SUITE_STAGES = ('parse_file_content', 'remove_duplicates', 'generate_json_output', 'base58_encode')
+
+
+def run_suite(content, repeat):
+    """依次计时 SUITE_STAGES 中的各阶段，返回 {阶段: {seconds, bytes_in, records_out}}
+
+    parse_file_content 每次都用新的处理器，避免URL缓存在重复之间预热。
+    """
+    content_bytes = len(content.encode('utf-8'))
+    (valid, invalid), parse_time = timed(
+        lambda: VideoSourceProcessor().parse_file_content(content, "file1"), repeat=repeat)
+    processor = VideoSourceProcessor()
+    unique, dedup_time = timed(lambda: processor.remove_duplicates(valid)[0], repeat=repeat)
+    output, output_time = timed(processor.generate_json_output, unique, repeat=repeat)
+    serialized = serialize_json(output)
+    _, base58_time = timed(base58_encode, serialized, repeat=repeat)
+    return {
+        'parse_file_content': {'seconds': parse_time, 'bytes_in': content_bytes,
+                               'records_out': len(valid), 'invalid': len(invalid)},
+        'remove_duplicates': {'seconds': dedup_time, 'records_in': len(valid), 'records_out': len(unique)},
+        'generate_json_output': {'seconds': output_time, 'records_in': len(unique), 'records_out': len(output['api_site'])},
+        'base58_encode': {'seconds': base58_time, 'bytes_in': len(serialized)},
+    }
+
+
+def suite_config(args):
+    """基线里记录的输入配置，配置不同时的比较没有意义"""
+    if args.file:
+        return {'file': os.path.abspath(args.file), 'size': os.path.getsize(args.file)}
+    return {'size': parse_size(args.size), 'json': args.json, 'malformed': args.malformed, 'text': args.text,
+            'proxy': args.proxy, 'hosts': args.hosts, 'seed': args.seed}
+
+
+def bench_suite(args):
+    """分阶段基准：解析、去重、生成JSON、Base58编码分别计时，并与保存的基线比较"""
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        print(f"输入: {args.file}")
+    else:
+        content = make_generator(args).generate(parse_size(args.size))
+        print(f"输入: 合成抓取报告 {args.size}（json {args.json} / 不规范 {args.malformed} / 纯文本 {args.text}，"
+              f"代理 {args.proxy}，种子 {args.seed}）")
+
+    config = suite_config(args)
+    results = run_suite(content, args.repeat)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != config:
+            print(f"警告: 基线 {args.baseline} 的输入配置与本次不同，比较结果仅供参考")
+
+    regressions = []
+    print(f"{'阶段':<22} | {'耗时(s)':>9} | {'吞吐':>12} | {'记录数':>14} | {'基线(s)':>9} | {'变化':>8}")
+    print("-" * 90)
+    for stage in SUITE_STAGES:
+        stats = results[stage]
+        seconds = stats['seconds']
+        if 'bytes_in' in stats:
+            throughput = f"{stats['bytes_in'] / 1024 ** 2 / seconds:8.1f}MB/s" if seconds else '-'
+        else:
+            throughput = f"{stats['records_in'] / seconds:8.0f}条/s" if seconds else '-'
+        records = f"{stats.get('records_in', '-')}→{stats.get('records_out', '-')}"
+        baseline_text, change_text = f"{'-':>9}", f"{'-':>8}"
+        if baseline and stage in baseline.get('stages', {}):
+            base_seconds = baseline['stages'][stage]['seconds']
+            baseline_text = f"{base_seconds:9.3f}"
+            if base_seconds:
+                change = seconds / base_seconds - 1
+                change_text = f"{change:+7.0%}"
+                if change > args.tolerance:
+                    regressions.append((stage, base_seconds, seconds))
+                    change_text += '!'
+        print(f"{stage:<22} | {seconds:9.3f} | {throughput:>12} | {records:>14} | {baseline_text} | {change_text:>8}")
+
+    if args.save_baseline:
+        write_file_atomic(args.baseline, json.dumps({'config': config, 'stages': results},
+                                                    ensure_ascii=False, indent=4))
+        print(f"基线已保存到 {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"没有找到基线 {args.baseline}，使用 --save-baseline 保存本次结果作为基线")
+        return 0
+    if regressions:
+        for stage, base_seconds, seconds in regressions:
+            print(f"性能回退: {stage} {base_seconds:.3f}s → {seconds:.3f}s（容差 {args.tolerance:.0%}）")
+        return 1
+    print(f"所有阶段均在基线的 {args.tolerance:.0%} 容差之内")
+    return 0
+
+
+def legacy_record_pipeline(file1_data, file2_data):
+    """旧版 (名称, 链接) 元组流程：去重、比较过滤时重新创建元组，汇总时拼接列表"""
+    def dedup(data):
+        seen = set()
+        unique, duplicate = [], []
+        for name, url in data:
+            key = canonical_url_key(url)
+            if key not in seen:
+                seen.add(key)
+                unique.append((name, url))
+            else:
+                duplicate.append((name, url))
+        return unique, duplicate
+
+    file1_unique, file1_duplicate = dedup(file1_data)
+    file2_unique, file2_duplicate = dedup(file2_data)
+    file2_keys = {canonical_url_key(url) for _, url in file2_unique}
+    filtered = [(name, url) for name, url in file1_unique if canonical_url_key(url) not in file2_keys]
+    return file1_unique, file1_duplicate, file2_unique, file2_duplicate, filtered, file2_unique + filtered
+
+
+def current_record_pipeline(processor, file1_data, file2_data):
+    """当前流程：记录原样穿过 remove_duplicates / compare_and_filter"""
+    file1_unique, file1_duplicate = processor.remove_duplicates(file1_data)
+    file2_unique, file2_duplicate = processor.remove_duplicates(file2_data)
+    filtered = processor.compare_and_filter(file1_unique, file2_unique)
+    # 与 run_pipeline 相同，汇总列表由文件2的唯一数据就地扩展，不再复制
+    combined = file2_unique
+    combined.extend(filtered)
+    return file1_unique, file1_duplicate, file2_unique, file2_duplicate, filtered, combined
+
+
+def traced_size(build):
+    """执行 build()，返回 (结果, 结果仍被引用时新增的内存字节数)"""
+    tracemalloc.start()
+    try:
+        result = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def bench_records(args):
+    """提取结果的内存占用：旧版 (名称, 链接) 元组列表 vs 驻留字符串的 SourceRecord，各自走一遍去重/比较/汇总"""
+    content = make_generator(args).generate(parse_size(args.size))
+    extracted, _ = VideoSourceProcessor().parse_file_content(content, "file1")
+    baseline = extracted[:len(extracted) // 10]
+    del content
+
+    def fresh(text):
+        # 旧版每次提取都从行或片段中切出新的字符串
+        return text.encode('utf-8').decode('utf-8')
+
+    raw = [(fresh(record.name), fresh(record.url), record.line) for record in extracted]
+    raw_baseline = [(fresh(record.name), fresh(record.url), record.line) for record in baseline]
+    del extracted, baseline
+
+    def build_tuples():
+        file1 = [(fresh(name), fresh(url)) for name, url, _ in raw]
+        file2 = [(fresh(name), fresh(url)) for name, url, _ in raw_baseline]
+        return file1, file2, legacy_record_pipeline(file1, file2)
+
+    processor = VideoSourceProcessor()
+
+    def build_records():
+        # 与解析器相同：由未驻留的新字符串创建记录，驻留表随处理器一起保留
+        file1 = [processor._make_record(fresh(name), fresh(url), line) for name, url, line in raw]
+        file2 = [processor._make_record(fresh(name), fresh(url), line) for name, url, line in raw_baseline]
+        processor.set_record_source(file1, "file1.txt")
+        processor.set_record_source(file2, "basic.json")
+        return file1, file2, current_record_pipeline(processor, file1, file2), processor._interned
+
+    tuples, tuple_size = traced_size(build_tuples)
+    records, record_size = traced_size(build_records)
+    if tuples[2][5] != records[2][5]:
+        print("两种表示的汇总结果不一致！")
+        return 1
+
+    unique_names = len({name for name, _, _ in raw})
+    unique_urls = len({url for _, url, _ in raw})
+    print(f"提取结果: {len(raw)} 条（不同名称 {unique_names} 个，不同链接 {unique_urls} 个），基准 {len(raw_baseline)} 条，"
+          f"汇总 {len(records[2][5])} 条")
+    print(f"{'表示':<22} | {'内存':>10} | {'每条':>8}")
+    print("-" * 48)
+    for label, size in (("(名称, 链接) 元组列表", tuple_size), ("SourceRecord + 驻留", record_size)):
+        print(f"{label:<22} | {format_size(size):>10} | {size / len(raw):6.0f} B")
+    print(f"节省: {(1 - record_size / tuple_size) * 100:.1f}%（SourceRecord 额外带有来源文件和行号）")
+    return 0
+
+
+class StandInServer:
+    """本地替身HTTP服务，按路径模拟资源站的各种状态，并统计每个端口的最大并发连接数
+
+    /ok/<毫秒>   延迟指定毫秒后返回200
+    /dead        返回503
+    /hang        不返回任何数据（用于测试超时）
+    /garbage     返回非HTTP响应
+    /longline    返回超过64KB的状态行
+    """
+
+    def __init__(self):
+        self.servers = []
+        self.active = {}
+        self.peak = {}
+        self.total_active = 0
+        self.total_peak = 0
+
+    async def start(self, count):
+        for _ in range(count):
+            server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+            self.servers.append(server)
+        return [server.sockets[0].getsockname()[1] for server in self.servers]
+
+    async def stop(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        port = writer.get_extra_info('sockname')[1]
+        self.active[port] = self.active.get(port, 0) + 1
+        self.peak[port] = max(self.peak.get(port, 0), self.active[port])
+        self.total_active += 1
+        self.total_peak = max(self.total_peak, self.total_active)
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+            path = request_line.split()[1].decode() if len(request_line.split()) > 1 else '/'
+            if path.startswith('/ok/'):
+                await asyncio.sleep(int(path.split('/')[2]) / 1000)
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}')
+            elif path.startswith('/dead'):
+                writer.write(b'HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n')
+            elif path.startswith('/hang'):
+                # 不响应，直到客户端超时断开
+                await reader.read()
+            elif path.startswith('/longline'):
+                writer.write(b'HTTP/1.1 200 ' + b'x' * 70000 + b'\r\n\r\n')
+            else:
+                writer.write(b'<html>not http</html>\r\n')
+            await writer.drain()
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            self.active[port] -= 1
+            self.total_active -= 1
+            writer.close()
+
+
+def bench_probe(args):
+    """可用性探测自检：对本地替身服务探测，校验结果、每主机并发上限和超时"""
+    async def run():
+        server = StandInServer()
+        ports = await server.start(args.hosts)
+        rng = random.Random(0)
+        expected = {}
+        for port in ports:
+            for i in range(args.per_host_urls):
+                kind = rng.choice(['ok', 'ok', 'ok', 'dead', 'hang', 'garbage', 'longline'])
+                path = f"/ok/{rng.randrange(args.max_delay_ms)}" if kind == 'ok' else f"/{kind}"
+                url = f"http://127.0.0.1:{port}{path}/api.php/provide/vod?i={i}"
+                expected[url] = kind
+        # 一个没有服务监听的端口，模拟连接失败
+        closed = await asyncio.start_server(lambda r, w: None, '127.0.0.1', 0)
+        closed_port = closed.sockets[0].getsockname()[1]
+        closed.close()
+        await closed.wait_closed()
+        expected[f"http://127.0.0.1:{closed_port}/api.php/provide/vod"] = 'refused'
+        # 无法解析的链接和没有主机名的链接，只记录错误，不能中断整批探测
+        expected["http://[fe80::1/api.php/provide/vod"] = 'invalid'
+        expected["http:///api.php/provide/vod"] = 'invalid'
+        # 能通过链接校验、但主机名无法编码的链接：空的段、超过63个字符的段
+        expected["http://a..b/api.php/provide/vod"] = 'invalid'
+        expected[f"http://{'a' * 64}.example.com/api.php/provide/vod"] = 'invalid'
+
+        start = time.perf_counter()
+        results = await _probe_urls(list(expected), args.concurrency, args.per_host, args.timeout)
+        elapsed = time.perf_counter() - start
+        await server.stop()
+        return server, expected, results, elapsed
+
+    server, expected, results, elapsed = asyncio.run(run())
+
+    failures = 0
+    for url, kind in expected.items():
+        result = results[url]
+        ok = {
+            'ok': result["alive"] and result["status"] == 200 and result["latency_ms"] is not None,
+            'dead': not result["alive"] and result["status"] == 503,
+            'hang': not result["alive"] and result.get("error") == "timeout",
+            'garbage': not result["alive"] and result.get("error", "").startswith("bad status line"),
+            'longline': not result["alive"] and result.get("error", "").startswith("bad response"),
+            'refused': not result["alive"] and result.get("error", "").startswith("connect"),
+            'invalid': not result["alive"] and result.get("error", "").startswith("invalid url"),
+        }[kind]
+        if not ok:
+            failures += 1
+            print(f"结果不符合预期 ({kind}): {url} -> {result}")
+
+    peak_per_host = max(server.peak.values(), default=0)
+    print(f"探测 {len(expected)} 个链接 ({args.hosts} 个主机)，耗时 {elapsed:.2f}s")
+    print(f"每主机最大并发: {peak_per_host} (上限 {args.per_host})，总最大并发: {server.total_peak} (上限 {args.concurrency})")
+    if peak_per_host > args.per_host or server.total_peak > args.concurrency:
+        print("并发超过上限！")
+        failures += 1
+    if failures:
+        print(f"自检失败: {failures} 项")
+        return 1
+    print("自检通过")
+    return 0
+
+
+_SERVE_PATH = "/combined_sources.json"
+
+
+def _serve_in_process(payload, conn):
+    """子进程中运行订阅服务（单核），通过 conn 收发端口、替换内容的指令和响应统计"""
+    async def run():
+        loop = asyncio.get_running_loop()
+        server = SubscriptionServer()
+        server.publish(_SERVE_PATH, ServedBody(payload, "application/json; charset=utf-8"))
+        conn.send(await server.start('127.0.0.1', 0))
+        while True:
+            command = await loop.run_in_executor(None, conn.recv)
+            if command is None:
+                break
+            server.publish(_SERVE_PATH, ServedBody(command, "application/json; charset=utf-8"))
+            conn.send("published")
+        conn.send(dict(server.stats))
+        await server.close()
+
+    asyncio.run(run())
+
+
+async def _http_get(reader, writer, headers=""):
+    """在已建立的 keep-alive 连接上发送一个GET请求，返回 (状态码, 响应头字典, 响应体)"""
+    writer.write(f"GET {_SERVE_PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\n{headers}\r\n".encode('latin-1'))
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    response_headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name:
+            response_headers[name.strip().lower()] = value.strip()
+    length = int(response_headers.get('content-length', 0)) if lines[0].split()[1] != '304' else 0
+    body = await reader.readexactly(length) if length else b''
+    return int(lines[0].split()[1]), response_headers, body
+
+
+def bench_serve(args):
+    """订阅服务基准：子进程（单核）运行 serve 模式的HTTP服务，校验 ETag/304/gzip/热替换，并测量轮询吞吐"""
+    payload = make_json_payload(parse_size(args.size)).encode('utf-8')
+    updated = make_json_payload(parse_size(args.size), seed=1).encode('utf-8')
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve_in_process, args=(payload, child_conn), daemon=True)
+    process.start()
+    port = parent_conn.recv()
+    failures = []
+
+    async def check():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        status, headers, body = await _http_get(reader, writer, "Accept-Encoding: gzip\r\n")
+        if status != 200 or headers.get('content-encoding') != 'gzip' or gzip.decompress(body) != payload:
+            failures.append(f"gzip响应不正确: {status} {headers}")
+        etag = headers.get('etag', '')
+        status, _, body = await _http_get(reader, writer)
+        if status != 200 or body != payload:
+            failures.append(f"未压缩响应不正确: {status}")
+        status, _, _ = await _http_get(reader, writer, f"If-None-Match: {etag}\r\nAccept-Encoding: gzip\r\n")
+        if status != 304:
+            failures.append(f"ETag相同时应返回304，实际 {status}")
+
+        # 热替换后旧ETag失效，同一个连接上立即拿到新内容
+        await asyncio.get_running_loop().run_in_executor(None, lambda: (parent_conn.send(updated), parent_conn.recv()))
+        status, headers, body = await _http_get(reader, writer, f"If-None-Match: {etag}\r\nAccept-Encoding: gzip\r\n")
+        if status != 200 or gzip.decompress(body) != updated or headers.get('etag') == etag:
+            failures.append(f"热替换后应返回新内容，实际 {status} {headers}")
+        writer.close()
+        return headers.get('etag', '')
+
+    async def poll(etag):
+        request = (f"GET {_SERVE_PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept-Encoding: gzip, br\r\n"
+                   f"If-None-Match: {etag}\r\n\r\n").encode('latin-1')
+
+        async def client():
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            for _ in range(args.requests):
+                writer.write(request)
+                head = await reader.readuntil(b'\r\n\r\n')
+                if not head.startswith(b'HTTP/1.1 304'):
+                    failures.append(f"轮询应返回304: {head[:40]!r}")
+                    break
+            writer.close()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.clients)))
+        return time.perf_counter() - start
+
+    async def run():
+        etag = await check()
+        return await poll(etag)
+
+    try:
+        elapsed = asyncio.run(run())
+        parent_conn.send(None)
+        stats = parent_conn.recv()
+    finally:
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+    total = args.clients * args.requests
+    print(f"内容: {format_size(len(payload))} (gzip {format_size(len(gzip.compress(payload, 9)))})，"
+          f"{args.clients} 个 keep-alive 客户端各轮询 {args.requests} 次")
+    print(f"条件请求: {total} 次，耗时 {elapsed:.2f}s，吞吐 {total / elapsed:.0f} 次/秒（服务端单进程）")
+    print(f"服务端响应统计: {stats}")
+    if failures:
+        for failure in failures[:10]:
+            print(failure)
+        print(f"自检失败: {len(failures)} 项")
+        return 1
+    print("自检通过")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="shipinywan.py 性能基准测试")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    base58_parser = subparsers.add_parser('base58', help="Base58编解码基准")
+    base58_parser.add_argument('--sizes', nargs='+', default=['10KB', '100KB', '1MB', '2MB'],
+                               help="测试负载大小列表，默认 10KB 100KB 1MB 2MB（1MB以上才能看清增长趋势）")
+    base58_parser.add_argument('--legacy-max', default='100KB',
+                               help="旧实现参与对比的最大负载，默认 100KB（旧实现为二次复杂度）")
+    base58_parser.add_argument('--repeat', type=int, default=1, help="每项重复次数，取最短耗时")
+    base58_parser.set_defaults(func=bench_base58)
+
+    payload_parser = subparsers.add_parser('payload', help="Base58负载格式（raw / deflate）的体积与耗时")
+    payload_parser.add_argument('--sizes', nargs='+', default=['10KB', '100KB', '1MB'],
+                                help="JSON负载大小列表，默认 10KB 100KB 1MB（Base58约 n^1.2，10MB需数分钟）")
+    payload_parser.add_argument('--codecs', nargs='+', default=['deflate'], choices=['none', 'deflate'],
+                                help="参与对比的带版本头格式，默认 deflate")
+    payload_parser.add_argument('--repeat', type=int, default=3, help="每项重复次数，取最短耗时")
+    payload_parser.set_defaults(func=bench_payload)
+
+    lines_parser = subparsers.add_parser('lines', help="行解析基准与旧实现回归对照")
+    lines_parser.add_argument('file', nargs='?', default='shipinywan.txt', help="抓取结果文件，默认 shipinywan.txt")
+    lines_parser.add_argument('--minified-sites', type=int, default=300,
+                              help="额外对照的单行配置中的站点数，0 表示不对照，默认 300")
+    lines_parser.add_argument('--repeat', type=int, default=3, help="每项重复次数，取最短耗时")
+    lines_parser.set_defaults(func=bench_lines)
+
+    names_parser = subparsers.add_parser('names', help="行内候选名称提取基准与旧实现回归对照")
+    names_parser.add_argument('file', nargs='?', default='shipinywan.txt', help="抓取结果文件，默认 shipinywan.txt")
+    names_parser.add_argument('--repeat', type=int, default=5, help="每项重复次数，取最短耗时")
+    names_parser.set_defaults(func=bench_names)
+
+    urls_parser = subparsers.add_parser('urls', help="逐条与批量URL校验基准")
+    urls_parser.add_argument('file', nargs='?', default='shipinywan.txt', help="抓取结果文件，默认 shipinywan.txt")
+    urls_parser.add_argument('--repeat', type=int, default=5, help="每项重复次数，取最短耗时")
+    urls_parser.set_defaults(func=bench_urls)
+
+    json_parser = subparsers.add_parser('json', help="JSON遍历基准与旧实现回归对照")
+    json_parser.add_argument('--sites', type=int, default=100000, help="合成配置中的站点数，默认 100000")
+    json_parser.add_argument('--depth', type=int, default=100000, help="超深文档的嵌套层数，默认 100000")
+    json_parser.add_argument('--repeat', type=int, default=3, help="每项重复次数，取最短耗时")
+    json_parser.set_defaults(func=bench_json)
+
+    write_parser = subparsers.add_parser('write', help="输出写入（JSON + Base58）基准")
+    write_parser.add_argument('--entries', type=int, nargs='+', default=[500, 5000],
+                              help="汇总JSON的条目数列表，默认 500 5000（Base58编码占大部分时间，条目多时很慢）")
+    write_parser.add_argument('--repeat', type=int, default=3, help="每项重复次数，取最短耗时")
+    write_parser.set_defaults(func=bench_write)
+
+    probe_parser = subparsers.add_parser('probe', help="可用性探测自检（本地替身服务）")
+    probe_parser.add_argument('--hosts', type=int, default=8, help="替身主机（端口）数，默认 8")
+    probe_parser.add_argument('--per-host-urls', type=int, default=20, help="每个主机的链接数，默认 20")
+    probe_parser.add_argument('--max-delay-ms', type=int, default=200, help="可用链接的最大响应延迟，默认 200ms")
+    probe_parser.add_argument('--concurrency', type=int, default=8, help="总并发数，默认 8")
+    probe_parser.add_argument('--per-host', type=int, default=2, help="每主机并发连接数，默认 2")
+    probe_parser.add_argument('--timeout', type=float, default=0.5, help="单次探测超时秒数，默认 0.5")
+    probe_parser.set_defaults(func=bench_probe)
+
+    serve_parser = subparsers.add_parser('serve', help="订阅服务自检与轮询吞吐（ETag/304/gzip/热替换）")
+    serve_parser.add_argument('--size', default='1MB', help="提供的汇总JSON大小，默认 1MB")
+    serve_parser.add_argument('--clients', type=int, default=64, help="并发 keep-alive 客户端数，默认 64")
+    serve_parser.add_argument('--requests', type=int, default=200, help="每个客户端的轮询次数，默认 200")
+    serve_parser.set_defaults(func=bench_serve)
+
+    def add_generator_arguments(sub_parser, default_size):
+        sub_parser.add_argument('--size', default=default_size, help=f"报告大小（1MB ~ 1GB），默认 {default_size}")
+        sub_parser.add_argument('--json', type=float, default=0.4, help="完整JSON文件的比例，默认 0.4")
+        sub_parser.add_argument('--malformed', type=float, default=0.4,
+                                help="不规范JSON（注释、缺括号等）的比例，默认 0.4")
+        sub_parser.add_argument('--text', type=float, default=0.2, help="纯文本（名称,链接）的比例，默认 0.2")
+        sub_parser.add_argument('--proxy', type=float, default=0.1, help="代理包装链接的比例，默认 0.1")
+        sub_parser.add_argument('--hosts', type=int, default=2000, help="不同资源站的数量，默认 2000")
+        sub_parser.add_argument('--seed', type=int, default=0, help="随机种子，默认 0")
+
+    generate_parser = subparsers.add_parser('generate', help="生成合成抓取报告（codecatch 报告格式）")
+    generate_parser.add_argument('output', help="输出文件路径")
+    add_generator_arguments(generate_parser, '100MB')
+    generate_parser.set_defaults(func=bench_generate)
+
+    suite_parser = subparsers.add_parser('suite', help="分阶段基准（解析/去重/生成JSON/Base58），与基线比较")
+    suite_parser.add_argument('--file', help="使用已有的抓取结果文件，不指定时生成合成报告")
+    add_generator_arguments(suite_parser, '10MB')
+    suite_parser.add_argument('--repeat', type=int, default=3, help="每项重复次数，取最短耗时")
+    suite_parser.add_argument('--baseline', default='benchmark_baseline.json',
+                              help="基线文件，默认 benchmark_baseline.json")
+    suite_parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    suite_parser.add_argument('--tolerance', type=float, default=0.25,
+                              help="允许比基线慢的比例，超出时返回非0，默认 0.25")
+    suite_parser.set_defaults(func=bench_suite)
+
+    records_parser = subparsers.add_parser('records', help="提取结果内存占用：元组列表 vs SourceRecord")
+    add_generator_arguments(records_parser, '20MB')
+    records_parser.set_defaults(func=bench_records)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
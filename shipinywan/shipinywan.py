@@ -1,43 +1,377 @@
 import json
 import re
+import os
+import ssl
+import time
+import asyncio
+import hashlib
+import math
+import decimal
+import functools
+import itertools
+import mmap
+import bisect
+import contextlib
+import datetime
+import glob
+import gzip
+import zlib
+import struct
+import email.utils
+import unicodedata
+import posixpath
+import io
 import urllib.parse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import deque, Counter, OrderedDict, namedtuple
 from threading import Lock
 import logging
 import argparse
 import sys
 
+# 可选的更快JSON后端，只用于紧凑格式：orjson > ujson > 标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+# 可选的brotli压缩，serve 模式有它时额外提供 br 版本
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # logger实例在全局获取，但配置在main函数中进行
 logger = logging.getLogger(__name__)
 
 
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+# 数字值(0-57) <-> 字母表字符 的转换表，配合 bytes.translate 一次完成映射
+_BASE58_ENCODE_TABLE = bytes(BASE58_ALPHABET.encode('ascii')).ljust(256, b'\0')
+_BASE58_DECODE_TABLE = bytes(
+    BASE58_ALPHABET.find(chr(i)) if chr(i) in BASE58_ALPHABET else 0xFF for i in range(256)
+)
+
+# 叶子块内每次除以 58^5：58^5 < 2^30，正好落在CPython单个digit内，走快速的单字除法路径
+_BASE58_CHUNK_DIGITS = 5
+_BASE58_CHUNK_BASE = 58 ** _BASE58_CHUNK_DIGITS
+# 叶子块大小(位数)，超过时按 base^(2^k) 分治拆分
+_BASE_CONV_LEAF = 1024
+
+# 分治部分使用decimal：libmpdec的大数乘法/除法是次二次的，而CPython 3.11的int除法是二次的
+_BIGNUM_CONTEXT = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+
+# 每个Base58字符承载的字节数，以及每个字节需要的Base58字符数
+_BYTES_PER_BASE58_DIGIT = math.log(58, 256)
+_BASE58_DIGITS_PER_BYTE = math.log(256, 58)
+
+# 进制转换每层做一次大数除法，除法本身约等于常数倍的大数乘法 M(n)（libmpdec 的乘法基于数论变换，
+# 约 O(n log n)），分治共 log n 层，所以总耗时约 O(M(n)·log n)，比 O(n log n) 差；
+# 实测近似 n^1.2：100KB 约0.55s，1MB 约8.6s，2MB 约20s（python benchmark.py base58 可复测）；
+# 保存时待编码内容超过 BASE58_WARN_SIZE 字节会先提示预计耗时
+BASE58_WARN_SIZE = 512 * 1024
+_BASE58_SECONDS_PER_MB = 8.6
+_BASE58_GROWTH_EXPONENT = 1.2
+
+
+def estimate_base58_seconds(size):
+    """按实测的幂律估算编码 size 字节所需的秒数"""
+    return _BASE58_SECONDS_PER_MB * (size / (1024 * 1024)) ** _BASE58_GROWTH_EXPONENT
+
+
+@functools.lru_cache(maxsize=None)
+def _bignum_power(base, exponent):
+    """计算并缓存 base**exponent（decimal大数）"""
+    return _BIGNUM_CONTEXT.power(decimal.Decimal(base), exponent)
+
+
+def _split_width(width):
+    """返回小于width的最大2的幂，作为分治时低位部分的位数，便于复用缓存的幂"""
+    return 1 << ((width - 1).bit_length() - 1)
+
+
+def _pack_digits(digits, base, lo, hi):
+    """将digits[lo:hi]（高位在前的base进制数字）合并为一个大数"""
+    width = hi - lo
+    if width <= _BASE_CONV_LEAF:
+        if base == 256:
+            return int.from_bytes(digits[lo:hi], 'big')
+        num = 0
+        for digit in digits[lo:hi]:
+            num = num * base + digit
+        return num
+
+    low_width = _split_width(width)
+    high = _pack_digits(digits, base, lo, hi - low_width)
+    low = _pack_digits(digits, base, hi - low_width, hi)
+    return _BIGNUM_CONTEXT.add(_BIGNUM_CONTEXT.multiply(high, _bignum_power(base, low_width)), low)
+
+
+def _unpack_digits(num, base, buf, end, width):
+    """将大数num按base进制写入预分配缓冲区buf[end - width:end]（高位在前）"""
+    if width <= _BASE_CONV_LEAF:
+        num = int(num)
+        if base == 256:
+            buf[end - width:end] = num.to_bytes(width, 'big')
+            return
+        # 每次除以58^k，再在单字范围内拆出k位，从缓冲区尾部向前写
+        start = end - width
+        pos = end
+        while num and pos > start:
+            num, chunk = divmod(num, _BASE58_CHUNK_BASE)
+            for _ in range(_BASE58_CHUNK_DIGITS):
+                if pos == start:
+                    break
+                pos -= 1
+                chunk, buf[pos] = divmod(chunk, 58)
+        return
+
+    low_width = _split_width(width)
+    high, low = _BIGNUM_CONTEXT.divmod(num, _bignum_power(base, low_width))
+    _unpack_digits(low, base, buf, end, low_width)
+    _unpack_digits(high, base, buf, end - low_width, width - low_width)
+
+
 def base58_encode(data_str):
-    """Base58编码实现"""
-    ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
-    bytes_data = data_str.encode('utf-8')
+    """Base58编码实现（分治除以58^k，结果写入预分配缓冲区），耗时约 O(M(n)·log n)、实测约 n^1.2，大输入见 BASE58_WARN_SIZE"""
+    bytes_data = data_str.encode('utf-8') if isinstance(data_str, str) else bytes(data_str)
 
     if len(bytes_data) == 0:
         return ''
 
-    # 将字节数组转换为大整数
-    num = int.from_bytes(bytes_data, 'big')
-
-    if num == 0:
-        return ALPHABET[0]
+    # 处理前导零：每个前导零字节对应一个 '1'
+    body = bytes_data.lstrip(b'\0')
+    leading_zeros = len(bytes_data) - len(body)
+    if not body:
+        return BASE58_ALPHABET[0] * leading_zeros
+
+    # 输出长度上界，多出的高位为0(即'1')，最后统一去掉
+    width = int(len(body) * _BASE58_DIGITS_PER_BYTE) + 2
+    buf = bytearray(width)
+    num = _pack_digits(body, 256, 0, len(body))
+    _unpack_digits(num, 58, buf, width, width)
+
+    encoded = bytes(buf).translate(_BASE58_ENCODE_TABLE).lstrip(BASE58_ALPHABET[0].encode('ascii'))
+    return BASE58_ALPHABET[0] * leading_zeros + encoded.decode('ascii')
+
+
+def base58_decode(encoded_str, encoding='utf-8'):
+    """Base58解码实现，encoding为None时返回原始字节"""
+    try:
+        raw = encoded_str.strip().encode('ascii')
+    except UnicodeEncodeError:
+        raise ValueError("Base58字符串包含非ASCII字符")
+
+    digits = raw.translate(_BASE58_DECODE_TABLE)
+    if b'\xff' in digits:
+        raise ValueError("Base58字符串包含无效字符")
+
+    # 每个前导 '1' 对应一个零字节
+    body = digits.lstrip(b'\0')
+    leading_zeros = len(digits) - len(body)
+
+    bytes_data = b''
+    if body:
+        width = int(len(body) * _BYTES_PER_BASE58_DIGIT) + 2
+        buf = bytearray(width)
+        num = _pack_digits(body, 58, 0, len(body))
+        _unpack_digits(num, 256, buf, width, width)
+        bytes_data = bytes(buf).lstrip(b'\0')
+
+    bytes_data = b'\0' * leading_zeros + bytes_data
+    return bytes_data.decode(encoding) if encoding else bytes_data
+
+
+# 带版本的Base58负载格式：头部 = 魔数(4) + 版本(1) + 编码方式(1) + 原始长度(4，大端)，其后为按编码方式处理的数据。
+# 魔数以零字节开头，编码结果总以 '1' 开头，而旧格式（直接编码的JSON）第一个字节是 '{'，两者可以区分
+BASE58_PAYLOAD_MAGIC = b'\0SYP'
+BASE58_PAYLOAD_VERSION = 1
+# 编码方式名称 -> 头部中的编号；"raw" 表示不使用带版本的格式，直接编码JSON（默认，兼容现有的订阅解码）
+BASE58_PAYLOAD_CODECS = {'none': 0, 'deflate': 1}
+BASE58_FORMATS = ('raw',) + tuple(BASE58_PAYLOAD_CODECS)
+_BASE58_PAYLOAD_HEADER = struct.Struct('>4sBBI')
+
+
+def encode_base58_payload(data, codec='deflate', level=9):
+    """把字节串编码为带版本头的Base58负载，codec 为 BASE58_PAYLOAD_CODECS 中的名称（deflate 为 zlib 格式）"""
+    if codec not in BASE58_PAYLOAD_CODECS:
+        raise ValueError(f"未知的Base58负载编码方式: {codec}")
+    body = zlib.compress(data, level) if codec == 'deflate' else data
+    header = _BASE58_PAYLOAD_HEADER.pack(BASE58_PAYLOAD_MAGIC, BASE58_PAYLOAD_VERSION,
+                                         BASE58_PAYLOAD_CODECS[codec], len(data))
+    return base58_encode(header + body)
+
+
+def decode_base58_payload(encoded_str):
+    """解码 encode_base58_payload 的结果，返回原始字节串；没有版本头的旧格式按直接编码的内容返回"""
+    raw = base58_decode(encoded_str, encoding=None)
+    if not raw.startswith(BASE58_PAYLOAD_MAGIC):
+        return raw
+    if len(raw) < _BASE58_PAYLOAD_HEADER.size:
+        raise ValueError("Base58负载头部不完整")
+    _, version, codec, length = _BASE58_PAYLOAD_HEADER.unpack_from(raw)
+    if version != BASE58_PAYLOAD_VERSION:
+        raise ValueError(f"不支持的Base58负载版本: {version}")
+    body = raw[_BASE58_PAYLOAD_HEADER.size:]
+    if codec == BASE58_PAYLOAD_CODECS['deflate']:
+        decompressor = zlib.decompressobj()
+        # 按头部记录的长度限制解压输出，损坏或伪造的数据不会解压出超大内容
+        try:
+            body = decompressor.decompress(body, length + 1)
+        except zlib.error as e:
+            raise ValueError(f"Base58负载的压缩数据已损坏: {e}") from e
+        if not decompressor.eof:
+            raise ValueError("Base58负载的压缩数据不完整或与记录的长度不符")
+    elif codec != BASE58_PAYLOAD_CODECS['none']:
+        raise ValueError(f"未知的Base58负载编码方式: {codec}")
+    if len(body) != length:
+        raise ValueError(f"Base58负载长度不符: 头部记录 {length} 字节，实际 {len(body)} 字节")
+    return body
+
+def _pad_display(text, width, align_right=False):
+    """按终端显示宽度（中文等全角字符占2列）补齐空格"""
+    text = str(text)
+    display_width = sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+    padding = ' ' * max(0, width - display_width)
+    return padding + text if align_right else text + padding
+
+
+class PipelineProfiler:
+    """按阶段统计耗时、输入/输出字节数和条目数，以及各正则的匹配次数等计数，供 --profile 输出
+
+    阶段用 with profiler.stage(名称, bytes_in=..., records_in=...) as stats 包裹，
+    在块内给 stats["bytes_out"] / stats["records_out"] 累加输出量；同名阶段多次进入时累加。
+    计数用 profiler.counters（Counter）累加，名称形如 "类别/项目"。
+    """
+
+    _STAGE_FIELDS = ("calls", "seconds", "bytes_in", "bytes_out", "records_in", "records_out")
 
-    result = ''
-    while num > 0:
-        result = ALPHABET[num % 58] + result
-        num = num // 58
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = Counter()
+
+    @contextlib.contextmanager
+    def stage(self, name, bytes_in=0, records_in=0):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = dict.fromkeys(self._STAGE_FIELDS, 0)
+            stats["seconds"] = 0.0
+        stats["calls"] += 1
+        stats["bytes_in"] += bytes_in
+        stats["records_in"] += records_in
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats["seconds"] += time.perf_counter() - start
+
+    def merge_counters(self, counters):
+        """合并工作进程返回的计数"""
+        self.counters.update(counters)
+
+    def to_dict(self, caches=None):
+        """导出为可序列化的字典，caches 为 {缓存名: cache_info()}"""
+        return {
+            "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+            "total_seconds": round(time.perf_counter() - self.started, 6),
+            "stages": {name: {key: round(value, 6) if key == "seconds" else value for key, value in stats.items()}
+                       for name, stats in self.stages.items()},
+            "counters": dict(sorted(self.counters.items())),
+            "caches": {name: info._asdict() for name, info in (caches or {}).items()},
+        }
 
-    # 处理前导零
-    for byte in bytes_data:
-        if byte == 0:
-            result = ALPHABET[0] + result
-        else:
-            break
+    def format_table(self, caches=None):
+        """格式化为文本表格：各阶段、计数、缓存命中率"""
+        total = time.perf_counter() - self.started
+        columns = (("次数", 6), ("耗时(s)", 9), ("占比", 7), ("输入字节", 12), ("输出字节", 12), ("输入条目", 10), ("输出条目", 10))
+        lines = [
+            _pad_display("阶段", 20) + ''.join(' ' + _pad_display(title, width, True) for title, width in columns),
+            "-" * 92,
+        ]
+        for name, stats in self.stages.items():
+            share = stats["seconds"] / total * 100 if total else 0.0
+            lines.append(
+                f"{_pad_display(name, 20)} {stats['calls']:>6} {stats['seconds']:>9.3f} {share:>6.1f}% "
+                f"{stats['bytes_in']:>12} {stats['bytes_out']:>12} {stats['records_in']:>10} {stats['records_out']:>10}"
+            )
+        lines.append(f"{_pad_display('总计', 20)} {'':>6} {total:>9.3f}")
+        lines.append("（片段扫描、行解析包含在所属文件的解析阶段内）")
+        if self.counters:
+            lines.append("")
+            lines.append(_pad_display("计数", 32) + ' ' + _pad_display("次数", 10, True))
+            lines.append("-" * 43)
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{_pad_display(name, 32)} {value:>10}")
+        for name, info in (caches or {}).items():
+            lookups = info.hits + info.misses
+            hit_rate = info.hits / lookups * 100 if lookups else 0.0
+            lines.append("")
+            lines.append(f"缓存 {name}: 命中 {info.hits}，未命中 {info.misses}，命中率 {hit_rate:.1f}%，"
+                         f"条目 {info.currsize} / {info.maxsize}")
+        return "\n".join(lines)
+
+    def append_json(self, path, caches=None, extra=None):
+        """把本次运行的统计追加为JSON Lines的一行，便于跟踪每天运行的趋势"""
+        record = self.to_dict(caches)
+        if extra:
+            record.update(extra)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# 每类热路径调试日志最多输出的明细条数，见 SampledDebugLog
+DEBUG_SAMPLE_LIMIT = 20
+
+
+class SampledDebugLog:
+    """热路径（逐URL、逐行）的采样调试日志
+
+    DEBUG 未开启时 enabled 为 False，调用方先判断它再调用，不会构造任何消息参数；
+    开启时每个类别只输出前 limit 条明细（limit 为0时全部输出），消息使用 % 占位符，由 logging 延迟格式化，
+    其余只计数，flush() 为每个类别输出一条汇总。多进程时每个工作进程各自采样，计数由 merge() 汇总到主进程。
+    """
+
+    def __init__(self, log, limit=DEBUG_SAMPLE_LIMIT):
+        self.log = log
+        self.limit = limit
+        self.counts = Counter()
+        self.enabled = log.isEnabledFor(logging.DEBUG)
+
+    def refresh(self):
+        """重新读取日志级别（setup_logging 可能在创建处理器之后才调用）"""
+        self.enabled = self.log.isEnabledFor(logging.DEBUG)
+
+    def __call__(self, category, msg, *args):
+        count = self.counts[category] + 1
+        self.counts[category] = count
+        if not self.limit or count <= self.limit:
+            self.log.debug(msg, *args)
+
+    def merge(self, counts):
+        """合并工作进程返回的计数"""
+        self.counts.update(counts)
+
+    def take_counts(self):
+        """取出并清空当前计数"""
+        counts, self.counts = self.counts, Counter()
+        return counts
+
+    def flush(self):
+        """为每个类别输出一条汇总并清空计数"""
+        for category, count in sorted(self.counts.items()):
+            if self.limit and count > self.limit:
+                self.log.debug("%s: 共 %d 条，每个进程只记录了前 %d 条明细（--debug-sample 0 记录全部）",
+                               category, count, self.limit)
+            else:
+                self.log.debug("%s: 共 %d 条", category, count)
+        self.counts.clear()
 
-    return result
 
 def setup_logging(debug=False):
     """配置日志记录器"""
@@ -74,10 +408,1218 @@ def setup_logging(debug=False):
             logger.error(f"无法创建日志文件 logs.txt: {e}")
 
 
-class VideoSourceProcessor:
+# 片段扫描的词法单元：'{'(连同其后空白)、'}'、或 "name|key|api|base_url": "值" 字段。
+# 字段只消耗开头的引号，其余部分用前瞻匹配，这样字段值内部的花括号和相互重叠的字段都能被看到；
+# 三个分支都以单个字符开头，re 可以直接按首字符集合跳过无关文本。
+_FRAGMENT_TOKEN_PATTERN = re.compile(
+    r'(\{)\s*|\}|"(?=(name|key|api|base_url)"\s*:\s*"([^"]+)"(\s*,)?)'
+)
+_NAME_FIELDS = ('name', 'key')
+_API_FIELDS = ('api', 'base_url')
+
+
+class _FieldPairMatcher:
+    """增量模拟 "A": "x" [^}]*? "B": "y" 这类正则的最左、非重叠匹配"""
+
+    def __init__(self, lead_fields, resolve=None):
+        self.lead_fields = lead_fields
+        self.resolve = resolve  # 匹配到时立即转换，返回None的丢弃，避免大文件扫描时堆积无效候选
+        self.pending = []  # 尚可配对的开头字段 (值, 结束位置)，按起点有序，也按结束位置有序
+        self.search_from = 0  # 上一次匹配的结束位置，新匹配不能早于它
+        self.match_count = 0
+        self.matches = []
+
+    def feed_field(self, field, value, start, end):
+        if start < self.search_from:
+            return
+        if field in self.lead_fields:
+            self.pending.append((value, end))
+        elif self.pending and start >= self.pending[0][1]:
+            self.match_count += 1
+            match = (self.pending[0][0], value)
+            if self.resolve is not None:
+                match = self.resolve(match)
+            if match is not None:
+                self.matches.append(match)
+            self.search_from = end
+            self.pending.clear()
+            return match is not None
+        return False
+
+    def feed_close_brace(self, pos):
+        # '}' 落在开头字段与后续字段之间时，该开头字段无法再配对
+        if self.pending:
+            self.pending = [item for item in self.pending if item[1] > pos]
+
+
+class _LineLocator:
+    """把片段扫描中的位置换算为行号（从1开始），同一缓冲区内的查询位置必须单调递增"""
+
     def __init__(self):
+        self.base_line = 1  # 当前缓冲区起点的行号
+        self.buffer = None
+        self.pos = 0
+        self.line = 1
+
+    def consume(self, buffer, cut):
+        self.base_line += buffer.count('\n', 0, cut)
+        self.buffer = None
+
+    def locate(self, buffer, pos):
+        if buffer is not self.buffer:
+            self.buffer, self.pos, self.line = buffer, 0, self.base_line
+        self.line += buffer.count('\n', self.pos, pos)
+        self.pos = pos
+        return self.line
+
+
+class _LineWindow:
+    """从行迭代器按需读取，只保留当前位置附近的行，支持 lines[i] 和 len(lines)（已读取的行数）"""
+
+    def __init__(self, lines):
+        self._source = iter(lines)
+        self._lines = deque()
+        self._first = 0   # self._lines[0] 的行号
+        self._count = 0   # 已读取的行数
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        return self._lines[index - self._first]
+
+    def fill(self, count):
+        """读取到至少 count 行或输入结束"""
+        while self._count < count:
+            try:
+                self._lines.append(next(self._source))
+            except StopIteration:
+                break
+            self._count += 1
+
+    def release(self, before):
+        """丢弃行号小于 before 的行"""
+        while self._first < before and self._lines:
+            self._lines.popleft()
+            self._first += 1
+
+
+# 行解析使用的URL匹配
+_LINE_URL_PATTERN = re.compile(r'https?://[^\s\'"<>,]+')
+# 行解析时每次批量校验URL的行数
+_URL_BATCH_LINES = 256
+# 上下文名称查找时向前向后搜索的行数
+_CONTEXT_SEARCH_RANGE = 5
+
+# 行内候选名称提取，见 VideoSourceProcessor._extract_potential_names_from_line
+_NAME_FIELD_VALUE_PATTERN = re.compile(r'"(?:name|key)"\s*:\s*"([^"]+)"')
+_CJK_CHAR_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+# 以下两条等价于旧版含 (?:资源|影视|视频|电影|TV) 的正则：这几个关键词中只有 TV 不在中文字符类中，
+# 贪婪的中文连续段之后也不可能再接中文关键词
+_QUOTED_NAME_PATTERN = re.compile(r'"([^"]*(?:[\u4e00-\u9fff]|TV)[^"]*)"')
+_CJK_RUN_PATTERN = re.compile(r'[\u4e00-\u9fff]{2,}(?:TV)?')
+
+# 行解析时最多保存的待匹配名称数，见 VideoSourceProcessor._resolve_line_events
+_PENDING_NAMES_LIMIT = 100000
+
+# 行事件类型，见 VideoSourceProcessor._iter_line_events，由 _resolve_line_events 按顺序回放：
+# (_LINE_EVENT_NAMES, 名称列表, None, None)     本行没有有效URL，名称加入待匹配队列
+# (_LINE_EVENT_SOURCE, 链接, 名称, 行号)        本行自带名称的资源
+# (_LINE_EVENT_PENDING, 链接, 回退名称, 行号)   从待匹配队列取名称，队列为空时使用回退名称
+_LINE_EVENT_NAMES = 0
+_LINE_EVENT_SOURCE = 1
+_LINE_EVENT_PENDING = 2
+
+# 抓取报告中每个文件记录的头部，例如 "页面: 1 | 仓库: tvbox | 文件: xxx.txt"
+_RECORD_HEADER_PATTERN = re.compile(r'页面: .*? \| 仓库: .*? \| 文件: ')
+# 每个进程分到的分片数，分片多一些可以平衡各记录大小不均的情况
+_SHARDS_PER_JOB = 4
+# 每个进程最多同时排队的分片数，流式读取时限制内存占用
+_SHARDS_IN_FLIGHT_PER_JOB = 2
+# 单个分片的最大字符数，大文件时分片数随之增加，排队中的分片总大小不随文件增长
+_MAX_SHARD_SIZE = 2 * 1024 * 1024
+
+# 流式读取文件时每块的字符数
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def _iter_record_shards(lines, target_size):
+    """按抓取记录头切出大小约为 target_size 的分片，产出 (带上下文的行列表, 首行下标, 尾行下标, 首行行号)"""
+    # 行列表两端各多带 _CONTEXT_SEARCH_RANGE 行上下文，只在记录头处切分
+    context = _CONTEXT_SEARCH_RANGE
+    before = []          # 上一个分片末尾的上下文行
+    current = []         # 当前分片的行
+    current_start = 0    # 当前分片首行的行号
+    current_size = 0
+    finished = None      # 已切出、等待后续上下文行的分片 (前置上下文, 行, 首行行号)
+
+    def build(shard, after):
+        shard_before, shard_lines, shard_start = shard
+        return (shard_before + shard_lines + after, len(shard_before),
+                len(shard_before) + len(shard_lines), shard_start - len(shard_before))
+
+    for line in lines:
+        if finished is not None and len(current) >= context:
+            yield build(finished, current[:context])
+            finished = None
+        if (current_size >= target_size and len(current) >= context
+                and line.startswith('页面: ') and _RECORD_HEADER_PATTERN.match(line)):
+            finished = (before, current, current_start)
+            before = current[-context:]
+            current_start += len(current)
+            current = []
+            current_size = 0
+        current.append(line)
+        current_size += len(line) + 1
+
+    if finished is not None:
+        yield build(finished, current[:context])
+    yield build((before, current, current_start), [])
+
+
+# 片段扫描的字段词法单元在开头引号之后的部分，判断一个引号能否开始字段，见 _fragment_safe_cut
+_FRAGMENT_FIELD_START = re.compile(r'(?:name|key|api|base_url)"')
+_FRAGMENT_FIELD_START_LENGTH = len('base_url"')
+
+
+def _fragment_safe_cut(buffer):
+    """返回缓冲区中可以安全扫描到的位置：在它之前开始的词法单元都已完整出现在缓冲区中，没有这样的位置时返回-1"""
+    # 最后一个非空白字符可能是 '{'，其后的空白可能延续到下一块
+    cut = len(buffer.rstrip()) - 1
+    # 字段 "f": "v" 恰好包含4个引号，值之后还要看到下一个非空白字符才能确定有没有逗号，
+    # 所以倒数第4个引号之前的引号都已确定；最后4个引号中，后面不是字段名的也不会开始字段。
+    # 没有引号或引号都不能开始字段时只保留末尾几个字符，不含引号的文本不会在缓冲区中堆积
+    end = len(buffer)
+    quotes = []
+    for _ in range(4):
+        end = buffer.rfind('"', 0, end)
+        if end < 0:
+            break
+        quotes.append(end)
+    for quote in reversed(quotes):
+        if len(buffer) - quote <= _FRAGMENT_FIELD_START_LENGTH or _FRAGMENT_FIELD_START.match(buffer, quote + 1):
+            return min(cut, quote)
+    return cut
+
+
+def _iter_chunk_tokens(chunks, locator=None):
+    """对连续的文本块运行片段词法扫描，产出 (匹配对象, 该匹配所在缓冲区的起始偏移)，locator 随之累计行号"""
+    buffer = ''
+    offset = 0
+    for chunk in chunks:
+        buffer = buffer + chunk if buffer else chunk
+        cut = _fragment_safe_cut(buffer)
+        if cut <= 0:
+            continue
+        for match in _FRAGMENT_TOKEN_PATTERN.finditer(buffer):
+            if match.start() >= cut:
+                break
+            yield match, offset
+        if locator is not None:
+            locator.consume(buffer, cut)
+        buffer = buffer[cut:]
+        offset += cut
+
+    # 输入结束，剩余部分全部扫描
+    for match in _FRAGMENT_TOKEN_PATTERN.finditer(buffer):
+        yield match, offset
+
+
+def _iter_file_chunks(f, chunk_size=None):
+    """从头按固定大小分块读取文本文件"""
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    f.seek(0)
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _iter_file_lines(f):
+    """从头逐行读取文本文件，行尾不带换行符（与 content.split('\\n') 一致）"""
+    f.seek(0)
+    for line in f:
+        yield line[:-1] if line.endswith('\n') else line
+
+
+def _peek_first_char(f):
+    """返回文件中第一个非空白字符，文件为空或全是空白时返回空字符串"""
+    f.seek(0)
+    while True:
+        chunk = f.read(4096)
+        if not chunk:
+            return ''
+        stripped = chunk.lstrip()
+        if stripped:
+            return stripped[0]
+
+
+# 预过滤模式（--prefilter）在内存映射的文件中查找的字节串；换行规则与文本模式读取一致，\r\n、\r、\n 都是换行
+_PROVIDE_VOD_BYTES = b'provide/vod'
+_LINE_BREAK_BYTES = re.compile(rb'[\r\n]')
+
+
+def _count_line_breaks(data):
+    """统计字节串中的换行数，\r\n 算一个"""
+    return data.count(b'\n') + data.count(b'\r') - data.count(b'\r\n')
+
+
+def _skip_line_break(mm, pos):
+    """返回 pos 处的换行之后的偏移，pos 为文件末尾时原样返回"""
+    if pos >= len(mm):
+        return pos
+    return pos + 2 if mm[pos:pos + 2] == b'\r\n' else pos + 1
+
+
+def _mapped_line_start(mm, pos, lo=0):
+    """返回 pos 所在行的行首偏移，不早于 lo（lo 必须是行首）；pos 落在 \r\n 中间时返回 \n 之后"""
+    newline = mm.rfind(b'\n', lo, pos)
+    # 单独的 \r 只可能出现在最近的 \n 之后，搜索范围不超过一行
+    carriage = mm.rfind(b'\r', max(newline, lo), pos)
+    start = max(newline, carriage, lo - 1) + 1
+    if carriage >= 0 and start == carriage + 1 and mm[start:start + 1] == b'\n':
+        start += 1
+    return start
+
+
+def _mapped_line_end(mm, pos):
+    """返回 pos 所在行的行尾偏移（换行处或文件末尾）"""
+    match = _LINE_BREAK_BYTES.search(mm, pos)
+    return match.start() if match else len(mm)
+
+
+def _decode_mapped_lines(data):
+    """把从行首开始的字节串解码为行列表，换行处理与文本模式读取一致"""
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+
+
+def _iter_mapped_lines(mm, start, stop):
+    """逐行产出 mm[start:stop] 中的行（start 为行首，stop 为行首或文件末尾），每次只解码约 STREAM_CHUNK_SIZE 字节"""
+    while start < stop:
+        cut = stop
+        if stop - start > STREAM_CHUNK_SIZE:
+            line_start = _mapped_line_start(mm, start + STREAM_CHUNK_SIZE, start)
+            if line_start == start:
+                # 超长的一行，整行解码
+                line_start = _skip_line_break(mm, _mapped_line_end(mm, start))
+            cut = min(line_start, stop)
+        lines = _decode_mapped_lines(mm[start:cut])
+        if mm[cut - 1] in b'\r\n':
+            lines.pop()
+        yield from lines
+        start = cut
+
+
+def _iter_mapped_hit_lines(mm):
+    """按顺序产出内存映射的文件中包含 provide/vod 的行 (行号, 行首偏移, 行尾偏移)，每行只产出一次"""
+    line_number = 0
+    counted = 0  # 行号已统计到的行首偏移
+    pos = mm.find(_PROVIDE_VOD_BYTES)
+    while pos != -1:
+        start = _mapped_line_start(mm, pos, counted)
+        line_number += _count_line_breaks(mm[counted:start])
+        counted = start
+        end = _mapped_line_end(mm, pos)
+        yield line_number, start, end
+        pos = mm.find(_PROVIDE_VOD_BYTES, end)
+
+
+def _mapped_window(mm, start, end, context):
+    """把 [start, end) 的行向前、向后各扩展 context 行，返回 (窗口内的行列表, 向前扩展的行数)"""
+    before = 0
+    while before < context and start > 0:
+        # start 前面是上一行的换行，\r\n 时从 \r 处往前找
+        previous_end = start - 2 if mm[start - 2:start] == b'\r\n' else start - 1
+        start = _mapped_line_start(mm, previous_end)
+        before += 1
+    for _ in range(context):
+        if end >= len(mm):
+            break
+        end = _mapped_line_end(mm, _skip_line_break(mm, end))
+    return _decode_mapped_lines(mm[start:end]), before
+
+
+# 记录头中紧随 "页面: ..." 的元数据行
+_RECORD_META_PREFIXES = ('路径: ', 'URL: ', '抓取时间: ', '文件大小: ')
+
+# 增量模式的索引文件及其格式版本
+INCREMENTAL_INDEX_FILE = "shipinywan_index.json"
+INCREMENTAL_INDEX_VERSION = 1
+
+# 默认的抓取结果（文件1）和基准文件（文件2），以及表示标准输入的输入路径
+DEFAULT_CRAWL_FILE = "shipinywan.txt"
+DEFAULT_BASELINE_FILE = "basic.json"
+STDIN_PATH = "-"
+
+# --watch 模式检查输入变化的间隔秒数，以及检测到变化后等待输入稳定的秒数
+WATCH_INTERVAL = 2.0
+WATCH_DEBOUNCE = 1.0
+
+# 下载远程M3U播放列表的超时秒数
+M3U_FETCH_TIMEOUT = 30.0
+
+
+def _is_separator_line(line):
+    """判断是否是抓取报告中的 "=====" 分隔线"""
+    line = line.strip()
+    return len(line) >= 10 and line.strip('=') == ''
+
+
+def _iter_crawl_blocks(lines):
+    """按抓取记录头拆分抓取报告的行，逐条产出 (记录头各行, 正文各行, 正文首行的行号)
+
+    记录头是 "页面: ... | 仓库: ... | 文件: ..." 及其后的路径/URL/抓取时间/文件大小和分隔线，
+    第一个记录头之前的报告概要作为记录头为空的记录产出；没有正文时行号为None。lines 可以是任意行迭代器。
+    """
+    header_lines = []
+    body_lines = []
+    body_line = None
+    in_header = False
+
+    def finish():
+        # 记录之间的空行和 "=====" 分隔线不属于正文
+        while body_lines and (not body_lines[-1].strip() or _is_separator_line(body_lines[-1])):
+            body_lines.pop()
+        return header_lines, body_lines, body_line if body_lines else None
+
+    for line_number, line in enumerate(lines, 1):
+        if line.startswith('页面: ') and _RECORD_HEADER_PATTERN.match(line):
+            if header_lines or body_lines:
+                yield finish()
+            header_lines = [line]
+            body_lines = []
+            in_header = True
+        elif in_header and (line.startswith(_RECORD_META_PREFIXES) or _is_separator_line(line)):
+            header_lines.append(line)
+        else:
+            in_header = False
+            if not body_lines:
+                body_line = line_number
+            body_lines.append(line)
+    block = finish()
+    if block[0] or block[1]:
+        yield block
+
+
+def json_backend_name():
+    """紧凑JSON实际使用的后端名称"""
+    if orjson is not None:
+        return "orjson"
+    if ujson is not None:
+        return "ujson"
+    return "json"
+
+
+def serialize_json(data, compact=True):
+    """把数据序列化为UTF-8字节串
+
+    compact为True时输出无空白的紧凑格式，与 json.dumps(ensure_ascii=False, separators=(',', ':')) 逐字节一致，
+    优先使用已安装的 orjson/ujson；否则用标准库输出 indent=4 的格式化JSON（orjson 不支持4空格缩进）。
+    """
+    if compact:
+        if orjson is not None:
+            try:
+                return orjson.dumps(data)
+            except TypeError:
+                # orjson 不支持的数据（如非字符串键、超范围整数），回退到标准库
+                pass
+        elif ujson is not None:
+            return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, indent=4).encode('utf-8')
+
+
+def write_file_atomic(path, content):
+    """先写入同目录下的临时文件再替换目标文件，中断时不会留下写了一半的输出；content 为 str 或 bytes"""
+    temp_file = f"{path}.tmp"
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(content)
+        os.replace(temp_file, path)
+    except BaseException:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+
+
+def _file_state(st):
+    """文件的 (修改时间, 大小, inode)，任一变化都视为文件已更新"""
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _content_digest(text):
+    """计算文本内容的SHA-256摘要"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# 工作进程内复用的处理器实例，让同一进程处理的多个分片共享URL缓存
+_shard_processor = None
+
+
+def _scan_line_shard(lines, first, last, line_offset, debug_sample_limit=DEBUG_SAMPLE_LIMIT):
+    """进程池工作函数：扫描一个分片的行事件，返回 (行事件列表, 本分片产生的计数, 调试日志计数)"""
+    global _shard_processor
+    if _shard_processor is None:
+        _shard_processor = VideoSourceProcessor()
+    _shard_processor.debug_log.limit = debug_sample_limit
+    _shard_processor.debug_log.refresh()
+    events = _shard_processor._scan_line_events(lines, first, last, line_offset)
+    counters = _shard_processor.profiler.counters
+    _shard_processor.profiler.counters = Counter()
+    return events, counters, _shard_processor.debug_log.take_counts()
+
+
+# 规范化去重的规则及其说明，见 _canonical_url_parts
+_CANONICAL_RULE_LABELS = {
+    'exact': "完全相同",
+    'scheme': "http/https协议",
+    'host_case': "主机名大小写",
+    'default_port': "默认端口",
+    'www': "www.前缀",
+    'path': "多余的路径分隔/段",
+}
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+_HOST_PORT_SUFFIX = re.compile(r':\d*$')
+_REPEATED_SLASHES = re.compile(r'/{2,}')
+
+
+def _canonical_url_parts(url):
+    """计算链接的规范键，返回 (规范键, 原始组成部分)
+
+    规范键忽略 http/https 的区别、主机名大小写、默认端口、www. 前缀，并折叠路径中的重复 / 以及 . 和 .. 段、去掉结尾的 /；
+    原始组成部分 (协议, 去掉www.的原始主机名, 端口, 是否有www., 原始路径) 用于统计合并两个链接的是哪些规则。
+    无法解析的链接以原字符串作为规范键。
+    """
+    try:
+        parsed = urllib.parse.urlsplit(url)
+        port = parsed.port
+    except ValueError:
+        return url, None
+
+    scheme = parsed.scheme.lower()
+    raw_host = _HOST_PORT_SUFFIX.sub('', parsed.netloc.rpartition('@')[2])
+    has_www = raw_host[:4].lower() == 'www.'
+    if has_www:
+        raw_host = raw_host[4:]
+
+    key = raw_host.lower()
+    if port is not None and port != _DEFAULT_PORTS.get(scheme):
+        key += f":{port}"
+    if scheme not in _DEFAULT_PORTS:
+        key = f"{scheme}://{key}"
+
+    path = _REPEATED_SLASHES.sub('/', parsed.path)
+    if path:
+        path = posixpath.normpath(path)
+        if path not in ('.', '/'):
+            key += path
+    if parsed.query:
+        key += '?' + parsed.query
+
+    return key, (scheme, raw_host, port, has_www, parsed.path)
+
+
+def canonical_url_key(url):
+    """链接的规范键，规范键相同的链接视为同一个资源"""
+    return _canonical_url_parts(url)[0]
+
+
+# url_info 的返回值：从主机名得到的名称、JSON输出的 detail 链接，以及规范键和规范化的组成部分
+UrlInfo = namedtuple('UrlInfo', ['domain_name', 'detail', 'canonical_key', 'canonical_parts'])
+
+# 主机名第一段是这些通用词时，用第二段作为名称
+_GENERIC_HOST_PREFIXES = ('api', 'www', 'data', 'cdn', 'static', 'media')
+
+
+def _no_intern(value, default):
+    return default
+
+
+def _parse_url_info(url, intern=_no_intern):
+    """解析链接，计算 UrlInfo 的各个字段，无法解析时名称为 "未知资源"、detail 为链接本身
+
+    intern 与 dict.setdefault 用法相同，各链接共有的字符串（名称、detail、协议、主机名、路径、规范键）经它只保存一份。
+    """
+    canonical_key, canonical_parts = _canonical_url_parts(url)
+    canonical_key = url if canonical_key == url else intern(canonical_key, canonical_key)
+    try:
+        parsed = urllib.parse.urlsplit(url)
+    except ValueError:
+        return UrlInfo("未知资源", url, canonical_key, canonical_parts)
+
+    if canonical_parts is not None:
+        scheme, raw_host, port, has_www, path = canonical_parts
+        canonical_parts = (intern(scheme, scheme), intern(raw_host, raw_host), port, has_www, intern(path, path))
+
+    host_parts = parsed.netloc.split('.')
+    # 移除www前缀；如果第一段是api等通用词，使用第二段
+    domain_parts = host_parts[1:] if host_parts[0] == 'www' else host_parts
+    if len(domain_parts) >= 2 and domain_parts[0].lower() in _GENERIC_HOST_PREFIXES:
+        domain_name = domain_parts[1]
+    elif domain_parts:
+        domain_name = domain_parts[0]
+    else:
+        domain_name = "未知资源"
+
+    detail = f"{parsed.scheme}://{parsed.netloc}"
+    return UrlInfo(intern(domain_name, domain_name), intern(detail, detail), canonical_key, canonical_parts)
+
+
+def _canonical_merge_rules(kept_parts, merged_parts):
+    """返回让两个规范键相同的链接合并的规则名列表"""
+    if kept_parts is None or merged_parts is None:
+        return ['exact']
+    kept_scheme, kept_host, kept_port, kept_www, kept_path = kept_parts
+    scheme, host, port, has_www, path = merged_parts
+    rules = []
+    if scheme != kept_scheme:
+        rules.append('scheme')
+    if host != kept_host:
+        rules.append('host_case')
+    if port != kept_port:
+        rules.append('default_port')
+    if has_www != kept_www:
+        rules.append('www')
+    if path != kept_path:
+        rules.append('path')
+    return rules or ['exact']
+
+
+# 可用性探测的默认参数：总并发数、单个主机的并发连接数、单次探测超时(秒)
+PROBE_CONCURRENCY = 32
+PROBE_PER_HOST = 2
+PROBE_TIMEOUT = 8.0
+_PROBE_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+
+def _probe_target(url):
+    """解析探测目标，返回 (是否https, 主机名, 端口, Host头, 请求路径)；链接无效或没有主机名时抛出 ValueError"""
+    parsed = urllib.parse.urlsplit(url)
+    host = parsed.hostname
+    if not host:
+        # 没有主机名时 open_connection 会连到本机，按无效链接处理
+        raise ValueError("missing host")
+    https = parsed.scheme == 'https'
+    port = parsed.port or (443 if https else 80)
+    path = parsed.path or '/'
+    if parsed.query:
+        path += '?' + parsed.query
+    host_header = host if parsed.port is None else f"{host}:{parsed.port}"
+    return https, host, port, host_header, path
+
+
+async def _probe_url(target, timeout, ssl_context):
+    """按 _probe_target 的结果发送一次GET请求，只读取状态行，返回探测结果字典
+
+    结果: {"alive": 是否可用(2xx/3xx), "status": HTTP状态码, "latency_ms": 收到状态行的耗时, "error": 失败原因}
+    """
+    result = {"alive": False, "status": None, "latency_ms": None}
+    https, host, port, host_header, path = target
+    request = (
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host_header}\r\n"
+        f"User-Agent: {_PROBE_USER_AGENT}\r\n"
+        "Accept: */*\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode('utf-8')
+
+    writer = None
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context if https else None), timeout)
+        writer.write(request)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), max(0.0, timeout - (time.perf_counter() - start)))
+        latency = time.perf_counter() - start
+
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit():
+            result["error"] = f"bad status line: {status_line[:60]!r}"
+            return result
+
+        result["status"] = int(parts[1])
+        result["latency_ms"] = round(latency * 1000)
+        result["alive"] = 200 <= result["status"] < 400
+    except asyncio.TimeoutError:
+        result["error"] = "timeout"
+    except ssl.SSLError as e:
+        result["error"] = f"ssl: {e.reason or e}"
+    except OSError as e:
+        result["error"] = f"connect: {e.strerror or e}"
+    except UnicodeError as e:
+        # 主机名无法按IDNA编码（空的段、超过63个字符的段等），通过了链接校验但无法连接
+        result["error"] = f"invalid url: {e}"
+    except ValueError as e:
+        # 状态行超过 StreamReader 的长度上限等
+        result["error"] = f"bad response: {e}"
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+    return result
+
+
+async def _probe_urls(urls, concurrency, per_host, timeout):
+    """并发探测一组链接，总并发数和每个主机的并发连接数都有上限，返回 {链接: 探测结果}"""
+    ssl_context = ssl.create_default_context()
+    total_limit = asyncio.Semaphore(concurrency)
+    host_limits = {}
+
+    async def probe(url):
+        try:
+            target = _probe_target(url)
+        except ValueError as e:
+            # 无效链接只记录错误，不影响其他链接的探测
+            return url, {"alive": False, "status": None, "latency_ms": None, "error": f"invalid url: {e}"}
+        host_limit = host_limits.setdefault((target[1].lower(), target[2]), asyncio.Semaphore(per_host))
+        # 先占主机名额再占总名额，避免同一主机排队的请求占满总并发
+        async with host_limit, total_limit:
+            return url, await _probe_url(target, timeout, ssl_context)
+
+    results = await asyncio.gather(*(probe(url) for url in urls))
+    return dict(results)
+
+
+# serve 模式：默认监听地址和端口、检查输出文件是否更新的间隔秒数
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8765
+SERVE_RELOAD_INTERVAL = 2.0
+# serve 模式提供的文件：URL路径 -> (--output-dir 中的文件名, Content-Type)
+SERVED_OUTPUTS = {
+    "/combined_sources.json": ("combined_sources.json", "application/json; charset=utf-8"),
+    "/combined_sources_base58.txt": ("combined_sources_base58.txt", "text/plain; charset=utf-8"),
+}
+# 请求头的最大字节数，超出时返回431并断开
+_MAX_REQUEST_HEAD = 16384
+# 按 Accept-Encoding 原文缓存的协商结果数上限，客户端通常只发送少数几种
+_ENCODING_CACHE_SIZE = 256
+# 压缩版本的优先顺序
+_CONTENT_CODINGS = ('br', 'gzip')
+
+
+@functools.lru_cache(maxsize=2)
+def _http_date(second):
+    """HTTP Date 头的值，按秒缓存"""
+    return email.utils.formatdate(second, usegmt=True)
+
+
+def _negotiate_encoding(accept_encoding, available):
+    """按 Accept-Encoding 在 available 中选择压缩方式，优先 br，其次 gzip，都不接受时返回 'identity'"""
+    accepted = set()
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip()
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    for coding in _CONTENT_CODINGS:
+        if coding in available and (coding in accepted or '*' in accepted):
+            return coding
+    return 'identity'
+
+
+class ServedBody:
+    """serve 模式中一个路径的一份内容：原文和预压缩的 gzip/br 版本，响应头预先生成
+
+    每个版本有各自的强ETag（原文为内容的SHA-256前缀，压缩版本加上 -gzip/-br 后缀）；
+    If-None-Match 与任一版本的ETag相同都视为未修改。压缩后不比原文小的版本不保留。
+    """
+
+    __slots__ = ('etag', 'etags', 'variants', 'not_modified', 'size')
+
+    def __init__(self, data, content_type, last_modified=None):
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.size = len(data)
+        bodies = {'identity': data, 'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            bodies['br'] = brotli.compress(data)
+
+        common = ["Cache-Control: no-cache", "Vary: Accept-Encoding", "Access-Control-Allow-Origin: *"]
+        if last_modified is not None:
+            common.append(f"Last-Modified: {email.utils.formatdate(last_modified, usegmt=True)}")
+
+        self.variants = {}
+        self.not_modified = {}
+        etags = []
+        for coding, body in bodies.items():
+            if coding != 'identity' and len(body) >= len(data):
+                continue
+            etag = self.etag if coding == 'identity' else f'"{digest}-{coding}"'
+            etags.append(etag)
+            headers = [f"ETag: {etag}"] + common
+            self.not_modified[coding] = '\r\n'.join(["HTTP/1.1 304 Not Modified"] + headers).encode('latin-1')
+            headers += [f"Content-Type: {content_type}", f"Content-Length: {len(body)}"]
+            if coding != 'identity':
+                headers.append(f"Content-Encoding: {coding}")
+            self.variants[coding] = ('\r\n'.join(["HTTP/1.1 200 OK"] + headers).encode('latin-1'), body)
+        self.etags = frozenset(etags)
+
+    def matches(self, if_none_match):
+        """If-None-Match 是否与这份内容的某个版本相同（弱比较，忽略 W/ 前缀）"""
+        if if_none_match.strip() == '*':
+            return True
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag in self.etags:
+                return True
+        return False
+
+
+class _SubscriptionProtocol(asyncio.Protocol):
+    """serve 模式的单个连接：解析请求头（支持 keep-alive 和管线化），响应由 SubscriptionServer 生成"""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer = self.buffer + data if self.buffer else data
+        while self.transport is not None:
+            end = self.buffer.find(b'\r\n\r\n')
+            if end == -1:
+                if len(self.buffer) > _MAX_REQUEST_HEAD:
+                    self.transport.write(self.server.error_response(431, "Request Header Fields Too Large"))
+                    self.close()
+                return
+            head = self.buffer[:end]
+            self.buffer = self.buffer[end + 4:]
+            if not self.server.respond(head, self.transport):
+                self.close()
+                return
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+
+class SubscriptionServer:
+    """serve 模式的HTTP服务：在内存中保存每个路径当前的 ServedBody，GET/HEAD 直接返回预先生成的响应
+
+    publish 用新字典整体替换路径表，正在处理的请求使用替换前的内容；只在事件循环线程中调用。
+    stats 按状态码统计响应数。
+    """
+
+    def __init__(self):
+        self._bodies = {}
+        self._encodings = {}
+        self._server = None
+        self.stats = Counter()
+
+    def publish(self, path, body):
+        """发布（或替换）一个路径的内容"""
+        bodies = dict(self._bodies)
+        bodies[path] = body
+        self._bodies = bodies
+
+    def body(self, path):
+        return self._bodies.get(path)
+
+    async def start(self, host=SERVE_HOST, port=SERVE_PORT):
+        """开始监听，返回实际端口（port 为0时由系统分配）"""
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(lambda: _SubscriptionProtocol(self), host, port, reuse_address=True)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def error_response(self, status, reason, extra=""):
+        self.stats[status] += 1
+        body = f"{status} {reason}\n".encode('latin-1')
+        return (f"HTTP/1.1 {status} {reason}\r\nDate: {_http_date(int(time.time()))}\r\n{extra}"
+                f"Content-Type: text/plain; charset=utf-8\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n").encode('latin-1') + body
+
+    def respond(self, head, transport):
+        """处理一个请求头并写出响应，返回连接是否保持"""
+        try:
+            lines = head.decode('latin-1').split('\r\n')
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            transport.write(self.error_response(400, "Bad Request"))
+            return False
+
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('content-length', '0') != '0' or 'transfer-encoding' in headers:
+            # 订阅接口只接受没有请求体的 GET/HEAD
+            transport.write(self.error_response(400, "Bad Request"))
+            return False
+        if method not in ('GET', 'HEAD'):
+            transport.write(self.error_response(405, "Method Not Allowed", "Allow: GET, HEAD\r\n"))
+            return False
+
+        body = self._bodies.get(target.partition('?')[0])
+        if body is None:
+            transport.write(self.error_response(404, "Not Found"))
+            return False
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        tail = f"\r\nDate: {_http_date(int(time.time()))}\r\n"
+        tail += "Connection: keep-alive\r\n\r\n" if keep_alive else "Connection: close\r\n\r\n"
+
+        accept_encoding = headers.get('accept-encoding', '')
+        coding = self._encodings.get(accept_encoding)
+        if coding is None:
+            if len(self._encodings) >= _ENCODING_CACHE_SIZE:
+                self._encodings.clear()
+            coding = self._encodings[accept_encoding] = _negotiate_encoding(accept_encoding, ('br', 'gzip'))
+        if coding not in body.variants:
+            coding = 'gzip' if coding == 'br' and 'gzip' in body.variants else 'identity'
+
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None and body.matches(if_none_match):
+            self.stats[304] += 1
+            transport.write(body.not_modified[coding] + tail.encode('latin-1'))
+        else:
+            self.stats[200] += 1
+            response_head, payload = body.variants[coding]
+            transport.write(response_head + tail.encode('latin-1'))
+            if method == 'GET':
+                transport.write(payload)
+        return keep_alive
+
+
+def _load_served_body(path, content_type):
+    """读取输出文件并生成 ServedBody（在线程池中执行，压缩不阻塞事件循环）"""
+    with open(path, 'rb') as f:
+        data = f.read()
+        mtime = os.fstat(f.fileno()).st_mtime
+    return ServedBody(data, content_type, mtime)
+
+
+async def _reload_served_outputs(server, output_dir, interval):
+    """每 interval 秒检查一次输出文件，文件被重新生成（修改时间、大小或inode变化）时重新加载并发布"""
+    loop = asyncio.get_running_loop()
+    versions = {}
+    while True:
+        for url_path, (name, content_type) in SERVED_OUTPUTS.items():
+            path = os.path.join(output_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                if versions.get(url_path, ()) is not None:
+                    logger.warning(f"输出文件 {path} 不存在，{url_path} 暂不可用")
+                    versions[url_path] = None
+                continue
+            version = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if versions.get(url_path) == version:
+                continue
+            try:
+                body = await loop.run_in_executor(None, _load_served_body, path, content_type)
+            except OSError as e:
+                logger.error(f"读取 {path} 时出错: {str(e)}")
+                continue
+            versions[url_path] = version
+            current = server.body(url_path)
+            if current is not None and current.etag == body.etag:
+                continue
+            server.publish(url_path, body)
+            logger.info(f"已发布 {url_path}: {body.size} 字节，版本 {', '.join(sorted(body.variants))}，ETag {body.etag}")
+        await asyncio.sleep(interval)
+
+
+async def serve_outputs(output_dir, host=SERVE_HOST, port=SERVE_PORT, interval=SERVE_RELOAD_INTERVAL):
+    """serve 模式：提供 output_dir 中的汇总JSON和Base58文件，文件更新后自动切换为新内容，直到被取消"""
+    server = SubscriptionServer()
+    port = await server.start(host, port)
+    logger.info(f"订阅服务已启动: http://{host}:{port}/ ({', '.join(SERVED_OUTPUTS)})")
+    try:
+        await _reload_served_outputs(server, output_dir, interval)
+    finally:
+        await server.close()
+        logger.info(f"订阅服务已停止，响应统计: {dict(server.stats)}")
+
+
+# 无效URL格式的合并检查：重复协议(不区分大小写)、中文字符、中文括号、反引号和BOM
+_INVALID_URL_PATTERN = re.compile(r'(?ai:https?://https?://)|[（）\u4e00-\u9fff`\uFEFF]')
+
+# extract_actual_url 结果缓存的默认容量
+URL_CACHE_SIZE = 65536
+# --dedup-records 最多缓存多少份不同正文的行事件，超出时淘汰最久未使用的
+RECORD_CACHE_SIZE = 4096
+
+# url_cache_info 的返回值，字段与 functools.lru_cache 的 cache_info() 一致
+UrlCacheInfo = namedtuple('UrlCacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+_CACHE_MISSING = object()
+
+_PROVIDE_VOD = 'provide/vod'
+
+
+class SourceRecord:
+    """一条提取出的资源：名称、链接，以及来源文件和行号
+
+    行为与 (名称, 链接) 二元组一致：可以解包和下标访问，相等比较和哈希只看名称和链接（与等值的元组相等），
+    去重、比较过滤、生成JSON等流程直接传递记录本身。名称和链接由 VideoSourceProcessor 驻留，相同的字符串只保存一份；
+    line 从1开始，完整JSON解析的结果没有行号。
+    """
+
+    __slots__ = ('name', 'url', 'source', 'line')
+
+    def __init__(self, name, url, source=None, line=None):
+        self.name = name
+        self.url = url
+        self.source = source
+        self.line = line
+
+    def __iter__(self):
+        return iter((self.name, self.url))
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index):
+        return (self.name, self.url)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, SourceRecord):
+            return self.name == other.name and self.url == other.url
+        if isinstance(other, tuple):
+            return (self.name, self.url) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.name, self.url))
+
+    def __repr__(self):
+        return f"SourceRecord({self.name!r}, {self.url!r}, source={self.source!r}, line={self.line!r})"
+
+    @property
+    def provenance(self):
+        """"文件:行号" 形式的来源说明"""
+        source = "标准输入" if self.source == STDIN_PATH else (self.source or "未知")
+        return f"{source}:{self.line}" if self.line is not None else source
+
+
+class PlaylistEntry(SourceRecord):
+    """M3U/M3U8 播放列表中的一个频道条目：名称、播放链接、来源和行号，以及 #EXTINF 的属性和条目的原始文本
+
+    text 是条目的全部原始行（#EXTINF、#EXTVLCOPT 等指令行和播放链接行，不含空行），合并时原样写出；
+    line 是播放链接所在的行号。
+    """
+
+    __slots__ = ('attrs', 'text')
+
+    def __init__(self, name, url, attrs, text, source=None, line=None):
+        super().__init__(name, url, source, line)
+        self.attrs = attrs
+        self.text = text
+
+    @property
+    def tvg_id(self):
+        return self.attrs.get('tvg-id', '')
+
+    @property
+    def channel_key(self):
+        """频道标识：tvg-id，没有时依次用 tvg-name 和显示名称，不区分大小写"""
+        return (self.attrs.get('tvg-id') or self.attrs.get('tvg-name') or self.name).strip().lower()
+
+    def dedup_key(self):
+        """去重键：同一频道（channel_key）下规范键相同的播放链接视为重复，只保存16字节的摘要"""
+        # 用 # 连接的多个备用链接（如 "链接1#链接2"）与单个链接不同，片段也计入去重键
+        url, _, fragment = self.url.partition('#')
+        key = f"{self.channel_key}\n{canonical_url_key(url)}#{fragment}"
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+
+_M3U_ATTR_PATTERN = re.compile(r'([\w-]+)="([^"]*)"')
+_M3U_HEADER = '#EXTM3U'
+
+
+def _parse_extinf(line):
+    """解析 #EXTINF 行，返回 (属性字典, 显示名称)；显示名称是属性列表之后第一个逗号后面的部分"""
+    attrs = {}
+    pos = len('#EXTINF:')
+    for match in _M3U_ATTR_PATTERN.finditer(line, pos):
+        attrs[match.group(1)] = match.group(2)
+        pos = match.end()
+    comma = line.find(',', pos)
+    return attrs, (line[comma + 1:].strip() if comma != -1 else '')
+
+
+class M3uReader:
+    """逐条读取 M3U/M3U8 播放列表，迭代得到 PlaylistEntry，任何时候只保存当前条目的行
+
+    header 是第一行的 #EXTM3U 头（没有时为None），newline 是第一行的换行符（\r\n 或 \n，文件需以 newline='' 打开），
+    迭代结束后 tail 是最后一个播放链接之后剩下的指令/注释行。
+    """
+
+    def __init__(self, f, source=None):
+        self.source = source
+        self.header = None
+        self.newline = '\n'
+        self.tail = []
+        self._lines = enumerate(f, 1)
+        self._first = None
+        for line_number, line in self._lines:
+            if line_number == 1 and line.endswith('\r\n'):
+                self.newline = '\r\n'
+            line = line.lstrip('\ufeff').rstrip('\r\n')
+            if not line.strip():
+                continue
+            if line.startswith(_M3U_HEADER):
+                self.header = line
+            else:
+                self._first = (line_number, line)
+            break
+
+    def __iter__(self):
+        pending = []
+        extinf = None
+        lines = self._lines
+        if self._first is not None:
+            lines = itertools.chain([self._first], lines)
+        for line_number, line in lines:
+            line = line.rstrip('\r\n')
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped.startswith('#'):
+                pending.append(line)
+                if stripped.startswith('#EXTINF'):
+                    extinf = stripped
+                continue
+
+            attrs, name = _parse_extinf(extinf) if extinf else ({}, '')
+            pending.append(line)
+            yield PlaylistEntry(name or attrs.get('tvg-name') or stripped, stripped, attrs, '\n'.join(pending),
+                                self.source, line_number)
+            pending = []
+            extinf = None
+        self.tail = pending
+
+
+def _is_remote_source(source):
+    return source.startswith(('http://', 'https://'))
+
+
+@contextlib.contextmanager
+def open_playlist(source):
+    """以文本方式流式打开播放列表：本地文件、"-"（标准输入）或 http(s) 链接；保留原始换行符，无法解码的字节替换为 U+FFFD"""
+    if source == STDIN_PATH:
+        f = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace', newline='')
+        try:
+            yield f
+        finally:
+            # 不随包装对象一起关闭标准输入
+            f.detach()
+    elif _is_remote_source(source):
+        with urllib.request.urlopen(source, timeout=M3U_FETCH_TIMEOUT) as response:
+            yield io.TextIOWrapper(response, encoding='utf-8', errors='replace', newline='')
+    else:
+        with open(source, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            yield f
+
+
+def read_source_list(path):
+    """读取播放列表清单（如 iptv/m3uadd）：每行一个链接或路径，忽略空行和 # 开头的注释"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def expand_playlist_sources(items):
+    """展开播放列表输入：http(s) 链接原样保留，其余按 expand_input_paths 展开，重复的只保留第一次出现"""
+    sources = []
+    for item in items:
+        if _is_remote_source(item):
+            sources.append(item)
+        else:
+            sources.extend(expand_input_paths([item]))
+    return list(dict.fromkeys(sources))
+
+
+def _cut_provide_vod(url):
+    """清理URL（引号、空白、结尾的 ? 和 /）并截取到 provide/vod 结尾，代理URL取代理后面的真实URL
+
+    不包含 provide/vod 时返回None，不做协议和格式校验。
+    """
+    # 清理URL，移除引号和多余空格
+    url = url.strip().strip('"').strip("'").rstrip('?').rstrip('/')
+
+    # 找到provide/vod的位置并截取到其后
+    provide_index = url.find(_PROVIDE_VOD)
+    if provide_index == -1:
+        return None
+    actual_url = url[:provide_index + len(_PROVIDE_VOD)]
+
+    # 处理代理URL的情况：取第一个 proxy/ 与下一个 proxy/ 之间的部分
+    proxy_index = actual_url.find('proxy/')
+    if proxy_index != -1:
+        real_url = actual_url[proxy_index + len('proxy/'):]
+        next_proxy = real_url.find('proxy/')
+        if next_proxy != -1:
+            real_url = real_url[:next_proxy]
+        provide_index = real_url.find(_PROVIDE_VOD)
+        if provide_index != -1:
+            actual_url = real_url[:provide_index + len(_PROVIDE_VOD)]
+
+    return actual_url
+
+
+class VideoSourceProcessor:
+    def __init__(self, url_cache_size=URL_CACHE_SIZE):
         self.lock = Lock()
         self.processed_urls = set()
+        # 原始URL字符串 -> 规范化结果 的LRU缓存，同一个字符串会被多个解析阶段反复校验；
+        # extract_actual_url 和 validate_urls 共用，统计数据只是近似值（多线程时不加锁）
+        self._url_cache = OrderedDict()
+        self._url_cache_size = url_cache_size
+        self._url_cache_hits = 0
+        self._url_cache_misses = 0
+        # 各阶段耗时和计数，--profile 时输出
+        self.profiler = PipelineProfiler()
+        # 逐URL、逐行的调试日志只采样输出，见 SampledDebugLog
+        self.debug_log = SampledDebugLog(logger)
+        # 提取结果中的名称和链接驻留在这里，相同的字符串只保存一份，见 _make_record
+        self._interned = {}
+        # 按抓取记录解析（--dedup-records）：正文摘要 -> 正文中间部分的行事件，正文相同的记录只扫描一次，见 _iter_record_line_events
+        self.dedup_records = False
+        self.record_stats = Counter()
+        self._record_results = OrderedDict()
+        # --watch 模式下在多次运行之间保持的缓存，为None时不启用：
+        # input_cache 为 文件路径 -> (文件状态, 解析结果)，见 process_file；
+        # output_cache 为 输出文件路径 -> 上次写入内容的摘要（及Base58编码结果），内容不变时不重写，见 save_results
+        self.input_cache = None
+        self.output_cache = None
+        # 链接 -> UrlInfo 的索引，每个不同的链接只解析一次，去重、比较过滤、名称回退和生成JSON都从这里读取，见 url_info；
+        # UrlInfo 中各链接共有的字符串也驻留在 _interned 中
+        self._url_index = {}
+
+    def _make_record(self, name, url, line=None):
+        """创建 SourceRecord，名称和链接使用驻留的字符串"""
+        intern = self._interned.setdefault
+        return SourceRecord(intern(name, name), intern(url, url), None, line)
 
     def extract_actual_url(self, url):
         """提取实际链接，将包含provide/vod的链接转换为provide/vod结尾的链接"""
@@ -85,96 +1627,185 @@ class VideoSourceProcessor:
             # 因为输入无效，这里不记录日志，避免日志泛滥
             return None
 
-        original_url_for_logging = url  # 保留原始URL用于日志记录
-
-        # 清理URL，移除引号和多余空格
-        url = url.strip().strip('"').strip("'").rstrip('?').rstrip('/')
+        result = self._url_cache_get(url)
+        if result is _CACHE_MISSING:
+            result = self._extract_actual_url(url)
+            self._url_cache_put(url, result)
+        return result
+
+    def _url_cache_get(self, url):
+        """查询URL缓存，未命中时返回 _CACHE_MISSING"""
+        result = self._url_cache.get(url, _CACHE_MISSING)
+        if result is _CACHE_MISSING:
+            self._url_cache_misses += 1
+            return result
+        self._url_cache_hits += 1
+        try:
+            self._url_cache.move_to_end(url)
+        except KeyError:
+            # 其他线程刚好把它淘汰了
+            pass
+        return result
+
+    def _url_cache_put(self, url, result):
+        """写入URL缓存，超出容量时淘汰最久未使用的条目"""
+        if self._url_cache_size <= 0:
+            return
+        self._url_cache[url] = result
+        while len(self._url_cache) > self._url_cache_size:
+            try:
+                self._url_cache.popitem(last=False)
+            except KeyError:
+                break
 
-        # 检查是否包含provide/vod
-        if 'provide/vod' not in url:
-            logger.debug(f"提取失败: URL不包含 'provide/vod'。原始URL: '{original_url_for_logging}'")
-            return None
+    def url_info(self, url):
+        """返回链接的解析结果 UrlInfo，第一次遇到这个链接时解析并写入索引"""
+        info = self._url_index.get(url)
+        if info is None:
+            info = self._url_index[url] = _parse_url_info(url, self._interned.setdefault)
+        return info
+
+    def trim_caches(self):
+        """驻留表和链接索引只保留 input_cache 中的解析结果还用到的条目，--watch 模式每次运行后调用，已移除或已变化的输入不再占用内存"""
+        interned = {}
+        url_index = {}
+        intern = interned.setdefault
+        for _, (valid_data, _) in self.input_cache.values():
+            for record in valid_data:
+                name, url = record[0], record[1]
+                intern(name, name)
+                intern(url, url)
+                info = self._url_index.get(url)
+                if info is not None:
+                    url_index[url] = info
+        for info in url_index.values():
+            intern(info.domain_name, info.domain_name)
+            intern(info.detail, info.detail)
+        self._interned = interned
+        self._url_index = url_index
+
+    def url_cache_info(self):
+        """返回URL规范化缓存的统计信息 (hits, misses, maxsize, currsize)"""
+        return UrlCacheInfo(self._url_cache_hits, self._url_cache_misses, self._url_cache_size, len(self._url_cache))
+
+    def _extract_actual_url(self, url):
+        """extract_actual_url 的实际实现，结果按原始字符串缓存"""
+        debug_log = self.debug_log
+        original_url_for_logging = url  # 保留原始URL用于日志记录
 
-        # 找到provide/vod的位置并截取到其后
-        provide_index = url.find('provide/vod')
-        if provide_index == -1:
-            # 这个分支理论上不会进入，因为上面已经检查过了
+        # 检查是否包含provide/vod，并截取到provide/vod结尾
+        actual_url = _cut_provide_vod(url)
+        if actual_url is None:
+            if debug_log.enabled:
+                debug_log("提取失败/不含provide/vod", "提取失败: URL不包含 'provide/vod'。原始URL: '%s'",
+                          original_url_for_logging)
             return None
 
-        # 截取到provide/vod结尾
-        actual_url = url[:provide_index + len('provide/vod')]
-
-        # 处理代理URL的情况
-        if 'proxy/' in actual_url:
-            # 提取代理后面的真实URL
-            proxy_parts = actual_url.split('proxy/')
-            if len(proxy_parts) > 1:
-                real_url = proxy_parts[1]
-                if 'provide/vod' in real_url:
-                    provide_index = real_url.find('provide/vod')
-                    actual_url = real_url[:provide_index + len('provide/vod')]
-
         # 确保URL格式正确
         if not actual_url.startswith(('http://', 'https://')):
-            logger.debug(f"提取失败: URL格式不正确 (非http/https开头)。处理后URL: '{actual_url}'，原始URL: '{original_url_for_logging}'")
+            if debug_log.enabled:
+                debug_log("提取失败/非http开头",
+                          "提取失败: URL格式不正确 (非http/https开头)。处理后URL: '%s'，原始URL: '%s'",
+                          actual_url, original_url_for_logging)
             return None
 
         # 新增：检查和过滤无效URL格式
         if self._is_invalid_url_format(actual_url):
-            logger.debug(f"提取失败: URL格式无效。URL: '{actual_url}'，原始URL: '{original_url_for_logging}'")
+            self.profiler.counters["正则/无效URL格式"] += 1
+            if debug_log.enabled:
+                debug_log("提取失败/格式无效", "提取失败: URL格式无效。URL: '%s'，原始URL: '%s'",
+                          actual_url, original_url_for_logging)
             return None
 
-        logger.debug(f"提取成功: 从 '{original_url_for_logging}' 提取到 '{actual_url}'")
+        if debug_log.enabled:
+            debug_log("提取成功", "提取成功: 从 '%s' 提取到 '%s'", original_url_for_logging, actual_url)
         return actual_url
 
-    def _is_invalid_url_format(self, url):
-        """检查URL是否是无效格式"""
-        # 检查重复协议：http://http:// 、 https://https:// 、 http://https:// 、 https://http://
-        double_protocol_patterns = [
-            'http://http://',
-            'https://https://',
-            'http://https://',
-            'https://http://'
-        ]
-
-        for pattern in double_protocol_patterns:
-            if pattern in url.lower():
-                return True
+    def validate_urls(self, urls):
+        """批量版 extract_actual_url，返回与 urls 一一对应的规范化链接（无效的为None）
+
+        重复的URL只处理一次，先查与 extract_actual_url 共用的缓存；未命中的截取后用换行拼接成一个缓冲区，
+        用 _INVALID_URL_PATTERN 整体搜索一遍（模式不会匹配换行，所以不会跨越两个候选），
+        按匹配位置定位到对应的候选，结果写回缓存。DEBUG 开启时失败的URL按原因采样记录。
+        """
+        results = {}
+        misses = []
+        candidates = []  # 通过协议检查、待做格式检查的 (原始URL, 截取后的链接)
+        for url in dict.fromkeys(urls):
+            if not url or not isinstance(url, str):
+                results[url] = None
+                continue
+            cached = self._url_cache_get(url)
+            if cached is not _CACHE_MISSING:
+                results[url] = cached
+                continue
+            misses.append(url)
+            actual_url = _cut_provide_vod(url)
+            if actual_url is None or not actual_url.startswith(('http://', 'https://')):
+                results[url] = None
+                if self.debug_log.enabled:
+                    if actual_url is None:
+                        self.debug_log("提取失败/不含provide/vod", "提取失败: URL不包含 'provide/vod'。原始URL: '%s'", url)
+                    else:
+                        self.debug_log("提取失败/非http开头",
+                                       "提取失败: URL格式不正确 (非http/https开头)。处理后URL: '%s'，原始URL: '%s'",
+                                       actual_url, url)
+                continue
+            results[url] = actual_url
+            candidates.append((url, actual_url))
+
+        if candidates:
+            starts = []
+            offset = 0
+            for _, actual_url in candidates:
+                starts.append(offset)
+                offset += len(actual_url) + 1
+            buffer = '\n'.join(actual_url for _, actual_url in candidates)
+
+            invalid_count = 0
+            match = _INVALID_URL_PATTERN.search(buffer)
+            while match:
+                index = bisect.bisect_right(starts, match.start()) - 1
+                results[candidates[index][0]] = None
+                invalid_count += 1
+                if self.debug_log.enabled:
+                    self.debug_log("提取失败/格式无效", "提取失败: URL格式无效。URL: '%s'，原始URL: '%s'",
+                                   candidates[index][1], candidates[index][0])
+                if index + 1 == len(starts):
+                    break
+                # 该候选已判定无效，直接从下一个候选开始搜索
+                match = _INVALID_URL_PATTERN.search(buffer, starts[index + 1])
 
-        # 检查是否包含中文字符
-        if re.search(r'[\u4e00-\u9fff]', url):
-            return True
+            self.profiler.counters["正则/无效URL格式"] += invalid_count
 
-        # 检查是否包含带有中文的括号或其他特殊字符
-        if re.search(r'[（）\u4e00-\u9fff]', url):
-            return True
+        for url in misses:
+            self._url_cache_put(url, results[url])
+        self.profiler.counters["URL校验/批量调用"] += 1
+        self.profiler.counters["URL校验/批量未命中缓存"] += len(misses)
+        logger.debug("批量校验: %d 个不同的URL，其中 %d 个未命中缓存", len(results), len(misses))
+        return [results[url] for url in urls]
 
-        # 检查是否包含不合适的特殊字符，如反引号
-        if re.search(r'[`\uFEFF]', url):
-            return True
+    def _is_invalid_url_format(self, url):
+        """检查URL是否是无效格式"""
+        # 重复协议(http://http:// 等)、中文字符、中文括号、反引号等，合并为一次正则搜索
+        return _INVALID_URL_PATTERN.search(url) is not None
 
-        return False
     def extract_domain_name(self, url):
-        """从URL中提取合适的名称"""
-        try:
-            parsed = urllib.parse.urlparse(url)
-            domain_parts = parsed.netloc.split('.')
-
-            # 移除www前缀
-            if domain_parts[0] == 'www':
-                domain_parts = domain_parts[1:]
-
-            # 如果第一段是api等通用词，使用第二段
-            generic_prefixes = ['api', 'www', 'data', 'cdn', 'static', 'media']
-            if len(domain_parts) >= 2 and domain_parts[0].lower() in generic_prefixes:
-                return domain_parts[1]
-            else:
-                return domain_parts[0]
-        except:
+        """从URL中提取合适的名称（见 url_info）"""
+        if not isinstance(url, str):
             return "未知资源"
+        return self.url_info(url).domain_name
 
-    def parse_file_content(self, content, file_type="unknown"):
-        """解析文件内容，提取名称和实际链接"""
+    def parse_file_content(self, content, file_type="unknown", jobs=1):
+        """解析文件内容，提取名称和实际链接，jobs>1时大文件的行解析使用多进程"""
+        self.debug_log.refresh()
+        try:
+            return self._parse_file_content(content, jobs)
+        finally:
+            self.debug_log.flush()
+
+    def _parse_file_content(self, content, jobs):
+        """parse_file_content 的实际实现"""
         # 修改点：初始化两个列表，用于存放有效和无效数据
         valid_results = []
         invalid_results = [] # 虽然当前逻辑不会填充它，但为了结构完整性保留
@@ -193,251 +1824,621 @@ class VideoSourceProcessor:
 
         # 使用改进的片段解析
         # _parse_content_fragments 内部也只返回有效的
-        valid_results.extend(self._parse_content_fragments(content))
+        valid_results.extend(self._parse_content_fragments(content, jobs))
         logger.info(f"片段解析完成，提取到 {len(valid_results)} 条数据")
 
         # 修改点：返回两个列表
         return valid_results, invalid_results
 
+    def parse_file_stream(self, f, file_type="unknown", jobs=1, prefilter=False):
+        """流式解析已打开的文本文件，与 parse_file_content 结果一致，但不把整个文件读入内存
 
-    def _parse_content_fragments(self, content):
-        """解析内容片段，处理不规范的JSON和文本混合内容"""
-        results = []
-        # # 新增：处理简单的逗号分隔格式
-        # lines = content.strip().split('\n')
-        # for line in lines:
-        #     line = line.strip()
-        #     if ',' in line:
-        #         parts = line.split(',', 1)  # 只分割第一个逗号
-        #         if len(parts) == 2:
-        #             name = parts[0].strip()
-        #             url = parts[1].strip()
-        #             actual_url = self.extract_actual_url(url)
-        #             if actual_url:
-        #                 results.append((name, actual_url))
-        #                 continue
-        #
-        # # 如果简单解析成功，直接返回
-        # if results:
-        #     return results
-        # 使用正则表达式找到所有可能的资源定义
-        patterns = [
-            # 标准JSON对象模式：包含name/key和api/base_url
-            r'\{\s*"(?:key|name)"\s*:\s*"([^"]+)"\s*,[\s\S]*?"(?:api|base_url)"\s*:\s*"([^"]+)"[\s\S]*?\}',
-            # 简化模式：只匹配相邻的name和api字段
-            r'"(?:name|key)"\s*:\s*"([^"]+)"[^}]*?"(?:api|base_url)"\s*:\s*"([^"]+)"',
-            # 反向模式：api在前，name在后
-            r'"(?:api|base_url)"\s*:\s*"([^"]+)"[^}]*?"(?:name|key)"\s*:\s*"([^"]+)"',
-        ]
+        先查看第一个非空白字符：是 { 或 [ 时按完整JSON解析（JSON必须整体加载）；
+        否则片段扫描按块读取、行解析逐行读取，各读一遍文件。
+        prefilter 为True时行解析改为内存映射文件后只解析包含 provide/vod 的区域，耗时随资源数而不是文件大小增长。
+        """
+        self.debug_log.refresh()
+        try:
+            return self._parse_file_stream(f, jobs, prefilter)
+        finally:
+            self.debug_log.flush()
 
-        for i, pattern in enumerate(patterns, 1):
-            matches = re.findall(pattern, content, re.MULTILINE | re.DOTALL)
-            logger.debug(f"正则模式 {i} 匹配到 {len(matches)} 个潜在结果。")
-            for match in matches:
-                if len(match) == 2:
-                    # 判断哪个是名称，哪个是URL
-                    if self.extract_actual_url(match[1]):
-                        name, url = match[0], match[1]
-                    elif self.extract_actual_url(match[0]):
-                        name, url = match[1], match[0]
-                    else:
-                        logger.debug(f"正则匹配丢弃: 匹配项 '{match}' 中的两个元素均不是有效的 provide/vod 链接。")
-                        continue
+    def _parse_file_stream(self, f, jobs, prefilter=False):
+        """parse_file_stream 的实际实现"""
+        valid_results = []
+        invalid_results = []
+
+        if _peek_first_char(f) in ('{', '['):
+            try:
+                f.seek(0)
+                data = json.load(f)
+                valid_results.extend(self._parse_json_data(data))
+                logger.info(f"成功解析完整JSON格式，提取到 {len(valid_results)} 条数据")
+                return valid_results, invalid_results
+            except json.JSONDecodeError:
+                logger.info("完整JSON解析失败，尝试片段解析")
+
+        total_size = os.fstat(f.fileno()).st_size
+        with contextlib.ExitStack() as stack:
+            mapped = None
+            if prefilter and total_size:
+                mapped = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                if jobs > 1:
+                    logger.info("预过滤模式的行解析在单进程中进行，忽略 --jobs")
+            valid_results.extend(self._parse_text_sources(
+                lambda: _iter_file_chunks(f), lambda: _iter_file_lines(f), jobs, total_size, mapped
+            ))
+        logger.info(f"片段解析完成，提取到 {len(valid_results)} 条数据")
+
+        return valid_results, invalid_results
+
+
+    def _parse_content_fragments(self, content, jobs=1):
+        """解析内容片段，处理不规范的JSON和文本混合内容，jobs>1时行解析使用多进程"""
+        return self._parse_text_sources(lambda: (content,), lambda: content.split('\n'), jobs, len(content))
 
-                    actual_url = self.extract_actual_url(url)
-                    if actual_url:
-                        results.append((name.strip(), actual_url))
+    def _parse_text_sources(self, read_chunks, read_lines, jobs=1, total_size=0, mapped=None):
+        """片段扫描 + 行解析，read_chunks()/read_lines() 每次调用都从头产出文本块/文本行
 
-        logger.info(f"所有正则模式执行完毕，共找到 {len(results)} 条结果。")
+        mapped 为同一文件的内存映射时行解析使用预过滤模式，见 _iter_line_events_prefiltered。
+        """
+        results = []
+        # 单遍扫描找到所有可能的资源定义（name/key 与 api/base_url 字段对，顺序不限）
+        with self.profiler.stage("片段扫描", bytes_in=total_size) as stats:
+            results.extend(self._iter_fragment_pairs(read_chunks(), self._resolve_fragment_pair))
+            stats["records_out"] += len(results)
+
+        logger.info(f"所有片段模式扫描完毕，共找到 {len(results)} 条结果。")
 
         # 如果上述方法没有找到足够的结果，使用行解析
-        logger.info(f"正则查找找到 {len(results)} 条结果，将继续执行行解析模式以确保完整性...")
-        line_results = self._parse_lines_with_context(content.split('\n'))
+        logger.info(f"片段扫描找到 {len(results)} 条结果，将继续执行行解析模式以确保完整性...")
+        with self.profiler.stage("行解析", bytes_in=total_size) as stats:
+            if self.dedup_records:
+                line_events = self._iter_record_line_events(read_lines())
+            elif mapped is not None:
+                line_events = self._iter_line_events_prefiltered(mapped)
+            elif jobs > 1:
+                line_events = self._iter_line_events_parallel(read_lines(), jobs, total_size)
+            else:
+                line_events = self._iter_line_events(read_lines())
+            line_results = self._resolve_line_events(line_events)
+            stats["records_out"] += len(line_results)
         results.extend(line_results)
         logger.info(f"行解析模式完成，新增 {len(line_results)} 条结果。")
 
         return results
 
+    def _iter_record_line_events(self, lines):
+        """按抓取记录产出整个输入的行事件，与 _iter_line_events 一致；正文相同的记录只扫描一次正文中间部分
+
+        行事件只取决于本行及前后 _CONTEXT_SEARCH_RANGE 行，所以离正文首尾超过这个距离的行的事件只取决于正文本身，
+        按正文摘要缓存，行号换算为副本的位置；记录头、记录之间的行和正文首尾的行每次都扫描。统计累计到 record_stats。
+        """
+        context = _CONTEXT_SEARCH_RANGE
+        buffer = []  # 尚未丢弃的行，buffer[0] 的行号（从0开始）为 base
+        base = 0
+        scanned = 0  # 已产出事件的行数
+        stats = Counter()
+        record_results = self._record_results
+
+        def read():
+            for line in lines:
+                buffer.append(line)
+                yield line
+
+        def scan(last):
+            # 扫描 [scanned, last) 的行事件；buffer 中已读入这些行之后的 context 行，或已读完输入
+            window_start = max(base, scanned - context)
+            return self._iter_line_events(buffer[window_start - base:last + context - base], scanned - window_start,
+                                          last - window_start, window_start)
+
+        for _, body_lines, body_line in _iter_crawl_blocks(read()):
+            if not body_lines:
+                continue
+            stats["记录总数"] += 1
+            body = '\n'.join(body_lines)
+            stats["正文字节"] += len(body)
+            if len(body_lines) <= 2 * context:
+                continue
+            digest = hashlib.blake2b(body.encode('utf-8'), digest_size=16).digest()
+            body_start = body_line - 1
+            body_end = body_start + len(body_lines)
+
+            yield from scan(body_start + context)
+            events = record_results.get(digest)
+            if events is None:
+                # 正文单独扫描中间部分，行号相对正文首行
+                events = record_results[digest] = self._scan_line_events(body_lines, context, len(body_lines) - context)
+                if len(record_results) > RECORD_CACHE_SIZE:
+                    record_results.popitem(last=False)
+            else:
+                record_results.move_to_end(digest)
+                interior = body_lines[context:-context]
+                stats["复用记录"] += 1
+                stats["跳过字节"] += sum(map(len, interior)) + len(interior)
+                stats["复用结果"] += sum(1 for event in events if event[3] is not None)
+            for kind, value, name, line in events:
+                yield kind, value, name, line + body_start if line is not None else None
+            scanned = body_end - context
+            # 之后的扫描最多回看到 scanned - context 行
+            del buffer[:max(0, scanned - context - base)]
+            base = max(base, scanned - context)
+        yield from scan(base + len(buffer))
+
+        self.record_stats.update(stats)
+        counters = self.profiler.counters
+        counters["记录去重/记录总数"] += stats["记录总数"]
+        counters["记录去重/复用记录"] += stats["复用记录"]
+        counters["记录去重/跳过字节"] += stats["跳过字节"]
+        logger.info(f"按记录解析: {stats['记录总数']} 条抓取记录，正文重复 {stats['复用记录']} 条，"
+                    f"跳过 {stats['跳过字节']} / {stats['正文字节']} 字节，复用 {stats['复用结果']} 条行解析结果")
+
+    def _resolve_fragment_pair(self, match):
+        """把片段扫描的候选对转换为 (名称, 链接)，两个元素都不是有效链接时返回None"""
+        # 判断哪个是名称，哪个是URL
+        actual_url = self.extract_actual_url(match[1])
+        if actual_url:
+            name = match[0]
+        else:
+            actual_url = self.extract_actual_url(match[0])
+            if not actual_url:
+                if self.debug_log.enabled:
+                    self.debug_log("片段扫描/丢弃候选",
+                                   "正则匹配丢弃: 匹配项 '%s' 中的两个元素均不是有效的 provide/vod 链接。", match)
+                return None
+            name = match[1]
+        return self._make_record(name.strip(), actual_url)
+
+    def _iter_fragment_pairs(self, chunks, resolve=None, deferred=None):
+        """单遍扫描内容（字符串或文本块迭代器），按旧版三条正则的顺序产出 (名称, 链接) 候选对"""
+        # resolve 不为None时候选对在匹配到时立即转换，丢弃返回None的；
+        # deferred 为列表时模式2、模式3的结果不产出，而是作为两个列表追加到其中
+        if isinstance(chunks, str):
+            chunks = (chunks,)
+        locator = _LineLocator() if resolve is not None else None
+
+        name_first = _FieldPairMatcher(_NAME_FIELDS, resolve)
+        api_first = _FieldPairMatcher(_API_FIELDS, resolve)
+
+        # 模式1 {"name": ..., "api": ...} 边扫描边产出；模式2/3在扫描结束后依次产出，保持旧版的优先顺序。
+        # 模式1的状态：刚扫描到的 '{'（含其后空白）的结束位置、已确认的开头名称及其后的api
+        brace_end = -1
+        object_name = None
+        object_api = None
+        api_from = 0
+        close_from = 0
+        object_count = 0
+        object_line = None
+        token_count = 0
+
+        for match, offset in _iter_chunk_tokens(chunks, locator):
+            token_count += 1
+            start = offset + match.start()
+            field = match.group(2)
+
+            if field is None:
+                if match.group(1):
+                    # '{'：仅在模式1空闲时作为新对象的起点
+                    if object_name is None:
+                        brace_end = offset + match.end()
+                    continue
+
+                # '}'
+                brace_end = -1
+                name_first.feed_close_brace(start)
+                api_first.feed_close_brace(start)
+                if object_api is not None and start >= close_from:
+                    object_count += 1
+                    pair = (object_name, object_api)
+                    object_name = object_api = None
+                    if resolve is not None:
+                        pair = resolve(pair)
+                        if isinstance(pair, SourceRecord):
+                            pair.line = object_line
+                    if pair is not None:
+                        yield pair
+                continue
 
-    def _parse_lines_with_context(self, lines):
-        """解析文本行，考虑上下文关联"""
-        results = []
-        pending_names = []  # 存储待匹配的名称
+            value = match.group(3)
+            end = offset + match.end(3) + 1  # 包含值的结束引号
+
+            if object_name is None:
+                if start == brace_end and field in _NAME_FIELDS and match.group(4) is not None:
+                    object_name = value
+                    api_from = offset + match.end(4)
+                brace_end = -1
+            elif object_api is None and field in _API_FIELDS and start >= api_from:
+                object_api = value
+                close_from = end
+                if locator is not None:
+                    object_line = locator.locate(match.string, match.start())
+
+            # 模式2/3匹配成功时结果的行号取完成匹配的字段所在的行
+            if name_first.feed_field(field, value, start, end) and isinstance(name_first.matches[-1], SourceRecord):
+                name_first.matches[-1].line = locator.locate(match.string, match.start())
+            if api_first.feed_field(field, value, start, end) and isinstance(api_first.matches[-1], SourceRecord):
+                api_first.matches[-1].line = locator.locate(match.string, match.start())
+
+        counters = self.profiler.counters
+        counters["正则/片段词法单元"] += token_count
+        counters["片段扫描/模式1匹配"] += object_count
+        counters["片段扫描/模式2匹配"] += name_first.match_count
+        counters["片段扫描/模式3匹配"] += api_first.match_count
+        logger.debug("片段扫描: 模式 1 匹配到 %d 个潜在结果。", object_count)
+        logger.debug("片段扫描: 模式 2 匹配到 %d 个潜在结果。", name_first.match_count)
+        logger.debug("片段扫描: 模式 3 匹配到 %d 个潜在结果。", api_first.match_count)
+
+        if deferred is not None:
+            deferred.extend((name_first.matches, api_first.matches))
+            return
+        yield from name_first.matches
+        # 模式3的捕获顺序是 (api, name)，与旧版一致
+        yield from api_first.matches
+
+
+    def _scan_line_events(self, lines, first, last, line_offset=0):
+        """扫描 lines[first:last] 的行事件并返回列表，见 _iter_line_events"""
+        return list(self._iter_line_events(lines, first, last, line_offset))
+
+    def _iter_line_events(self, lines, first=0, last=None, line_offset=0):
+        """逐行扫描 lines[first:last]，产出与待匹配名称队列无关的行事件（格式见 _LINE_EVENT_NAMES 等），行号加上 line_offset"""
+        # first 之前、last 之后的行只作为上下文；行迭代器包装为 _LineWindow，列表直接按下标访问
+        windowed = not isinstance(lines, list)
+        if windowed:
+            lines = _LineWindow(lines)
+        # 滚动窗口：行号 -> 该行的候选名称，每行只提取一次；
+        # 向后查找需要的行按需提取，之后正向扫描到该行时直接复用
+        window = {}
+        debug_log = self.debug_log
+        extract_names = self._extract_potential_names_from_line
+
+        def names_at(i, line=None):
+            names = window.get(i)
+            if names is None:
+                if line is None:
+                    line = lines[i].strip()
+                names = window[i] = self._extract_potential_names_from_line(line) if line else []
+            return names
+
+        # 按块预先提取各行的URL并批量校验：行号 -> URL列表，URL -> 校验结果
+        block_urls = {}
+        block_results = {}
+        block_end = first
+
+        for index in itertools.count(first):
+            if last is not None and index >= last:
+                break
+            if index >= block_end:
+                block_end = index + _URL_BATCH_LINES
+                if last is not None:
+                    block_end = min(block_end, last)
+                if windowed:
+                    lines.fill(block_end)
+                block_end = min(block_end, len(lines))
+                block_urls = {i: _LINE_URL_PATTERN.findall(lines[i]) for i in range(index, block_end)}
+                candidates = list(itertools.chain.from_iterable(block_urls.values()))
+                block_results = dict(zip(candidates, self.validate_urls(candidates)))
+                self.profiler.counters["正则/行内URL"] += len(candidates)
+                # 只保留向前查找还会用到的行，以及已按需提取的后续行
+                window = {i: names for i, names in window.items() if i >= index - _CONTEXT_SEARCH_RANGE}
+            # 向后查找最多看到 index + _CONTEXT_SEARCH_RANGE - 1 行，向前最多回看 _CONTEXT_SEARCH_RANGE 行
+            if windowed:
+                lines.fill(index + _CONTEXT_SEARCH_RANGE)
+                if index >= len(lines):
+                    break
+                lines.release(index - _CONTEXT_SEARCH_RANGE)
+            elif index >= len(lines):
+                break
 
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
+            line = lines[index].strip()
             if not line:
                 continue
 
-            # 查找URL
-            url_pattern = r'https?://[^\s\'"<>,]+'
-            urls = re.findall(url_pattern, line)
+            # 查找URL（已在块内预先提取）
+            urls = block_urls[index]
 
             if not urls:
-                logger.debug(f"行解析: 第 {line_num} 行未找到任何 http/https URL。行内容: '{line[:100]}'")
-                # 注意：即使没有URL，也要继续执行，以便提取潜在的名称
+                if debug_log.enabled:
+                    debug_log("行解析/无URL的行", "行解析: 第 %d 行未找到任何 http/https URL。行内容: '%.100s'",
+                              index + 1 + line_offset, line)
+                # 即使没有URL，也要提取潜在的名称（大部分行走这里，不经过 names_at）
+                potential_names = window.get(index)
+                if potential_names is None:
+                    potential_names = window[index] = extract_names(line)
+                if potential_names:
+                    yield _LINE_EVENT_NAMES, potential_names, None, None
+                continue
 
             found_valid_url = False
             for url in urls:
                 # extract_actual_url 内部会记录详细的失败日志，这里我们只需知道它成功与否
-                actual_url = self.extract_actual_url(url)
+                actual_url = block_results[url]
                 if actual_url:
                     found_valid_url = True
 
-
                     # 尝试从当前行获取名称
-                    name = self._extract_name_from_line(line, url)
-
-                    # 如果当前行没有好的名称，尝试使用之前存储的名称
-                    if (not name or name == "未知资源") and pending_names:
-                        name = pending_names.pop(0)
-
-                    # 如果还是没有名称，尝试向前查找
-                    if not name or name == "未知资源":
-                        name = self._find_contextual_name(lines, line_num - 1, url)
-
-                    # 最后回退到域名提取
-                    if not name:
-                        name = self.extract_domain_name(actual_url)
+                    name = self._extract_name_from_line(line, url, names_at(index, line))
+                    if name and name != "未知资源":
+                        yield _LINE_EVENT_SOURCE, actual_url, name, index + 1 + line_offset
+                        continue
 
-                    results.append((name, actual_url))
+                    # 当前行没有好的名称时优先使用之前存储的名称；
+                    # 队列为空（或取到的名称也不可用）时向前后查找，最后回退到域名提取
+                    fallback_name = self._find_contextual_name(lines, index, url, names_at)
+                    if not fallback_name:
+                        fallback_name = self.extract_domain_name(actual_url)
+                    yield _LINE_EVENT_PENDING, actual_url, fallback_name, index + 1 + line_offset
 
             # 如果本行没有找到有效URL，但可能包含名称
             if not found_valid_url:
-                potential_names = self._extract_potential_names_from_line(line)
-                pending_names.extend(potential_names)
+                potential_names = names_at(index, line)
+                if potential_names:
+                    yield _LINE_EVENT_NAMES, potential_names, None, None
 
+    def _resolve_line_events(self, events):
+        """按顺序回放行事件，用待匹配名称队列确定最终名称"""
+        results = []
+        # 待匹配名称队列是先进先出的，第k次取出的一定是第k个加入的名称，
+        # 所以只需保存最早加入的 _PENDING_NAMES_LIMIT 个名称，其余只计数，内存与文件大小无关
+        pending_names = deque()  # 存储待匹配的名称
+        pushed_count = 0
+        popped_count = 0
+
+        make_record = self._make_record
+        for kind, value, name, line in events:
+            if kind == _LINE_EVENT_NAMES:
+                room = _PENDING_NAMES_LIMIT - pushed_count
+                if room > 0:
+                    pending_names.extend(value[:room])
+                pushed_count += len(value)
+            elif kind == _LINE_EVENT_SOURCE:
+                results.append(make_record(name, value, line))
+            else:
+                pending_name = None
+                if pushed_count > popped_count:
+                    if pending_names:
+                        pending_name = pending_names.popleft()
+                    elif popped_count == _PENDING_NAMES_LIMIT:
+                        logger.warning(f"行解析: 待匹配名称取出次数超过 {_PENDING_NAMES_LIMIT}，之后改用上下文名称")
+                    popped_count += 1
+                if pending_name and pending_name != "未知资源":
+                    name = pending_name
+                results.append(make_record(name, value, line))
+
+        counters = self.profiler.counters
+        counters["行解析/待匹配名称入队"] += pushed_count
+        counters["行解析/待匹配名称取出"] += popped_count
         return results
 
+    def _iter_line_events_parallel(self, lines, jobs, total_size):
+        """在进程池中按抓取记录分片扫描行事件，按分片顺序产出"""
+        # 分片边读边提交，同时排队的分片数有上限
+        target_size = min(total_size // (jobs * _SHARDS_PER_JOB) + 1, _MAX_SHARD_SIZE)
+        shards = _iter_record_shards(lines, target_size)
+
+        logger.info(f"行解析: 使用 {jobs} 个进程按抓取记录分片解析")
+        shard_count = 0
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = deque()
+            for shard in shards:
+                futures.append(executor.submit(_scan_line_shard, *shard, self.debug_log.limit))
+                shard_count += 1
+                if len(futures) >= jobs * _SHARDS_IN_FLIGHT_PER_JOB:
+                    events, counters, debug_counts = futures.popleft().result()
+                    self.profiler.merge_counters(counters)
+                    self.debug_log.merge(debug_counts)
+                    yield from events
+            while futures:
+                events, counters, debug_counts = futures.popleft().result()
+                self.profiler.merge_counters(counters)
+                self.debug_log.merge(debug_counts)
+                yield from events
+        self.profiler.counters["行解析/分片"] += shard_count
+        logger.info(f"行解析: 共处理 {shard_count} 个分片")
+
+    def _iter_line_events_prefiltered(self, mm):
+        """预过滤模式的行事件：只完整解析包含 provide/vod 的行及其上下文，回放结果与完整行解析一致"""
+        # 其他行只会把名称加入待匹配队列，名称数达到 PENDING 事件总数后再加入也不会被取出，
+        # 所以先按组扫描命中行，再只在名称不足时解码组之间的行
+        groups = []  # (首个命中行的行首偏移, 最后命中行的行尾偏移, 行事件列表)
+        pending_total = 0
+        names_total = 0
+        hit_lines = 0
+        group = []
+        group_size = 0
+        for hit in itertools.chain(_iter_mapped_hit_lines(mm), [None]):
+            if group and (hit is None or hit[0] - group[-1][0] > 2 * _CONTEXT_SEARCH_RANGE
+                          or group_size > _MAX_SHARD_SIZE):
+                events = self._scan_mapped_group(mm, group)
+                for index, (kind, value, _, _) in enumerate(events):
+                    if kind == _LINE_EVENT_PENDING:
+                        pending_total += 1
+                    elif kind == _LINE_EVENT_NAMES:
+                        if names_total >= _PENDING_NAMES_LIMIT:
+                            # 之前加入的名称已超过队列保存上限，这些名称只会被计数，用 range 代替以节省内存
+                            events[index] = (kind, range(len(value)), None, None)
+                        names_total += len(value)
+                groups.append((group[0][1], group[-1][2], events))
+                hit_lines += len(group)
+                group = []
+                group_size = 0
+            if hit is not None:
+                group.append(hit)
+                group_size += hit[2] - hit[1]
+
+        counters = self.profiler.counters
+        counters["预过滤/命中行"] += hit_lines
+        counters["预过滤/分组"] += len(groups)
+        logger.info(f"行解析(预过滤): {hit_lines} 行包含 provide/vod，分为 {len(groups)} 组")
+
+        pushed_count = 0
+        gap_start = 0
+        for first_start, last_end, events in groups:
+            if pushed_count < pending_total:
+                for line in _iter_mapped_lines(mm, gap_start, first_start):
+                    line = line.strip()
+                    names = self._extract_potential_names_from_line(line) if line else []
+                    counters["预过滤/解码的其他行"] += 1
+                    if names:
+                        pushed_count += len(names)
+                        yield _LINE_EVENT_NAMES, names, None, None
+                        if pushed_count >= pending_total:
+                            break
+            for event in events:
+                if event[0] == _LINE_EVENT_NAMES:
+                    pushed_count += len(event[1])
+                yield event
+            gap_start = _skip_line_break(mm, last_end)
+
+    def _scan_mapped_group(self, mm, group):
+        """扫描一组命中行 [(行号, 行首偏移, 行尾偏移), ...] 的行事件，前后各带 _CONTEXT_SEARCH_RANGE 行上下文"""
+        first_line, first_start, _ = group[0]
+        last_line, _, last_end = group[-1]
+        lines, before = _mapped_window(mm, first_start, last_end, _CONTEXT_SEARCH_RANGE)
+        return self._scan_line_events(lines, before, before + last_line - first_line + 1, first_line - before)
+
     def _extract_potential_names_from_line(self, line):
         """从行中提取所有可能的名称"""
+        # 先判断有没有中文、引号、TV 和 name/key 字段，用不到的正则不执行
         names = []
-
-        # 匹配name字段
-        name_matches = re.findall(r'"(?:name|key)"\s*:\s*"([^"]+)"', line)
-        names.extend(name_matches)
-
-        # 匹配引号中的中文或有意义的英文
-        quoted_matches = re.findall(r'"([^"]*(?:[\u4e00-\u9fff]|资源|影视|视频|电影|TV)[^"]*)"', line)
-        for match in quoted_matches:
-            if len(match) > 1 and not match.startswith('http'):
-                names.append(match)
-
-        # 匹配纯中文词组
-        chinese_matches = re.findall(r'[\u4e00-\u9fff]{2,}(?:资源|影视|视频|电影|TV)?', line)
-        names.extend(chinese_matches)
+        field_count = quoted_count = chinese_count = 0
+        has_cjk = not line.isascii() and _CJK_CHAR_PATTERN.search(line) is not None
+
+        if has_cjk or '"' in line:
+            # 匹配name字段
+            if '"name"' in line or '"key"' in line:
+                name_matches = _NAME_FIELD_VALUE_PATTERN.findall(line)
+                names.extend(name_matches)
+                field_count = len(name_matches)
+
+            # 匹配引号中的中文或有意义的英文
+            if has_cjk or 'TV' in line:
+                quoted_matches = _QUOTED_NAME_PATTERN.findall(line)
+                for match in quoted_matches:
+                    if len(match) > 1 and not match.startswith('http'):
+                        names.append(match)
+                quoted_count = len(quoted_matches)
+
+            # 匹配纯中文词组
+            if has_cjk:
+                chinese_matches = _CJK_RUN_PATTERN.findall(line)
+                names.extend(chinese_matches)
+                chinese_count = len(chinese_matches)
+
+        counters = self.profiler.counters
+        counters["正则/名称-name字段"] += field_count
+        counters["正则/名称-引号内容"] += quoted_count
+        counters["正则/名称-中文词组"] += chinese_count
 
         return [name.strip() for name in names if name.strip()]
 
-    def _find_contextual_name(self, lines, current_index, url):
-        """在上下文中查找名称"""
-        search_range = 5  # 向前向后搜索的行数
+    def _find_contextual_name(self, lines, current_index, url, names_at=None):
+        """在上下文中查找名称，names_at(行号) 可提供已缓存的每行候选名称"""
+        search_range = _CONTEXT_SEARCH_RANGE  # 向前向后搜索的行数
+        if names_at is None:
+            names_at = lambda i: self._extract_potential_names_from_line(lines[i].strip())
 
         # 向前查找
         for i in range(max(0, current_index - search_range), current_index):
-            if i < 0 or i >= len(lines):
-                continue
-            line = lines[i].strip()
-            if not line:
-                continue
-
-            names = self._extract_potential_names_from_line(line)
+            names = names_at(i)
             if names:
                 return names[0]  # 返回第一个找到的名称
 
         # 向后查找
         for i in range(current_index + 1, min(len(lines), current_index + search_range)):
-            if i >= len(lines):
-                break
-            line = lines[i].strip()
-            if not line:
-                continue
-
-            names = self._extract_potential_names_from_line(line)
+            names = names_at(i)
             if names:
                 return names[0]
 
         return None
 
     def _parse_json_data(self, data, parent_key=""):
-        """递归解析JSON数据"""
-        results = []
-
-        if isinstance(data, dict):
-            # 首先检查当前字典是否本身就是一个资源对象
-            if self._is_source_object(data):
-                name, url = self._extract_from_source_object(data)
-                if name and url:
-                    results.append((name, url))
-                    return results
-
-            # 遍历字典的键值对
-            for key, value in data.items():
-                if isinstance(value, str):
-                    actual_url = self.extract_actual_url(value)
-                    if actual_url:
-                        # 尝试从同一字典中获取对应的名称
-                        name = self._extract_name_from_json(data, key, parent_key)
-                        results.append((name, actual_url))
-                elif isinstance(value, dict):
-                    # 递归处理嵌套字典
-                    results.extend(self._parse_json_data(value, key))
-                elif isinstance(value, list):
-                    # 处理数组
-                    for item in value:
-                        if isinstance(item, dict):
-                            # 检查数组元素是否是资源对象
-                            if self._is_source_object(item):
-                                name, url = self._extract_from_source_object(item)
-                                if name and url:
-                                    results.append((name, url))
-                            else:
-                                results.extend(self._parse_json_data(item, key))
-                        else:
-                            results.extend(self._parse_json_data(item, key))
-
-        elif isinstance(data, list):
-            for item in data:
-                results.extend(self._parse_json_data(item, parent_key))
-
-        return results
-
-    def _is_source_object(self, obj):
-        """检查对象是否是资源对象"""
-        if not isinstance(obj, dict):
-            return False
-
-        # 检查常见的URL字段
-        url_fields = ['url', 'api', 'base_url', 'link']
-        has_url = False
+        """解析JSON数据，返回 SourceRecord 列表（没有行号），见 _iter_json_sources"""
+        make_record = self._make_record
+        return [make_record(name, url) for name, url in self._iter_json_sources(data, parent_key)]
+
+    def _iter_json_sources(self, data, parent_key=""):
+        """用显式栈深度优先遍历JSON数据，按文档顺序产出 (名称, 链接)，不受递归深度限制
+
+        栈中每一帧是 (子项迭代器, 所属字典, 父级key, 是否为字典值中的数组)：
+        所属字典不为None时迭代的是它的键值对，否则迭代数组元素。
+          - 字典本身是资源对象且名称非空时只产出它，不再深入；
+          - 字典中的字符串值是有效链接时，名称取同一字典的 name/key，否则用父级key或当前key；
+          - 字典值中的数组里，资源对象直接产出（名称为空时丢弃），其余元素继续深入。
+        """
+        stack = []
+
+        def visit(value, key):
+            if isinstance(value, dict):
+                source = self._classify_source_object(value)
+                if source is not None and source[0]:
+                    return source
+                stack.append((iter(value.items()), value, key, False))
+            elif isinstance(value, list):
+                stack.append((iter(value), None, key, False))
+            return None
 
-        for field in url_fields:
-            if field in obj and isinstance(obj[field], str):
-                # 检查是否是有效的provide/vod链接
-                if self.extract_actual_url(obj[field]):
-                    has_url = True
-                    break
+        source = visit(data, parent_key)
+        if source is not None:
+            yield source
+            return
 
-        # 如果有有效的URL，并且有name或key字段，则认为是资源对象
-        if has_url and ('name' in obj or 'key' in obj):
-            return True
+        while stack:
+            items, owner, key, in_dict_value = stack[-1]
+            for item in items:
+                if owner is not None:
+                    # 字典的键值对
+                    child_key, value = item
+                    if isinstance(value, str):
+                        actual_url = self.extract_actual_url(value)
+                        if actual_url:
+                            # 尝试从同一字典中获取对应的名称
+                            yield self._extract_name_from_json(owner, child_key, key), actual_url
+                    elif isinstance(value, dict):
+                        source = visit(value, child_key)
+                        if source is not None:
+                            yield source
+                        else:
+                            break
+                    elif isinstance(value, list):
+                        stack.append((iter(value), None, child_key, True))
+                        break
+                elif in_dict_value and isinstance(item, dict):
+                    # 字典值中的数组元素：资源对象直接产出，否则作为普通字典深入
+                    source = self._classify_source_object(item)
+                    if source is not None:
+                        if source[0]:
+                            yield source
+                    else:
+                        stack.append((iter(item.items()), item, key, False))
+                        break
+                elif isinstance(item, (dict, list)):
+                    source = visit(item, key)
+                    if source is not None:
+                        yield source
+                    else:
+                        break
+            else:
+                # 当前帧迭代完毕
+                stack.pop()
 
-        return False
+    def _classify_source_object(self, obj):
+        """判断字典是否是资源对象，是则返回 (名称, 链接)，否则返回None
 
-    def _extract_from_source_object(self, obj):
-        """从资源对象中提取名称和URL"""
-        url_fields = ['api', 'base_url', 'url', 'link']
+        有效链接按 api、base_url、url、link 的优先级取第一个，并且要有 name 或 key 字段；
+        名称优先取 name，其次 key，为空时从链接提取。每个字段只校验一次。
+        """
         url = None
-
-        # 按优先级查找URL字段
-        for field in url_fields:
-            if field in obj and isinstance(obj[field], str):
-                url = self.extract_actual_url(obj[field])
+        for field in ('api', 'base_url', 'url', 'link'):
+            value = obj.get(field)
+            if isinstance(value, str):
+                url = self.extract_actual_url(value)
                 if url:
                     break
 
-        if not url:
-            return None, None
+        # 如果有有效的URL，并且有name或key字段，则认为是资源对象
+        if not url or ('name' not in obj and 'key' not in obj):
+            return None
 
         # 获取名称，优先使用name字段，其次是key字段
         name = obj.get('name', obj.get('key', ''))
@@ -466,67 +2467,211 @@ class VideoSourceProcessor:
 
         return "未知资源"
 
-    def _extract_name_from_line(self, line, url):
-        """从文本行中提取名称"""
-        # 移除URL，看剩下的内容是否可以作为名称
-        line_without_url = line.replace(url, '').strip()
-
+    def _extract_name_from_line(self, line, url, names=None):
+        """从文本行中提取名称，names 为该行已提取好的候选名称"""
         # 优先查找JSON字段中的名称
-        names = self._extract_potential_names_from_line(line)
+        if names is None:
+            names = self._extract_potential_names_from_line(line)
         if names:
             return names[0]
 
         # 如果没有找到合适的名称，从URL中提取
         return self.extract_domain_name(url)
 
-    def remove_duplicates(self, data):
-        """去除重复项，保留第一个出现的"""
-        seen_urls = set()
+    def remove_duplicates(self, data, survivors=None, merge_stats=None):
+        """按规范键去除重复项，保留第一个出现的（见 canonical_url_key）
+
+        data 中的记录（SourceRecord 或 (名称, 链接)）原样放入结果列表，不复制；
+        survivors 为字典时填入 规范键 -> 保留下来的记录；
+        merge_stats 为 Counter 时按规则统计被合并的条目数，一个条目可能同时由多条规则合并。
+        """
+        if survivors is None:
+            survivors = {}
+        survivor_parts = {}
+        url_info = self.url_info
         unique_data = []
         duplicate_data = []  # 新增：用于存储被删除的重复项
 
-        for name, url in data:
-            if url not in seen_urls:
-                seen_urls.add(url)
-                unique_data.append((name, url))
-            else:
-                # 新增：如果URL已存在，则将其添加到重复数据列表中
-                duplicate_data.append((name, url))
+        with self.profiler.stage("去重", records_in=len(data)) as stats:
+            for record in data:
+                info = url_info(record[1])
+                key, parts = info.canonical_key, info.canonical_parts
+                if key not in survivors:
+                    survivors[key] = record
+                    survivor_parts[key] = parts
+                    unique_data.append(record)
+                else:
+                    # 新增：如果URL已存在，则将其添加到重复数据列表中
+                    duplicate_data.append(record)
+                    if merge_stats is not None:
+                        merge_stats.update(_canonical_merge_rules(survivor_parts.get(key), parts))
+            stats["records_out"] += len(unique_data)
 
         return unique_data, duplicate_data # <--- 修正点：现在返回两个值
 
+    def describe_merge_stats(self, merge_stats):
+        """把 remove_duplicates 的合并统计格式化为一行文字"""
+        parts = [f"{label} {merge_stats[rule]}" for rule, label in _CANONICAL_RULE_LABELS.items() if merge_stats[rule]]
+        return "，".join(parts) if parts else "无"
+
+
+    def probe_sources(self, data, concurrency=PROBE_CONCURRENCY, per_host=PROBE_PER_HOST, timeout=PROBE_TIMEOUT):
+        """并发探测每个api是否可用，返回 {链接: 探测结果}，见 _probe_url"""
+        urls = list(dict.fromkeys(url for _, url in data))
+        if not urls:
+            return {}
+
+        logger.info(f"正在探测 {len(urls)} 个资源 (并发 {concurrency}，每主机 {per_host}，超时 {timeout}s)...")
+        start = time.perf_counter()
+        with self.profiler.stage("可用性探测", records_in=len(urls)) as stats:
+            health = asyncio.run(_probe_urls(urls, concurrency, per_host, timeout))
+            stats["records_out"] += len(health)
+        alive_count = sum(1 for result in health.values() if result["alive"])
+        logger.info(f"探测完成: 可用 {alive_count} 个，不可用 {len(urls) - alive_count} 个，"
+                    f"耗时 {time.perf_counter() - start:.1f}s")
+        return health
+
+    def apply_probe_results(self, data, health, drop_dead=False, sort_by_latency=False):
+        """按探测结果过滤/排序数据：drop_dead 去掉不可用的资源，sort_by_latency 按延迟升序排列（不可用的排在最后）
+
+        没有探测结果的资源视为可用，排序时排在有延迟的资源之后。
+        """
+        if drop_dead:
+            data = [record for record in data if health.get(record[1], {"alive": True})["alive"]]
+        if sort_by_latency:
+            def latency_key(item):
+                result = health.get(item[1])
+                if result is None:
+                    return (1, 0)
+                if not result["alive"]:
+                    return (2, 0)
+                return (0, result["latency_ms"])
+            data = sorted(data, key=latency_key)
+        return data
 
     def compare_and_filter(self, file1_data, file2_data):
-        """比较两个文件的数据，移除file1中在file2中存在的链接"""
-        file2_urls = {url for _, url in file2_data}
-        filtered_data = []
+        """比较两个文件的数据，移除file1中在file2中存在的链接（按规范键比较）"""
+        with self.profiler.stage("比较过滤", records_in=len(file1_data)) as stats:
+            url_info = self.url_info
+            file2_keys = {url_info(url).canonical_key for _, url in file2_data}
+            filtered_data = []
 
-        for name, url in file1_data:
-            if url not in file2_urls:
-                filtered_data.append((name, url))
+            for record in file1_data:
+                if url_info(record[1]).canonical_key not in file2_keys:
+                    filtered_data.append(record)
+            stats["records_out"] += len(filtered_data)
 
         return filtered_data
 
-    def generate_json_output(self, data):
-        """生成JSON格式输出"""
-        # 修改点：创建api_site字典来存放资源
-        api_site_data = {}
-
-        for i, (name, url) in enumerate(data, 1):
-            api_key = f"api_{i}"
+    def merge_playlists(self, target, sources):
+        """把多个 M3U/M3U8 播放列表合并进 target（如 iptv/collect.m3u），返回合并统计 Counter
+
+        target 中已有的条目按原文和原有的换行符保留（其中重复的去掉），新列表中不重复的条目按出现顺序追加在后面；
+        重复按 PlaylistEntry.dedup_key 判断。所有列表都是流式读写，内存中只保存每个条目16字节的去重摘要，
+        几百MB的播放列表也不会整体读入内存。target 不存在时新建；没有任何变化时不改写 target。
+        """
+        stats = Counter()
+        seen = set()
+        temp_file = f"{target}.tmp"
+        header = None
+        newline = '\n'
+
+        def write_line(out, line):
+            out.write(line.replace('\n', newline) if newline != '\n' else line)
+            out.write(newline)
+
+        def write_entry(out, entry):
+            key = entry.dedup_key()
+            if key in seen:
+                return False
+            seen.add(key)
+            write_line(out, entry.text)
+            return True
 
-            # 提取detail URL (域名部分)
+        try:
+            with self.profiler.stage("合并M3U") as stage_stats, \
+                    open(temp_file, 'w', encoding='utf-8', newline='') as out:
+                if os.path.exists(target):
+                    with open_playlist(target) as f:
+                        reader = M3uReader(f, target)
+                        newline = reader.newline
+                        header = reader.header or _M3U_HEADER
+                        write_line(out, header)
+                        for entry in reader:
+                            stats["已有条目"] += 1
+                            if write_entry(out, entry):
+                                stats["保留条目"] += 1
+                            else:
+                                stats["已有重复"] += 1
+                        for line in reader.tail:
+                            write_line(out, line)
+
+                for source in sources:
+                    label = "标准输入" if source == STDIN_PATH else source
+                    added = duplicates = 0
+                    try:
+                        with open_playlist(source) as f:
+                            reader = M3uReader(f, source)
+                            if header is None:
+                                header = reader.header or _M3U_HEADER
+                                write_line(out, header)
+                            for entry in reader:
+                                if write_entry(out, entry):
+                                    added += 1
+                                else:
+                                    duplicates += 1
+                    except (OSError, ValueError) as e:
+                        # 网络错误等只跳过这个列表，已经读到的完整条目保留
+                        logger.error(f"读取播放列表 {label} 时出错: {str(e)}")
+                        stats["读取失败的列表"] += 1
+                    logger.info(f"{label}: 新增 {added} 条，重复 {duplicates} 条")
+                    stats["新增条目"] += added
+                    stats["新列表重复"] += duplicates
+                stage_stats["records_in"] += stats["已有条目"] + stats["新增条目"] + stats["新列表重复"]
+                stage_stats["records_out"] += len(seen)
+
+            if stats["新增条目"] or stats["已有重复"] or not os.path.exists(target):
+                os.replace(temp_file, target)
+                stats["已改写"] = 1
+            else:
+                os.remove(temp_file)
+        except BaseException:
             try:
-                parsed = urllib.parse.urlparse(url)
-                detail_url = f"{parsed.scheme}://{parsed.netloc}"
-            except:
-                detail_url = url
-
-            api_site_data[api_key] = {
-                "name": name,
-                "api": url,
-                "detail": detail_url
-            }
+                os.remove(temp_file)
+            except OSError:
+                pass
+            raise
+        return stats
+
+    def generate_json_output(self, data, start=1, health=None, entry_cache=None):
+        """生成JSON格式输出，start为第一个 api_N 的编号，health为 probe_sources 的结果时为每项附加探测信息
+
+        entry_cache 为字典时按 (名称, 链接) 复用已生成的条目（SourceRecord 直接作键），多次输出有重叠数据时每个条目只生成一次。
+        """
+        # 修改点：创建api_site字典来存放资源
+        api_site_data = {}
+        if entry_cache is None:
+            entry_cache = {}
+
+        with self.profiler.stage("生成JSON", records_in=len(data)) as stats:
+            for i, record in enumerate(data, start):
+                api_key = f"api_{i}"
+                name, url = record
+
+                # SourceRecord 与等值的 (名称, 链接) 元组哈希相同，直接用记录本身作键
+                entry = entry_cache.get(record)
+                if entry is None:
+                    # detail URL (域名部分) 从链接索引读取
+                    entry = entry_cache[record] = {
+                        "name": name,
+                        "api": url,
+                        "detail": self.url_info(url).detail
+                    }
+                    if health and url in health:
+                        entry["health"] = health[url]
+
+                api_site_data[api_key] = entry
+            stats["records_out"] += len(api_site_data)
 
         # 修改点：构建最终的、符合附件格式的完整结构
         final_json_structure = {
@@ -536,6 +2681,54 @@ class VideoSourceProcessor:
 
         return final_json_structure
 
+    def iter_crawl_records(self, lines):
+        """从行迭代器中逐条产出抓取记录 (记录头, 记录正文)，第一个记录头之前的报告概要作为记录头为空的记录产出"""
+        for header_lines, body_lines, _ in _iter_crawl_blocks(lines):
+            yield '\n'.join(header_lines), '\n'.join(body_lines)
+
+    def load_incremental_index(self, index_file):
+        """读取增量索引，不存在或无法读取时返回None"""
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {
+                "files": dict(data.get("files", {})),
+                "records": set(data.get("records", [])),
+                "urls": set(data.get("urls", [])),
+            }
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"增量索引 {index_file} 无法读取，将重新建立: {e}")
+            return None
+
+    def save_incremental_index(self, index, index_file):
+        """保存增量索引，先写临时文件再替换，避免中断时留下损坏的索引"""
+        data = {
+            "version": INCREMENTAL_INDEX_VERSION,
+            "files": index["files"],
+            "records": sorted(index["records"]),
+            "urls": sorted(index["urls"]),
+        }
+        try:
+            write_file_atomic(index_file, serialize_json(data))
+            logger.info(f"增量索引已保存到: {index_file} (链接 {len(index['urls'])} 条，记录 {len(index['records'])} 个)")
+        except Exception as e:
+            logger.error(f"保存增量索引时出错: {str(e)}")
+
+    def build_incremental_index(self, crawl_lines, baseline_content, urls):
+        """根据一次完整处理的输入和汇总链接建立增量索引，crawl_lines 为抓取结果的行迭代器，逐条记录计算摘要"""
+        crawl_digest = hashlib.sha256()
+        records = {_content_digest(body) for _, body in self.iter_crawl_records(_hash_lines(crawl_lines, crawl_digest))}
+        return {
+            "files": {
+                "crawl": crawl_digest.hexdigest(),
+                "baseline": _content_digest(baseline_content),
+            },
+            "records": records,
+            "urls": set(urls),
+        }
+
     def print_data_details(self, title, data, max_items=20):
         """打印数据详情，支持限制显示数量"""
         print(f"\n{'=' * 50}")
@@ -553,9 +2746,12 @@ class VideoSourceProcessor:
         print(f"显示前 {display_count} 条:")
         print("-" * 50)
 
-        for i, (name, url) in enumerate(data[:display_count], 1):
+        for i, record in enumerate(data[:display_count], 1):
+            name, url = record
             print(f"{i:2d}. 名称: {name}")
             print(f"    链接: {url}")
+            if isinstance(record, SourceRecord) and record.source:
+                print(f"    来源: {record.provenance}")
             print()
 
         # 如果数据太多，提示省略的数量
@@ -564,16 +2760,37 @@ class VideoSourceProcessor:
 
         print("-" * 50)
 
-    def process_file(self, file_path, file_type="unknown"):
-        """处理单个文件"""
+    def process_file(self, file_path, file_type="unknown", jobs=1, prefilter=False, stdin_text=None):
+        """处理单个文件，file_path 为 "-" 时解析调用方读入的标准输入 stdin_text，prefilter 见 parse_file_stream（对标准输入无效）"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-
             logger.info(f"正在处理文件: {file_path}")
-            # 修改点：现在接收两个返回值
-            valid_data, invalid_data = self.parse_file_content(content, file_type)
+            if file_path == STDIN_PATH:
+                # 标准输入不能回退重读，由调用方整体读入后解析
+                content = stdin_text
+                with self.profiler.stage("解析 标准输入", bytes_in=len(content)) as stats:
+                    valid_data, invalid_data = self.parse_file_content(content, file_type, jobs)
+                    stats["records_out"] += len(valid_data)
+                logger.info(f"从标准输入中提取到 {len(valid_data)} 条有效数据")
+                self.set_record_source(valid_data, file_path)
+                return valid_data, invalid_data
+
+            # 流式读取，大文件不会整体加载到内存
+            with open(file_path, 'r', encoding='utf-8') as f:
+                file_state = _file_state(os.fstat(f.fileno()))
+                if self.input_cache is not None:
+                    cached = self.input_cache.get(file_path)
+                    if cached is not None and cached[0] == (file_state, file_type):
+                        valid_data, invalid_data = cached[1]
+                        logger.info(f"{file_path} 未变化，复用上次的 {len(valid_data)} 条有效数据")
+                        return list(valid_data), list(invalid_data)
+                with self.profiler.stage(f"解析 {os.path.basename(file_path)}", bytes_in=file_state[1]) as stats:
+                    # 修改点：现在接收两个返回值
+                    valid_data, invalid_data = self.parse_file_stream(f, file_type, jobs, prefilter)
+                    stats["records_out"] += len(valid_data)
             logger.info(f"从 {file_path} 中提取到 {len(valid_data)} 条有效数据")
+            self.set_record_source(valid_data, file_path)
+            if self.input_cache is not None:
+                self.input_cache[file_path] = ((file_state, file_type), (list(valid_data), list(invalid_data)))
 
             # 修改点：返回两个列表
             return valid_data, invalid_data
@@ -583,106 +2800,404 @@ class VideoSourceProcessor:
             return [], []
 
 
-    def process_files_parallel(self, file_paths):
-        """并行处理多个文件"""
-        all_results = []
+    def set_record_source(self, records, source):
+        """为解析结果中的 SourceRecord 记录来源文件"""
+        for record in records:
+            if isinstance(record, SourceRecord):
+                record.source = source
 
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            future_to_file = {executor.submit(self.process_file, file_path): file_path
-                              for file_path in file_paths}
+    def process_files_parallel(self, file_paths, file_type="unknown", jobs=1, prefilter=False, stdin_text=None):
+        """并行处理多个文件，返回按 file_paths 顺序合并的 (有效数据, 无效数据)
 
-            for future in as_completed(future_to_file):
-                file_path = future_to_file[future]
+        结果顺序与文件完成的先后无关，去重时保留的仍是第一个输入中先出现的条目。
+        """
+        all_valid = []
+        all_invalid = []
+        if len(file_paths) == 1:
+            return self.process_file(file_paths[0], file_type, jobs, prefilter, stdin_text)
+
+        with ThreadPoolExecutor(max_workers=min(4, len(file_paths))) as executor:
+            futures = [executor.submit(self.process_file, file_path, file_type, jobs, prefilter, stdin_text)
+                       for file_path in file_paths]
+
+            for file_path, future in zip(file_paths, futures):
                 try:
-                    result = future.result()
-                    all_results.extend(result)
+                    valid_data, invalid_data = future.result()
+                    all_valid.extend(valid_data)
+                    all_invalid.extend(invalid_data)
                 except Exception as e:
                     logger.error(f"处理文件 {file_path} 时出错: {str(e)}")
 
-        return all_results
+        return all_valid, all_invalid
+
+    def save_results(self, data, output_file, format_type="json", compact=False):
+        """保存结果（原子写入），返回写入的字节串，出错时返回None
 
-    def save_results(self, data, output_file, format_type="json"):
-        """保存结果"""
+        format_type 为 "json" 时 compact 为True写紧凑JSON（可直接传给 save_base58_encoded_results 复用），
+        否则写 indent=4 的格式化JSON；其他 format_type 按 "名称 链接" 逐行写文本。
+        """
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
+            with self.profiler.stage("序列化") as stats:
                 if format_type == "json":
-                    json.dump(data, f, ensure_ascii=False, indent=4)
+                    content = serialize_json(data, compact=compact)
                 else:
-                    for name, url in data:
-                        f.write(f"{name} {url}\n")
-
-            logger.info(f"结果已保存到: {output_file}")
+                    content = ''.join(f"{name} {url}\n" for name, url in data).encode('utf-8')
+                stats["bytes_out"] += len(content)
+            if self._write_output(output_file, content):
+                logger.info(f"结果已保存到: {output_file}")
+            else:
+                logger.info(f"结果未变化，保留: {output_file}")
+            return content
         except Exception as e:
             logger.error(f"保存文件时出错: {str(e)}")
+            return None
 
-    def save_base58_encoded_results(self, data, output_file):
-        """保存Base58编码的JSON结果"""
+    def _write_output(self, output_file, content):
+        """原子写入输出文件，返回是否写入；--watch 模式下内容与上次写入的相同且文件仍在时不重写（--serve 也就不会重新加载）"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        digest = None
+        if self.output_cache is not None:
+            digest = hashlib.sha256(content).digest()
+            if self.output_cache.get(output_file) == digest and os.path.exists(output_file):
+                return False
+        with self.profiler.stage("写出文件", bytes_in=len(content)):
+            write_file_atomic(output_file, content)
+        if digest is not None:
+            self.output_cache[output_file] = digest
+        return True
+
+    def save_base58_encoded_results(self, data, output_file, verify=False, serialized=None, base58_format='raw'):
+        """保存Base58编码的紧凑JSON结果，verify为True时先解码校验再写入
+
+        serialized 为 serialize_json(data) 已生成的紧凑JSON字节串时直接复用，不再重复序列化。
+        base58_format 为 "raw" 时直接编码JSON（默认）；为 BASE58_PAYLOAD_CODECS 中的名称时
+        写带版本头的负载（"deflate" 先压缩再编码），用 decode_base58_payload 解码。
+        """
         try:
-            # 先生成JSON字符串
-            json_str = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
-
-            # 进行Base58编码
-            encoded_data = base58_encode(json_str)
+            # 先生成JSON字节串
+            json_bytes = serialized
+            if json_bytes is None:
+                with self.profiler.stage("序列化") as stats:
+                    json_bytes = serialize_json(data)
+                    stats["bytes_out"] += len(json_bytes)
+
+            # 进行Base58编码；--watch 模式下JSON与上次相同时直接复用上次的编码结果
+            cached = json_digest = None
+            if self.output_cache is not None:
+                json_digest = hashlib.sha256(json_bytes).digest()
+                cached = self.output_cache.get(('base58', output_file))
+            if cached is not None and cached[0] == (json_digest, base58_format):
+                encoded_data = cached[1]
+            else:
+                if base58_format == 'raw' and len(json_bytes) > BASE58_WARN_SIZE:
+                    logger.warning(f"汇总JSON有 {len(json_bytes)} 字节，Base58编码预计需要约 "
+                                   f"{estimate_base58_seconds(len(json_bytes)):.0f}s；"
+                                   f"--base58-format deflate 可以把待编码内容缩小到约六分之一")
+                with self.profiler.stage("Base58编码", bytes_in=len(json_bytes)) as stats:
+                    if base58_format == 'raw':
+                        encoded_data = base58_encode(json_bytes)
+                    else:
+                        encoded_data = encode_base58_payload(json_bytes, base58_format)
+                    stats["bytes_out"] += len(encoded_data)
+                if json_digest is not None:
+                    self.output_cache[('base58', output_file)] = ((json_digest, base58_format), encoded_data)
+
+            # 往返校验：解码结果必须与原始JSON完全一致
+            if verify:
+                with self.profiler.stage("Base58校验", bytes_in=len(encoded_data)):
+                    if decode_base58_payload(encoded_data) != json_bytes:
+                        raise ValueError("Base58往返校验失败，解码结果与原始JSON不一致")
+                logger.info("Base58往返校验通过")
 
             # 保存编码后的字符串
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(encoded_data)
-
-            logger.info(f"Base58编码结果已保存到: {output_file}")
+            if self._write_output(output_file, encoded_data):
+                logger.info(f"Base58编码结果已保存到: {output_file}")
+            else:
+                logger.info(f"Base58编码结果未变化，保留: {output_file}")
         except Exception as e:
             logger.error(f"保存Base58编码文件时出错: {str(e)}")
 
-def main():
-    # --- 新增：命令行参数解析 ---
-    parser = argparse.ArgumentParser(description="视频源处理和比较工具")
-    parser.add_argument(
-        '--debug',
-        action='store_true',
-        help="开启Debug模式，将在控制台输出详细日志并生成 logs.txt 文件。"
-    )
-    args = parser.parse_args()
+def read_stdin_text():
+    """读取标准输入的全部内容；标准输入只能读一次，由调用方保存并传给需要它的地方"""
+    return sys.stdin.buffer.read().decode('utf-8')
+
+
+def read_input_text(path, stdin_text=None):
+    """读取输入文件的全部内容，path 为 "-" 时返回调用方已读入的标准输入 stdin_text"""
+    if path == STDIN_PATH:
+        return stdin_text
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def iter_input_lines(paths, stdin_text=None):
+    """逐行产出多个输入按顺序用换行拼接后的内容，与 '\n'.join(各输入全文).split('\n') 一致，文件逐行读取"""
+    for path in paths:
+        if path == STDIN_PATH:
+            yield from stdin_text.split('\n')
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            ended = True  # 空文件或以换行结尾时，split 会多出一个空行
+            for line in f:
+                ended = line.endswith('\n')
+                yield line[:-1] if ended else line
+            if ended:
+                yield ''
+
+
+def _hash_lines(lines, digest):
+    """原样产出各行，同时把它们用换行拼接后的内容累加到 digest（hashlib 对象）"""
+    separator = b''
+    for line in lines:
+        digest.update(separator)
+        digest.update(line.encode('utf-8'))
+        separator = b'\n'
+        yield line
+
+
+def expand_input_paths(inputs, warnings=None):
+    """把命令行输入展开为文件列表：目录递归取其中的文件，含通配符的按 glob 展开（支持 **），"-" 为标准输入
+
+    结果保持命令行中的顺序（目录和通配符内部按路径排序），重复的文件只保留第一次出现。
+    没有匹配到文件的目录和通配符输出警告；warnings 为列表时警告追加到其中，由调用方决定是否输出。
+    """
+    warn = logger.warning if warnings is None else warnings.append
+    paths = []
+    for item in inputs:
+        if item == STDIN_PATH:
+            paths.append(item)
+        elif os.path.isdir(item):
+            found = []
+            for root, dirs, files in os.walk(item):
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                found.extend(os.path.join(root, name) for name in files if not name.startswith('.'))
+            if not found:
+                warn(f"目录 {item} 中没有文件")
+            paths.extend(sorted(found))
+        elif glob.has_magic(item):
+            found = sorted(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+            if not found:
+                warn(f"没有与 {item} 匹配的文件")
+            paths.extend(found)
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(paths))
 
-    # --- 新增：根据参数配置日志 ---
-    setup_logging(debug=args.debug)
 
-    # --- 原有代码开始 ---
-    processor = VideoSourceProcessor()
+def describe_inputs(paths):
+    """输入文件列表的简短说明，用于日志和统计输出"""
+    names = ["标准输入" if path == STDIN_PATH else path for path in paths]
+    if len(names) == 1:
+        return names[0]
+    return f"{len(names)} 个输入: {', '.join(names[:3])}{' 等' if len(names) > 3 else ''}"
+
+
+def output_file(args, name):
+    """输出文件 name 在 --output-dir 中的路径"""
+    return os.path.join(args.output_dir, name)
+
+
+def run_incremental(processor, args, stdin_text=None):
+    """增量模式：只解析之前没处理过的抓取记录，把新增资源追加到汇总文件。没有可用的索引时返回False"""
+    index_file = output_file(args, args.index_file)
+    index = processor.load_incremental_index(index_file)
+    if index is None:
+        logger.info(f"未找到增量索引 {index_file}，本次执行完整处理并建立索引")
+        return False
+
+    try:
+        with open(output_file(args, "combined_sources.json"), 'r', encoding='utf-8') as f:
+            combined_output = json.load(f)
+        api_site = combined_output["api_site"]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"无法读取已有的 combined_sources.json，本次执行完整处理并重建索引: {e}")
+        return False
+
+    new_data = []
+
+    # 文件2 (基准文件) 内容变化时整体重新解析，它通常很小
+    baseline_content = read_input_text(args.baseline, stdin_text)
+    baseline_digest = _content_digest(baseline_content)
+    if index["files"].get("baseline") != baseline_digest:
+        baseline_data, _ = processor.parse_file_content(baseline_content, "file2")
+        processor.set_record_source(baseline_data, args.baseline)
+        logger.info(f"{args.baseline} 已变化，提取到 {len(baseline_data)} 条有效数据")
+        new_data.extend(baseline_data)
+        index["files"]["baseline"] = baseline_digest
+    else:
+        logger.info(f"{args.baseline} 未变化，跳过解析")
+
+    # 文件1 (抓取结果，多个输入按顺序拼接) 只解析之前没见过的抓取记录；
+    # 逐条记录流式读取并计算摘要，同时累加整体摘要，内存中只保留新记录
+    crawl_label = describe_inputs(args.inputs)
+    crawl_hash = hashlib.sha256()
+    record_count = 0
+    new_digests = set()
+    new_records = []
+    for header, body in processor.iter_crawl_records(_hash_lines(iter_input_lines(args.inputs, stdin_text), crawl_hash)):
+        record_count += 1
+        digest = _content_digest(body)
+        if digest not in index["records"] and digest not in new_digests:
+            new_digests.add(digest)
+            new_records.append(f"{header}\n{body}" if header else body)
+    crawl_digest = crawl_hash.hexdigest()
+    if index["files"].get("crawl") != crawl_digest:
+        index["records"].update(new_digests)
+        logger.info(f"{crawl_label} 共 {record_count} 条抓取记录，其中新记录 {len(new_records)} 条")
+
+        if new_records:
+            crawl_data, _ = processor.parse_file_content('\n'.join(new_records), "file1", args.jobs)
+            # 行号是在拼接后的新记录中的行号
+            processor.set_record_source(crawl_data, f"{crawl_label} (新记录)")
+            logger.info(f"新记录中提取到 {len(crawl_data)} 条有效数据")
+            new_data.extend(crawl_data)
+        index["files"]["crawl"] = crawl_digest
+    else:
+        logger.info(f"{crawl_label} 未变化，跳过解析")
+
+    # 去重，并过滤掉索引中已有的链接
+    unique_data, _ = processor.remove_duplicates(new_data)
+    url_info = processor.url_info
+    known_keys = {url_info(url).canonical_key for url in index["urls"]}
+    added_data = [record for record in unique_data if url_info(record[1]).canonical_key not in known_keys]
+    logger.info(f"增量新增资源: {len(added_data)} 条")
+
+    # 只探测新增资源；被丢弃的不可用资源不写入索引，下次增量运行时会重新探测
+    health = None
+    if args.probe:
+        health = processor.probe_sources(added_data, args.probe_concurrency, args.probe_per_host, args.probe_timeout)
+        added_data = processor.apply_probe_results(added_data, health, args.drop_dead, args.sort_by_latency)
+
+    processor.print_data_details("增量新增数据", added_data)
+    processor.save_results(added_data, output_file(args, "filtered_results.txt"), "text")
+    processor.save_results(processor.generate_json_output(added_data, health=health),
+                           output_file(args, "video_sources.json"), "json", compact=args.compact_json)
+
+    if added_data:
+        # 新条目接在已有的 api_N 编号之后
+        next_number = 1 + max(
+            (int(key[4:]) for key in api_site if key.startswith('api_') and key[4:].isdigit()),
+            default=0
+        )
+        api_site.update(processor.generate_json_output(added_data, start=next_number, health=health)["api_site"])
+        combined_bytes = processor.save_results(combined_output, output_file(args, "combined_sources.json"), "json",
+                                                compact=args.compact_json)
+        processor.save_base58_encoded_results(combined_output, output_file(args, "combined_sources_base58.txt"),
+                                              verify=args.verify_base58, base58_format=args.base58_format,
+                                              serialized=combined_bytes if args.compact_json else None)
+    else:
+        logger.info("没有新增资源，汇总文件保持不变")
+
+    index["urls"].update(url for _, url in added_data)
+    processor.save_incremental_index(index, index_file)
+
+    logger.info("增量处理完成！")
+
+    print(f"\n{'=' * 60}")
+    print("增量处理结果统计")
+    print(f"{'=' * 60}")
+    print(f"  - 本次解析出的有效数据: {len(new_data)} 条")
+    print(f"  - 去重并排除已知链接后新增: {len(added_data)} 条")
+    print(f"  - 汇总数据总计: {len(api_site)} 条 (combined_sources.json)")
+    print(f"{'=' * 60}")
+    return True
+
+
+def run_m3u_merge(processor, args):
+    """M3U模式：把命令行输入和 --m3u-list 清单中的播放列表去重合并进 --m3u 指定的播放列表"""
+    items = list(args.inputs)
+    for list_file in args.m3u_list:
+        items.extend(read_source_list(list_file))
+    sources = expand_playlist_sources(items)
+    logger.info(f"合并 {len(sources)} 个播放列表到 {args.m3u}...")
+
+    stats = processor.merge_playlists(args.m3u, sources)
+
+    print(f"\n{'=' * 60}")
+    print("M3U合并结果统计")
+    print(f"{'=' * 60}")
+    print(f"  - {args.m3u} 原有条目: {stats['已有条目']} 条，其中重复 {stats['已有重复']} 条")
+    print(f"  - 新播放列表: {len(sources)} 个，新增条目 {stats['新增条目']} 条，重复 {stats['新列表重复']} 条")
+    if stats["读取失败的列表"]:
+        print(f"  - 读取失败的播放列表: {stats['读取失败的列表']} 个")
+    print(f"  - 合并后条目总计: {stats['保留条目'] + stats['新增条目']} 条"
+          f"{'' if stats['已改写'] else ' (没有变化，文件未改写)'}")
+    print(f"{'=' * 60}")
+
+
+def report_profile(processor, args):
+    """按 --profile / --profile-json 输出性能统计"""
+    if not args.profile and not args.profile_json:
+        return
+    caches = {"URL规范化": processor.url_cache_info(), "Base58大数幂": _bignum_power.cache_info()}
+    if args.profile:
+        print(f"\n{'=' * 60}")
+        print("性能统计 (--profile)")
+        print(f"{'=' * 60}")
+        print(processor.profiler.format_table(caches))
+    if args.profile_json:
+        extra = {"argv": sys.argv[1:], "json_backend": json_backend_name()}
+        try:
+            processor.profiler.append_json(args.profile_json, caches, extra)
+            logger.info(f"性能统计已追加到: {args.profile_json}")
+        except OSError as e:
+            logger.error(f"保存性能统计时出错: {str(e)}")
+
+
+def run_pipeline(processor, args):
+    """执行一次完整的处理流程：解析文件1和文件2、去重、比较过滤、（可选）探测，写出4个输出文件并打印统计"""
+    # 标准输入只能读一次，在这里读入，解析和建立增量索引共用这一份，运行结束后释放
+    stdin_text = read_stdin_text() if STDIN_PATH in args.inputs + [args.baseline] else None
+
+    # 增量模式：有可用索引时只处理新增内容
+    if args.incremental and run_incremental(processor, args, stdin_text):
+        report_profile(processor, args)
+        return
 
     # 处理文件1和文件2
     logger.info("开始处理文件...")
 
 
-    file1_valid_data, file1_invalid_data = processor.process_file("shipinywan.txt", "file1")
-    file2_valid_data, file2_invalid_data = processor.process_file("basic.json", "file2")
+    file1_label = describe_inputs(args.inputs)
+    file2_label = "标准输入" if args.baseline == STDIN_PATH else args.baseline
+    file1_valid_data, file1_invalid_data = processor.process_files_parallel(args.inputs, "file1", jobs=args.jobs,
+                                                                                prefilter=args.prefilter,
+                                                                                stdin_text=stdin_text)
+    file2_valid_data, file2_invalid_data = processor.process_file(args.baseline, "file2", stdin_text=stdin_text)
 
     logger.info(f"文件1有效数据: {len(file1_valid_data)} 条，无效数据: {len(file1_invalid_data)} 条")
     logger.info(f"文件2有效数据: {len(file2_valid_data)} 条，无效数据: {len(file2_invalid_data)} 条")
 
     # 打印文件1原始有效数据
-    processor.print_data_details("文件1原始有效数据 (shipinywan.txt)", file1_valid_data)
+    processor.print_data_details(f"文件1原始有效数据 ({file1_label})", file1_valid_data)
 
     # 打印文件1无效数据
-    processor.print_data_details("文件1无效链接数据 (shipinywan.txt)", file1_invalid_data)
+    processor.print_data_details(f"文件1无效链接数据 ({file1_label})", file1_invalid_data)
 
     # 打印文件2原始有效数据
-    processor.print_data_details("文件2原始有效数据 (basic.json)", file2_valid_data)
+    processor.print_data_details(f"文件2原始有效数据 ({file2_label})", file2_valid_data)
 
     # 打印文件2无效数据
-    processor.print_data_details("文件2无效链接数据 (basic.json)", file2_invalid_data)
+    processor.print_data_details(f"文件2无效链接数据 ({file2_label})", file2_invalid_data)
 
     # 去重
     logger.info("正在去重...")
-    file1_unique_data, file1_duplicate_data = processor.remove_duplicates(file1_valid_data)
-    file2_unique_data, file2_duplicate_data = processor.remove_duplicates(file2_valid_data)
+    file1_merge_stats = Counter()
+    file2_merge_stats = Counter()
+    file1_unique_data, file1_duplicate_data = processor.remove_duplicates(file1_valid_data, merge_stats=file1_merge_stats)
+    file2_unique_data, file2_duplicate_data = processor.remove_duplicates(file2_valid_data, merge_stats=file2_merge_stats)
 
     logger.info(f"文件1去重后: {len(file1_unique_data)} 条，删除重复: {len(file1_duplicate_data)} 条")
+    logger.info(f"文件1各规则合并条目数: {processor.describe_merge_stats(file1_merge_stats)}")
     logger.info(f"文件2去重后: {len(file2_unique_data)} 条，删除重复: {len(file2_duplicate_data)} 条")
+    logger.info(f"文件2各规则合并条目数: {processor.describe_merge_stats(file2_merge_stats)}")
 
     # 打印文件1删除的重复数据
-    processor.print_data_details("文件1删除的重复数据 (shipinywan.txt)", file1_duplicate_data)
+    processor.print_data_details(f"文件1删除的重复数据 ({file1_label})", file1_duplicate_data)
 
     # 打印文件2删除的重复数据
-    processor.print_data_details("文件2删除的重复数据 (basic.json)", file2_duplicate_data)
+    processor.print_data_details(f"文件2删除的重复数据 ({file2_label})", file2_duplicate_data)
 
     # 比较并过滤，得到文件1中的新增数据
     logger.info("正在比较和过滤...")
@@ -690,6 +3205,13 @@ def main():
 
     logger.info(f"过滤后剩余 (文件1中的新增数据): {len(filtered_data)} 条")
 
+    # 可用性探测：探测汇总数据中的全部资源，按需去掉不可用的或按延迟排序
+    health = None
+    if args.probe:
+        health = processor.probe_sources(itertools.chain(file2_unique_data, filtered_data), args.probe_concurrency,
+                                         args.probe_per_host, args.probe_timeout)
+        filtered_data = processor.apply_probe_results(filtered_data, health, args.drop_dead, args.sort_by_latency)
+
     # 打印最终输出数据 (仅新增部分)
     processor.print_data_details("最终输出数据 (仅文件1新增部分)", filtered_data)
 
@@ -697,37 +3219,55 @@ def main():
     # 步骤1: 保存仅包含新增内容的结果
     # ====================================================================
     # 保存文本格式结果 (仅新增)
-    processor.save_results(filtered_data, "filtered_results.txt", "text")
+    processor.save_results(filtered_data, output_file(args, "filtered_results.txt"), "text")
 
     # 生成JSON格式 (仅新增)
     logger.info("正在生成仅包含新增数据的JSON...")
-    json_output_new_only = processor.generate_json_output(filtered_data)
+    # 两份输出的数据有重叠，共用条目缓存，每个条目只生成一次
+    entry_cache = {}
+    json_output_new_only = processor.generate_json_output(filtered_data, health=health, entry_cache=entry_cache)
 
     # 保存JSON结果 (仅新增)
-    processor.save_results(json_output_new_only, "video_sources.json", "json")
+    processor.save_results(json_output_new_only, output_file(args, "video_sources.json"), "json",
+                           compact=args.compact_json)
 
 
     # ====================================================================
     # 新增步骤 2: 合并文件2的全部内容和文件1的新增内容，并保存
     # ====================================================================
     logger.info("正在合并数据以生成最终汇总文件...")
-    # 将文件2的唯一数据与文件1过滤后的新增数据合并
-    combined_data = file2_unique_data + filtered_data
-    logger.info(f"汇总数据总计: {len(combined_data)} 条 (文件2: {len(file2_unique_data)} + 文件1新增: {len(filtered_data)})")
+    # 将文件1过滤后的新增数据追加到文件2的唯一数据之后，就地扩展而不复制整个列表（remove_duplicates 返回的是新列表）
+    file2_unique_count = len(file2_unique_data)
+    combined_data = file2_unique_data
+    combined_data.extend(filtered_data)
+    if health is not None:
+        combined_data = processor.apply_probe_results(combined_data, health, args.drop_dead, args.sort_by_latency)
+    logger.info(f"汇总数据总计: {len(combined_data)} 条 (文件2: {file2_unique_count} + 文件1新增: {len(filtered_data)})")
 
     # 打印汇总数据详情
     processor.print_data_details("汇总数据预览 (文件2 + 文件1新增)", combined_data)
 
     # 为合并后的数据生成JSON格式
     logger.info("正在生成汇总JSON格式...")
-    json_output_combined = processor.generate_json_output(combined_data)
+    json_output_combined = processor.generate_json_output(combined_data, health=health, entry_cache=entry_cache)
 
     # 保存最终的汇总JSON结果
-    processor.save_results(json_output_combined, "combined_sources.json", "json")
+    combined_bytes = processor.save_results(json_output_combined, output_file(args, "combined_sources.json"), "json",
+                                            compact=args.compact_json)
 
     # 生成Base58编码的汇总文件
     logger.info("正在生成Base58编码的汇总文件...")
-    processor.save_base58_encoded_results(json_output_combined, "combined_sources_base58.txt")
+    processor.save_base58_encoded_results(json_output_combined, output_file(args, "combined_sources_base58.txt"),
+                                          verify=args.verify_base58, base58_format=args.base58_format,
+                                          serialized=combined_bytes if args.compact_json else None)
+
+    # 增量模式下首次完整处理后建立索引，供之后的增量运行使用
+    if args.incremental:
+        # 逐条记录流式计算摘要（只做哈希，不再解析）；标准输入使用已读入的内容
+        baseline_content = read_input_text(args.baseline, stdin_text)
+        index = processor.build_incremental_index(iter_input_lines(args.inputs, stdin_text), baseline_content,
+                                                  (url for _, url in combined_data))
+        processor.save_incremental_index(index, output_file(args, args.index_file))
 
     logger.info("处理完成！")
 
@@ -738,24 +3278,350 @@ def main():
     print(f"\n{'=' * 60}")
     print("详细处理结果统计")
     print(f"{'=' * 60}")
-    print(f"文件1 (shipinywan.txt):")
+    print(f"文件1 ({file1_label}):")
     print(f"  - 原始有效数据: {len(file1_valid_data)} 条")
-    print(f"  - 去重后数据:   {len(file1_unique_data)} 条")
+    print(f"  - 去重后数据:   {len(file1_unique_data)} 条 (各规则合并: {processor.describe_merge_stats(file1_merge_stats)})")
     print(f"  - 与文件2比较后新增: {len(filtered_data)} 条")
     print()
-    print(f"文件2 (basic.json):")
+    print(f"文件2 ({file2_label}):")
     print(f"  - 原始有效数据: {len(file2_valid_data)} 条")
-    print(f"  - 去重后数据:   {len(file2_unique_data)} 条")
+    print(f"  - 去重后数据:   {file2_unique_count} 条 (各规则合并: {processor.describe_merge_stats(file2_merge_stats)})")
     print()
     print("--- 输出文件详情 ---")
     print(f"仅新增数据:")
-    print(f"  - 内容: {len(filtered_data)} 条 (来自 shipinywan.txt)")
-    print(f"  - 文件: video_sources.json, filtered_results.txt")
+    print(f"  - 内容: {len(filtered_data)} 条 (来自 {file1_label})")
+    print(f"  - 文件: video_sources.json, filtered_results.txt (目录 {args.output_dir})")
     print()
     print(f"汇总数据:")
-    print(f"  - 内容: {len(combined_data)} 条 (basic.json + 新增)")
-    print(f"  - 文件: combined_sources.json, combined_sources_base58.txt")
+    print(f"  - 内容: {len(combined_data)} 条 ({file2_label} + 新增)")
+    print(f"  - 文件: combined_sources.json, combined_sources_base58.txt (目录 {args.output_dir})")
+    print()
+    if health is not None:
+        alive_count = sum(1 for result in health.values() if result["alive"])
+        latencies = sorted(result["latency_ms"] for result in health.values() if result["alive"])
+        print(f"可用性探测:")
+        print(f"  - 可用: {alive_count} 个，不可用: {len(health) - alive_count} 个")
+        if latencies:
+            print(f"  - 延迟中位数: {latencies[len(latencies) // 2]} ms，最快: {latencies[0]} ms，最慢: {latencies[-1]} ms")
+        print()
+    if args.dedup_records:
+        record_stats = processor.record_stats
+        skipped_ratio = record_stats["跳过字节"] / record_stats["正文字节"] * 100 if record_stats["正文字节"] else 0.0
+        print(f"按记录解析:")
+        print(f"  - 抓取记录: {record_stats['记录总数']} 条，正文重复而复用行解析结果: {record_stats['复用记录']} 条")
+        print(f"  - 跳过的正文: {record_stats['跳过字节']} 字节 ({skipped_ratio:.1f}%)，复用结果: {record_stats['复用结果']} 条")
+        print()
+    cache_info = processor.url_cache_info()
+    cache_lookups = cache_info.hits + cache_info.misses
+    hit_rate = cache_info.hits / cache_lookups * 100 if cache_lookups else 0.0
+    print(f"URL规范化缓存:")
+    print(f"  - 命中: {cache_info.hits} 次，未命中: {cache_info.misses} 次，命中率: {hit_rate:.1f}%")
+    print(f"  - 缓存条目: {cache_info.currsize} / {cache_info.maxsize}")
     print(f"{'=' * 60}")
 
+    report_profile(processor, args)
+
+
+def _snapshot_inputs(args):
+    """展开 --watch 监视的输入（目录和通配符重新展开，能发现新文件），返回 (文件1列表, {文件路径: 文件状态或None}, 展开时的警告)"""
+    warnings = []
+    inputs = expand_input_paths(args.input_patterns, warnings)
+    states = {}
+    for path in inputs + [args.baseline]:
+        try:
+            states[path] = _file_state(os.stat(path))
+        except OSError:
+            states[path] = None
+    return inputs, states, warnings
+
+
+def run_watch(processor, args):
+    """监视模式：轮询输入文件和目录，有变化且稳定 --watch-debounce 秒后重新处理，直到 Ctrl+C
+
+    同一个 VideoSourceProcessor 在多次运行之间保持：未变化的输入直接复用上次的解析结果，
+    URL规范化缓存、链接索引（含基准文件链接的规范键）和按记录解析的结果都保持有效；
+    输出内容不变的文件不重写，汇总JSON不变时Base58编码也直接复用。
+    已移除或已变化的输入的解析结果在每次运行后清理，按记录解析的结果有容量上限，见 trim_caches。
+    找不到文件的警告只在输入有变化且警告不同于上次时输出，不会每次轮询都重复。
+    """
+    processor.input_cache = {}
+    processor.output_cache = {}
+    # main() 展开输入时已经输出过警告
+    inputs, states, warnings = _snapshot_inputs(args)
+    try:
+        while True:
+            if inputs:
+                args.inputs = inputs
+                processor.profiler = PipelineProfiler()
+                processor.record_stats = Counter()
+                run_pipeline(processor, args)
+                processor.trim_caches()
+            else:
+                logger.warning("没有找到任何输入文件，等待输入出现...")
+            logger.info(f"正在监视 {len(states)} 个文件的变化（每 {args.watch_interval}s 检查一次，Ctrl+C 退出）...")
+
+            # 等待变化，再等到连续 debounce 秒没有新的变化（抓取程序可能还在写入）
+            while True:
+                time.sleep(args.watch_interval)
+                new_inputs, new_states, new_warnings = _snapshot_inputs(args)
+                if new_states != states:
+                    break
+            settled_at = time.monotonic()
+            while time.monotonic() - settled_at < args.watch_debounce:
+                time.sleep(min(args.watch_interval, args.watch_debounce))
+                latest_inputs, latest_states, latest_warnings = _snapshot_inputs(args)
+                if latest_states != new_states:
+                    new_inputs, new_states, new_warnings = latest_inputs, latest_states, latest_warnings
+                    settled_at = time.monotonic()
+
+            changed = [path for path, state in new_states.items() if states.get(path) != state]
+            removed = [path for path in states if path not in new_states]
+            logger.info(f"检测到 {len(changed)} 个文件变化、{len(removed)} 个文件移除: "
+                        f"{describe_inputs(changed + removed)}，重新处理...")
+            for message in new_warnings:
+                if message not in warnings:
+                    logger.warning(message)
+            for path in changed + removed:
+                processor.input_cache.pop(path, None)
+            inputs, states, warnings = new_inputs, new_states, new_warnings
+    except KeyboardInterrupt:
+        logger.info("监视模式已退出")
+
+
+def main():
+    # --- 新增：命令行参数解析 ---
+    parser = argparse.ArgumentParser(description="视频源处理和比较工具")
+    parser.add_argument(
+        'inputs',
+        nargs='*',
+        metavar='INPUT',
+        help=f"抓取结果（文件1），可以是多个文件、目录（递归读取其中的文件）或通配符（支持 **），"
+             f"\"-\" 表示从标准输入读取；多个输入按顺序合并。默认 {DEFAULT_CRAWL_FILE}。"
+    )
+    parser.add_argument(
+        '--baseline',
+        default=DEFAULT_BASELINE_FILE,
+        help=f"基准文件（文件2），只解析一次，默认 {DEFAULT_BASELINE_FILE}；\"-\" 表示从标准输入读取。"
+    )
+    parser.add_argument(
+        '--output-dir',
+        default='.',
+        help="输出文件（video_sources.json 等4个文件和增量索引）所在的目录，不存在时自动创建，默认当前目录。"
+    )
+    parser.add_argument(
+        '--debug',
+        action='store_true',
+        help="开启Debug模式，将在控制台输出详细日志并生成 logs.txt 文件。"
+    )
+    parser.add_argument(
+        '--verify-base58',
+        action='store_true',
+        help="保存Base58编码文件前先解码校验，确保输出可以无损还原。"
+    )
+    parser.add_argument(
+        '--base58-format',
+        choices=BASE58_FORMATS,
+        default='raw',
+        help="combined_sources_base58.txt 的格式：raw 直接编码紧凑JSON（默认，现有订阅解码可直接使用）；"
+             "deflate 先压缩再编码并带版本头，体积和编码耗时都小得多；none 带版本头但不压缩。"
+             "带版本头的格式用 --decode-base58 或 decode_base58_payload 解码。"
+    )
+    parser.add_argument(
+        '--decode-base58',
+        metavar='FILE',
+        help="解码Base58文件（raw 或带版本头的格式均可），把JSON输出到标准输出后退出。"
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help="解析大文件时使用的进程数，按抓取记录分片并行解析，输出与单进程完全一致。默认 1。"
+    )
+    parser.add_argument(
+        '--prefilter',
+        action='store_true',
+        help="行解析预过滤：内存映射抓取结果文件，只解析包含 provide/vod 的行及其上下文，结果与完整行解析一致；"
+             "资源稀疏的大文件明显更快。对标准输入无效，启用时行解析忽略 --jobs。"
+    )
+    parser.add_argument(
+        '--dedup-records',
+        action='store_true',
+        help="按抓取记录解析：把抓取报告按 \"页面: ... | 仓库: ... | 文件: ...\" 记录头拆分，正文完全相同的记录"
+             "（如多个fork中的同一份配置）的行解析只做一次，其余副本复用结果并换算为各自的行号，输出与默认解析完全一致；"
+             "正文首尾几行依赖相邻内容，片段扫描可能跨越记录，这些部分仍对每个副本处理。不能与 --prefilter / --jobs 同时使用。"
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="增量模式：根据索引只解析新的抓取记录，只把新增资源追加到 combined_sources.json；"
+             "此时 video_sources.json / filtered_results.txt 只包含本次新增的资源。没有索引时执行完整处理并建立索引。"
+    )
+    parser.add_argument(
+        '--index-file',
+        default=INCREMENTAL_INDEX_FILE,
+        help=f"增量模式使用的索引文件，相对路径相对于 --output-dir，默认 {INCREMENTAL_INDEX_FILE}。"
+    )
+    parser.add_argument(
+        '--probe',
+        action='store_true',
+        help="去重后并发探测每个api是否可用，把状态码和延迟写入输出JSON的 health 字段。"
+    )
+    parser.add_argument(
+        '--probe-concurrency',
+        type=int,
+        default=PROBE_CONCURRENCY,
+        help=f"探测的总并发数，默认 {PROBE_CONCURRENCY}。"
+    )
+    parser.add_argument(
+        '--probe-per-host',
+        type=int,
+        default=PROBE_PER_HOST,
+        help=f"探测时每个主机的并发连接数，默认 {PROBE_PER_HOST}。"
+    )
+    parser.add_argument(
+        '--probe-timeout',
+        type=float,
+        default=PROBE_TIMEOUT,
+        help=f"单次探测的超时秒数，默认 {PROBE_TIMEOUT}。"
+    )
+    parser.add_argument(
+        '--drop-dead',
+        action='store_true',
+        help="配合 --probe：从输出中去掉探测不可用的资源。"
+    )
+    parser.add_argument(
+        '--sort-by-latency',
+        action='store_true',
+        help="配合 --probe：输出按延迟从低到高排列，不可用的资源排在最后。"
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="结束时打印各阶段耗时、输入输出字节数/条目数、正则匹配计数和缓存命中率。"
+    )
+    parser.add_argument(
+        '--profile-json',
+        metavar='FILE',
+        help="把本次运行的性能统计追加到指定的JSON Lines文件，便于跟踪每天运行的趋势。"
+    )
+    parser.add_argument(
+        '--compact-json',
+        action='store_true',
+        help="JSON输出使用紧凑格式（无缩进），汇总JSON只序列化一次，同一份字节同时用于Base58编码。"
+    )
+    parser.add_argument(
+        '--debug-sample',
+        type=int,
+        default=DEBUG_SAMPLE_LIMIT,
+        metavar='N',
+        help=f"配合 --debug：逐URL、逐行的调试日志每类只记录前N条明细，其余汇总为一条计数，默认 {DEBUG_SAMPLE_LIMIT}；0 表示全部记录。"
+    )
+    parser.add_argument(
+        '--m3u',
+        metavar='PLAYLIST',
+        help="M3U模式：把输入的 M3U/M3U8 播放列表（文件、目录、通配符、\"-\" 或 http(s) 链接）按频道和播放链接去重，"
+             "增量合并进指定的播放列表（如 ../iptv/collect.m3u）；没有输入时只对它本身去重。"
+    )
+    parser.add_argument(
+        '--m3u-list',
+        action='append',
+        default=[],
+        metavar='FILE',
+        help="配合 --m3u：从清单文件（如 ../iptv/m3uadd，每行一个链接或路径）读取要合并的播放列表，可以指定多次。"
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help="监视模式：处理一次后持续监视输入文件、目录和基准文件，有变化时只重新解析变化的文件，"
+             "解析结果、URL缓存和输出在多次运行之间保持；输出内容不变时不重写文件。Ctrl+C 退出。"
+    )
+    parser.add_argument(
+        '--watch-interval',
+        type=float,
+        default=WATCH_INTERVAL,
+        metavar='SECONDS',
+        help=f"配合 --watch：检查输入变化的间隔秒数，默认 {WATCH_INTERVAL}。"
+    )
+    parser.add_argument(
+        '--watch-debounce',
+        type=float,
+        default=WATCH_DEBOUNCE,
+        metavar='SECONDS',
+        help=f"配合 --watch：检测到变化后等待输入连续这么多秒不再变化才重新处理，默认 {WATCH_DEBOUNCE}。"
+    )
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help="订阅服务模式：不执行处理流程，用内置HTTP服务提供 --output-dir 中的 combined_sources.json 和 "
+             "combined_sources_base58.txt（强ETag、If-None-Match 304、预压缩的 gzip/br），文件重新生成后自动切换为新内容。"
+    )
+    parser.add_argument(
+        '--host',
+        default=SERVE_HOST,
+        help=f"配合 --serve：监听地址，默认 {SERVE_HOST}。"
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=SERVE_PORT,
+        help=f"配合 --serve：监听端口，默认 {SERVE_PORT}。"
+    )
+    parser.add_argument(
+        '--serve-reload',
+        type=float,
+        default=SERVE_RELOAD_INTERVAL,
+        metavar='SECONDS',
+        help=f"配合 --serve：检查输出文件是否更新的间隔秒数，默认 {SERVE_RELOAD_INTERVAL}。"
+    )
+    args = parser.parse_args()
+    if args.decode_base58:
+        try:
+            with open(args.decode_base58, 'r', encoding='ascii') as f:
+                sys.stdout.buffer.write(decode_base58_payload(f.read()))
+        except (OSError, ValueError) as e:
+            parser.exit(1, f"解码 {args.decode_base58} 失败: {e}\n")
+        return
+    if args.serve:
+        setup_logging(debug=args.debug)
+        try:
+            asyncio.run(serve_outputs(args.output_dir, args.host, args.port, args.serve_reload))
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.m3u:
+        setup_logging(debug=args.debug)
+        processor = VideoSourceProcessor()
+        run_m3u_merge(processor, args)
+        report_profile(processor, args)
+        return
+    if args.m3u_list:
+        parser.error("--m3u-list 需要配合 --m3u 使用")
+    if args.dedup_records and (args.prefilter or args.jobs > 1):
+        parser.error("--dedup-records 不能与 --prefilter 或 --jobs 同时使用")
+    args.input_patterns = args.inputs or [DEFAULT_CRAWL_FILE]
+    args.inputs = expand_input_paths(args.input_patterns)
+    if not args.inputs and not args.watch:
+        parser.error("没有找到任何输入文件")
+    if args.baseline == STDIN_PATH and STDIN_PATH in args.inputs:
+        parser.error("标准输入不能同时作为抓取结果和基准文件")
+    if args.watch and STDIN_PATH in args.inputs + [args.baseline]:
+        parser.error("--watch 不能监视标准输入")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # --- 新增：根据参数配置日志 ---
+    setup_logging(debug=args.debug)
+    logger.debug(f"紧凑JSON序列化后端: {json_backend_name()}")
+
+    # --- 原有代码开始 ---
+    processor = VideoSourceProcessor()
+    processor.debug_log.limit = args.debug_sample
+    processor.dedup_records = args.dedup_records
+
+    if args.watch:
+        run_watch(processor, args)
+    else:
+        run_pipeline(processor, args)
+
+
 if __name__ == "__main__":
     main()